@@ -0,0 +1,197 @@
+"""
+Benchmark de ponta a ponta contra a plataforma falsa (benchmarks/plataforma_falsa.py).
+
+Para cada tamanho de curso (por padrão 10, 100 e 1000 vídeos) sobe uma plataforma nova em
+outro processo, abre um navegador novo e mede, com as funções do próprio script:
+- login: realizar_login + ida à página das aulas;
+- coletar: coletar_aulas_e_videoaulas (durações);
+- downloads: realizar_downloads (links + download de todos os vídeos).
+
+Os resultados (tempos, round trips ao chromedriver, requisições HTTP e bytes baixados) são
+gravados em JSON junto com o commit do repositório, para comparar versões com --comparar.
+
+Uso:
+    python benchmarks/benchmark_e2e.py --videos 10 100 1000 --saida resultados_e2e.json
+    python benchmarks/benchmark_e2e.py --videos 10 --comparar resultados_e2e.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+PASTA_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(PASTA_BENCHMARKS))
+sys.path.insert(0, PASTA_BENCHMARKS)
+import extrair_tempo_ou_baixar_videoaulas as videoaulas  # noqa: E402
+import plataforma_falsa  # noqa: E402
+
+ETAPAS = ("login", "coletar", "downloads")
+
+
+def servir_plataforma(porta, num_videos, videos_por_aula, tamanho_bytes, latencia_s, urls):
+    plataforma = plataforma_falsa.criar_plataforma(porta, num_videos, videos_por_aula, tamanho_bytes, latencia_s)
+    urls.update(plataforma.urls())
+    plataforma.serve_forever()
+
+
+def versao_repositorio():
+    """
+    Commit atual (com '+alterado' se houver mudanças não commitadas), ou None fora de um repositório git.
+    """
+    raiz = os.path.dirname(PASTA_BENCHMARKS)
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=raiz, capture_output=True, text=True, check=True).stdout.strip()
+        alterado = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=raiz, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("+alterado" if alterado else "")
+
+
+def medir(etapa, driver, resultado, funcao, *args, **kwargs):
+    """
+    Executa a função da etapa e guarda o tempo e os round trips ao chromedriver gastos nela.
+    """
+    round_trips = driver.round_trips["total"]
+    requisicoes = videoaulas.ESTATISTICAS_HTTP["requisicoes"]
+    inicio = time.perf_counter()
+    retorno = funcao(*args, **kwargs)
+    resultado[f"{etapa}_s"] = round(time.perf_counter() - inicio, 3)
+    resultado[f"{etapa}_round_trips"] = driver.round_trips["total"] - round_trips
+    resultado[f"{etapa}_requisicoes_http"] = videoaulas.ESTATISTICAS_HTTP["requisicoes"] - requisicoes
+    print(f"⏱️ {etapa}: {resultado[f'{etapa}_s']:.1f}s")
+    return retorno
+
+
+def entrar(driver):
+    """
+    Login completo na plataforma falsa e ida à página das aulas (o que garantir_login faz sem sessão salva).
+    """
+    if not videoaulas.realizar_login(driver, "teste@exemplo.com", "senha"):
+        return False
+    videoaulas.garantir_pagina_aulas(driver)
+    videoaulas.sincronizar_cookies_http(driver)
+    return True
+
+
+def executar_cenario(num_videos, args):
+    """
+    Sobe a plataforma com 'num_videos' vídeos, aponta o script para ela e mede as etapas pedidas.
+    """
+    gerenciador = multiprocessing.Manager()
+    urls = gerenciador.dict()
+    tamanho_bytes = int(args.tamanho_mb * 1024 * 1024)
+    servidor = multiprocessing.Process(
+        target=servir_plataforma,
+        args=(0, num_videos, args.videos_por_aula, tamanho_bytes, args.latencia_ms / 1000, urls),
+        daemon=True,
+    )
+    servidor.start()
+    while not urls and servidor.is_alive():
+        time.sleep(0.05)
+
+    pasta = tempfile.mkdtemp(prefix="benchmark_e2e_")
+    videoaulas.URL_LOGIN = urls["URL_LOGIN"]
+    videoaulas.BASE_SITE = urls["BASE_SITE"]
+    videoaulas.URL_AULAS = urls["URL_AULAS"]
+    videoaulas.PASTA_DESTINO = os.path.join(pasta, "videos")
+    # Cada cenário mede uma execução a frio: nada de índice local nem sessão salva
+    videoaulas.MODO_INCREMENTAL = False
+    videoaulas.REUTILIZAR_SESSAO = False
+    videoaulas.DURACAO_VIA_RANGE = not args.duracao_pelo_player
+
+    resultado = {"videos": num_videos, "aulas": -(-num_videos // args.videos_por_aula)}
+    driver = videoaulas.iniciar_driver(headless=not args.com_janela)
+    try:
+        # Sem login não há como seguir: a etapa sempre roda, mas só é registrada se pedida
+        medicao = resultado if "login" in args.etapas else {}
+        if not medir("login", driver, medicao, entrar, driver):
+            raise RuntimeError("login na plataforma falsa falhou")
+        if "coletar" in args.etapas:
+            videoaulas.aguardar_lista_aulas(driver)
+            dados = medir("coletar", driver, resultado, videoaulas.coletar_aulas_e_videoaulas, driver)
+            resultado["coletar_erros"] = sum(1 for linha in dados if ":" not in str(linha[4]))
+        if "downloads" in args.etapas:
+            videoaulas.garantir_pagina_aulas(driver, forcar=True)
+            videoaulas.aguardar_lista_aulas(driver)
+            medir("downloads", driver, resultado, videoaulas.realizar_downloads, driver)
+            arquivos = [os.path.join(videoaulas.PASTA_DESTINO, nome) for nome in os.listdir(videoaulas.PASTA_DESTINO)
+                        if nome.endswith(".mp4")]
+            resultado["arquivos_baixados"] = len(arquivos)
+            resultado["bytes_baixados"] = sum(os.path.getsize(caminho) for caminho in arquivos)
+            if resultado["downloads_s"]:
+                resultado["downloads_mb_s"] = round(resultado["bytes_baixados"] / 1024 / 1024 / resultado["downloads_s"], 2)
+    finally:
+        driver.quit()
+        servidor.terminate()
+        gerenciador.shutdown()
+        shutil.rmtree(pasta, ignore_errors=True)
+    return resultado
+
+
+def comparar(resultados, anterior, caminho_anterior):
+    """
+    Mostra a variação de cada tempo em relação ao relatório de uma execução anterior.
+    """
+    por_tamanho = {r["videos"]: r for r in anterior["resultados"]}
+    print(f"📈 Comparação com {caminho_anterior} (versão {anterior.get('versao')}):")
+    for resultado in resultados:
+        base = por_tamanho.get(resultado["videos"])
+        if base is None:
+            continue
+        for etapa in ETAPAS:
+            chave = f"{etapa}_s"
+            if chave in resultado and base.get(chave):
+                variacao = (resultado[chave] - base[chave]) / base[chave] * 100
+                alerta = " ⚠️" if variacao > 10 else ""
+                print(f"   {resultado['videos']:>5} vídeos | {etapa:<9} {base[chave]:>9.1f}s -> {resultado[chave]:>9.1f}s ({variacao:+.1f}%){alerta}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de ponta a ponta contra a plataforma falsa.")
+    parser.add_argument("--videos", type=int, nargs="+", default=[10, 100, 1000], help="tamanhos de curso a medir")
+    parser.add_argument("--videos-por-aula", type=int, default=10)
+    parser.add_argument("--tamanho-mb", type=float, default=1.0, help="tamanho de cada vídeo em 720p")
+    parser.add_argument("--latencia-ms", type=float, default=0.0, help="atraso da plataforma por requisição")
+    parser.add_argument("--etapas", nargs="+", choices=ETAPAS, default=list(ETAPAS))
+    parser.add_argument("--duracao-pelo-player", action="store_true", help="mede a coleta tocando os vídeos (DURACAO_VIA_RANGE = False)")
+    parser.add_argument("--com-janela", action="store_true", help="abre o navegador visível em vez de headless")
+    parser.add_argument("--saida", default="resultados_e2e.json")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para comparar os tempos")
+    args = parser.parse_args()
+
+    # Lido antes de medir: --comparar pode apontar para o mesmo arquivo de --saida
+    anterior = None
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            anterior = json.load(f)
+
+    resultados = []
+    for num_videos in args.videos:
+        print(f"🧪 Cenário com {num_videos} vídeos ({args.videos_por_aula} por aula)...")
+        resultados.append(executar_cenario(num_videos, args))
+
+    relatorio = {
+        "versao": versao_repositorio(),
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "parametros": {chave: valor for chave, valor in vars(args).items() if chave not in ("saida", "comparar")},
+        "resultados": resultados,
+    }
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, ensure_ascii=False, indent=2)
+    print(f"✅ Resultados salvos em {args.saida}")
+
+    if anterior is not None:
+        comparar(resultados, anterior, args.comparar)
+
+
+if __name__ == "__main__":
+    main()
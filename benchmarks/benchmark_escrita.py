@@ -0,0 +1,151 @@
+"""
+Micro-benchmark da gravação dos downloads.
+
+Compara o laço antigo de baixar_arquivo (iter_content com blocos de 1MB, um objeto bytes novo
+por bloco) com gravar_corpo_resposta (buffer reutilizado, bloco adaptativo, pré-alocação),
+baixando o mesmo arquivo de um servidor HTTP local.
+
+O servidor roda em outro processo, então o tempo de CPU medido (process_time) é só o do cliente.
+Cada variante é medida duas vezes: uma sem o tracemalloc (tempos) e outra com ele (memória
+alocada no pico pelo laço).
+
+Uso:
+    python benchmarks/benchmark_escrita.py --tamanho-mb 256 --repeticoes 5 --hash
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import extrair_tempo_ou_baixar_videoaulas as videoaulas  # noqa: E402
+
+
+def servir(porta, tamanho, pronto):
+    """
+    Servidor HTTP que responde qualquer GET com 'tamanho' bytes (content-length conhecido).
+    """
+    conteudo = os.urandom(min(tamanho, 16 * 1024 * 1024))
+
+    class Manipulador(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "video/mp4")
+            self.send_header("Content-Length", str(tamanho))
+            self.end_headers()
+            restantes = tamanho
+            visao = memoryview(conteudo)
+            while restantes:
+                trecho = visao[:min(restantes, len(conteudo))]
+                self.wfile.write(trecho)
+                restantes -= len(trecho)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", porta), Manipulador)
+    pronto.set()
+    servidor.serve_forever()
+
+
+def laco_anterior(resposta, arquivo, hash_arquivo):
+    """
+    Reprodução do laço de gravação que baixar_arquivo usava antes do gravar_corpo_resposta.
+    """
+    total = 0
+    for bloco in resposta.iter_content(chunk_size=1024 * 1024):
+        if bloco:
+            arquivo.write(bloco)
+            if hash_arquivo is not None:
+                hash_arquivo.update(bloco)
+            total += len(bloco)
+            videoaulas.obter_agendador().consumir(len(bloco))
+    videoaulas.sincronizar_disco(arquivo)  # mesma política de fsync nos dois laços
+    return total
+
+
+def laco_otimizado(resposta, arquivo, hash_arquivo):
+    tamanho = int(resposta.headers.get("content-length", 0) or 0)
+    videoaulas.prealocar(arquivo, 0, tamanho)
+    total = videoaulas.gravar_corpo_resposta(resposta, arquivo, hash_arquivo)
+    videoaulas.sincronizar_disco(arquivo)
+    return total
+
+
+def medir(laco, url, destino, usar_hash, com_tracemalloc):
+    hash_arquivo = hashlib.sha256() if usar_hash else None
+    resposta = videoaulas.requisitar("GET", url, stream=True)
+    resposta.raise_for_status()
+    if com_tracemalloc:
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+    inicio_cpu = time.process_time()
+    inicio = time.perf_counter()
+    with open(destino, "wb") as arquivo:
+        total = laco(resposta, arquivo, hash_arquivo)
+    resultado = {"segundos": time.perf_counter() - inicio, "cpu_segundos": time.process_time() - inicio_cpu, "bytes": total}
+    if com_tracemalloc:
+        resultado["pico_alocado_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    resposta.close()
+    os.remove(destino)
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da gravação de downloads (laço antigo x otimizado).")
+    parser.add_argument("--tamanho-mb", type=int, default=256)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--porta", type=int, default=8799)
+    parser.add_argument("--hash", action="store_true", help="inclui o SHA-256 incremental nos dois laços")
+    parser.add_argument("--fsync", default="final", choices=["nunca", "final", "periodico"])
+    parser.add_argument("--pasta", default=tempfile.gettempdir(), help="onde gravar os arquivos temporários")
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    args = parser.parse_args()
+
+    videoaulas.POLITICA_FSYNC = args.fsync
+    tamanho = args.tamanho_mb * 1024 * 1024
+    pronto = multiprocessing.Event()
+    servidor = multiprocessing.Process(target=servir, args=(args.porta, tamanho, pronto), daemon=True)
+    servidor.start()
+    pronto.wait(10)
+    url = f"http://127.0.0.1:{args.porta}/video.mp4"
+    destino = os.path.join(args.pasta, "benchmark_escrita.bin")
+
+    resultados = {}
+    try:
+        for nome, laco in (("iter_content (anterior)", laco_anterior), ("gravar_corpo_resposta", laco_otimizado)):
+            medir(laco, url, destino, args.hash, False)  # aquecimento (conexão, cache de páginas)
+            tempos = [medir(laco, url, destino, args.hash, False) for _ in range(args.repeticoes)]
+            memoria = medir(laco, url, destino, args.hash, True)
+            resultados[nome] = {
+                "segundos": statistics.median(t["segundos"] for t in tempos),
+                "cpu_segundos": statistics.median(t["cpu_segundos"] for t in tempos),
+                "mb_s": args.tamanho_mb / statistics.median(t["segundos"] for t in tempos),
+                "pico_alocado_bytes": memoria["pico_alocado_bytes"],
+            }
+    finally:
+        servidor.terminate()
+
+    print(f"📊 {args.tamanho_mb} MB, mediana de {args.repeticoes} repetições, hash={'sim' if args.hash else 'não'}, fsync={args.fsync}")
+    print(f"{'laço':<26}{'tempo (s)':>11}{'CPU (s)':>10}{'MB/s':>10}{'pico alocado':>15}")
+    for nome, r in resultados.items():
+        print(f"{nome:<26}{r['segundos']:>11.3f}{r['cpu_segundos']:>10.3f}{r['mb_s']:>10.1f}{r['pico_alocado_bytes'] / 1024:>12.0f} KB")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"parametros": vars(args), "resultados": resultados}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
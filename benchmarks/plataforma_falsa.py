@@ -0,0 +1,500 @@
+"""
+Réplica local da plataforma de videoaulas, para medir o script sem acessar o site real.
+
+Reproduz só o que extrair_tempo_ou_baixar_videoaulas.py usa:
+- tela de login (campos loginField/passwordField e botão 'Continuar') num host diferente
+  do site, que devolve para o site com um token e cria o cookie de sessão;
+- painel do curso como SPA: 'a.Collapse-header' com 'h2.SectionTitle' e 'p.sc-gZMcBi';
+  ao expandir, '.StyledScrollbars.ListVideos-items a.VideoItem' com '.VideoItem-info-title';
+  o clique num vídeo troca a URL com pushState (o driver.back() volta para a lista sem recarregar);
+- página do vídeo com '.video-react video', o 'strong' "Opções de download" e, ao clicar nele,
+  os links 'div.sc-Rmtcm.cKiCd a.Button.-small' em 720p/480p/360p;
+- o modal 'beamerPushModalContent' na primeira abertura do painel, injetado por um script de
+  terceiro (/terceiros/beamer/), junto com o widget do getsitecontrol, uma imagem de capa e uma
+  fonte, para o perfil enxuto do navegador ter o que bloquear;
+- a API JSON que o painel consome (curso e detalhe de aula), útil para o MODO_API;
+- MP4 gerados na hora com o tamanho configurado (ftyp + moov com mvhd/tkhd + mdat),
+  com suporte a HEAD, Range e ETag.
+
+Uso:
+    python benchmarks/plataforma_falsa.py --videos 100 --videos-por-aula 10 --tamanho-mb 2
+
+E no script, aponte as URLs para a plataforma (os valores são mostrados ao iniciar):
+    URL_LOGIN, BASE_SITE e URL_AULAS
+"""
+
+import argparse
+import html
+import json
+import random
+import re
+import secrets
+import struct
+import time
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlparse
+
+CURSO_ID = 1000
+PRIMEIRA_AULA_ID = 2000000
+PRIMEIRO_VIDEO_ID = 3000000
+RESOLUCOES = {"720p": (1280, 720, 1.0), "480p": (854, 480, 0.6), "360p": (640, 360, 0.4)}
+HOST_LOGIN = "localhost"
+HOST_SITE = "127.0.0.1"
+
+
+# ======= CONTEÚDO DO CURSO =======
+def montar_curso(num_videos, videos_por_aula):
+    """
+    Gera a estrutura do curso: lista de aulas {id, nome, conteudo, videos}, com 'videos_por_aula'
+    vídeos em cada (a última aula fica com o resto). Durações são fixas por vídeo (semente = id).
+    """
+    aulas = []
+    for numero_aula, inicio in enumerate(range(0, num_videos, videos_por_aula)):
+        aula_id = PRIMEIRA_AULA_ID + numero_aula
+        videos = []
+        for numero_video in range(inicio, min(inicio + videos_por_aula, num_videos)):
+            video_id = PRIMEIRO_VIDEO_ID + numero_video
+            videos.append({
+                "id": video_id,
+                "titulo": f"Tópico {numero_video - inicio + 1:02d} - Assunto {numero_video + 1:04d}",
+                "duracao": random.Random(video_id).randint(120, 3600),
+            })
+        aulas.append({
+            "id": aula_id,
+            "nome": f"Aula {numero_aula:02d}",
+            "conteudo": f"Conteúdo da aula {numero_aula:02d}",
+            "videos": videos,
+        })
+    return aulas
+
+
+# ======= MP4 SINTÉTICO =======
+def caixa(tipo, conteudo):
+    return struct.pack(">I4s", 8 + len(conteudo), tipo) + conteudo
+
+
+def montar_moov(duracao_s, largura, altura, escala_tempo=1000):
+    matriz = struct.pack(">9I", 0x10000, 0, 0, 0, 0x10000, 0, 0, 0, 0x40000000)
+    mvhd = caixa(b"mvhd", struct.pack(">I4I", 0, 0, 0, escala_tempo, duracao_s * escala_tempo)
+                 + struct.pack(">IH10x", 0x10000, 0x100) + matriz + bytes(24) + struct.pack(">I", 2))
+    tkhd = caixa(b"tkhd", struct.pack(">I5I8x", 3, 0, 0, 1, 0, duracao_s * escala_tempo)
+                 + struct.pack(">hhH2x", 0, 0, 0) + matriz + struct.pack(">II", largura << 16, altura << 16))
+    return caixa(b"moov", mvhd + caixa(b"trak", tkhd))
+
+
+def montar_mp4(duracao_s, resolucao, tamanho_total, moov_no_fim=False):
+    """
+    Retorna as partes do arquivo: lista de bytes ou inteiros (quantidade de zeros do mdat),
+    sem materializar o mdat em memória. O arquivo final tem exatamente 'tamanho_total' bytes
+    (ou o mínimo para caber os cabeçalhos).
+    """
+    largura, altura, _ = RESOLUCOES[resolucao]
+    ftyp = caixa(b"ftyp", b"isom" + struct.pack(">I", 0x200) + b"isommp41")
+    moov = montar_moov(duracao_s, largura, altura)
+    tamanho_mdat = max(8, tamanho_total - len(ftyp) - len(moov))
+    mdat = struct.pack(">I4s", tamanho_mdat, b"mdat")
+    if moov_no_fim:
+        return [ftyp, mdat, tamanho_mdat - 8, moov]
+    return [ftyp, moov, mdat, tamanho_mdat - 8]
+
+
+def tamanho_partes(partes):
+    return sum(parte if isinstance(parte, int) else len(parte) for parte in partes)
+
+
+def gerar_faixa(partes, inicio, fim, bloco=256 * 1024):
+    """
+    Gera os bytes [inicio, fim] do arquivo descrito por 'partes', em blocos de até 'bloco'.
+    """
+    zeros = bytes(bloco)
+    posicao = 0
+    for parte in partes:
+        tamanho = parte if isinstance(parte, int) else len(parte)
+        a, b = max(inicio, posicao), min(fim + 1, posicao + tamanho)
+        if a < b:
+            if isinstance(parte, int):
+                for c in range(a, b, bloco):
+                    yield zeros[:min(bloco, b - c)]
+            else:
+                yield parte[a - posicao:b - posicao]
+        posicao += tamanho
+
+
+# ======= PÁGINAS =======
+PAGINA_LOGIN = """<!doctype html>
+<html><head><meta charset="utf-8"><title>Entrar</title></head>
+<body>
+<form method="post" action="/login?target={target}">
+  <label>E-mail <input type="email" name="loginField" autocomplete="username"></label>
+  <label>Senha <input type="password" name="passwordField" autocomplete="current-password"></label>
+  <button type="submit">Continuar</button>
+</form>
+</body></html>
+"""
+
+PAGINA_CURSO = """<!doctype html>
+<html><head><meta charset="utf-8"><title>Curso {curso_id}</title>
+<style>
+  @font-face {{ font-family: "Plataforma"; src: url("/static/plataforma.woff2?v=3") format("woff2"); }}
+  body {{ font-family: "Plataforma", sans-serif; margin: 0; padding-top: 120px; }}
+  .Capa {{ display: block; width: 100%; height: 100px; object-fit: cover; }}
+  .Collapse-header {{ display: block; padding: 12px; border-bottom: 1px solid #ccc; color: inherit; text-decoration: none; }}
+  .SectionTitle {{ margin: 0; font-size: 18px; }}
+  .VideoItem {{ display: block; padding: 8px 24px; }}
+  #beamerPushModalContent {{ position: fixed; top: 10px; right: 10px; background: #fff; border: 1px solid #999; padding: 16px; z-index: 10; }}
+  .Button {{ margin-right: 8px; }}
+</style></head>
+<body>
+<img class="Capa" src="/static/capa.jpg?v=3" alt="">
+<div id="aulas"></div>
+<div id="player"></div>
+<script>
+const CURSO = {curso_id};
+const BASE = location.pathname.replace(/\\/aulas(\\/.*)?$/, "/aulas");
+const cacheAulas = new Map();
+
+async function api(url) {{
+  const resposta = await fetch(url, {{credentials: "same-origin", headers: {{"Accept": "application/json"}}}});
+  return (await resposta.json()).data;
+}}
+
+async function obterAula(id) {{
+  if (!cacheAulas.has(id)) cacheAulas.set(id, await api("/api/v3/aulas/" + id));
+  return cacheAulas.get(id);
+}}
+
+function elemento(tag, classe, texto) {{
+  const el = document.createElement(tag);
+  if (classe) el.className = classe;
+  if (texto !== undefined) el.textContent = texto;
+  return el;
+}}
+
+async function alternarAula(id, bloco) {{
+  const aberta = bloco.querySelector(".ListVideos-items");
+  document.querySelectorAll(".ListVideos-items").forEach(function (lista) {{ lista.remove(); }});
+  if (aberta) return;
+  const aula = await obterAula(id);
+  const itens = elemento("div", "StyledScrollbars ListVideos-items");
+  aula.videos.forEach(function (video) {{
+    const link = elemento("a", "VideoItem");
+    link.href = BASE + "/" + id + "/videos/" + video.id;
+    const info = elemento("div", "VideoItem-info");
+    info.appendChild(elemento("span", "VideoItem-info-title", video.titulo));
+    link.appendChild(info);
+    link.addEventListener("click", function (evento) {{
+      evento.preventDefault();
+      history.pushState({{}}, "", link.href);
+      rotear();
+    }});
+    itens.appendChild(link);
+  }});
+  bloco.appendChild(itens);
+}}
+
+async function mostrarVideo(aulaId, videoId) {{
+  const player = document.getElementById("player");
+  const aula = await obterAula(aulaId);
+  const video = aula.videos.find(function (v) {{ return String(v.id) === videoId; }});
+  if (!video) {{ player.textContent = "Vídeo não encontrado"; return; }}
+  player.innerHTML = "";
+  const envoltorio = elemento("div", "video-react");
+  const tag = document.createElement("video");
+  tag.preload = "metadata";
+  tag.src = video.resolucoes["360p"];
+  envoltorio.appendChild(tag);
+  player.appendChild(envoltorio);
+  player.appendChild(elemento("h3", "", video.titulo));
+  const opcoes = elemento("div", "DownloadOptions");
+  const titulo = elemento("strong", "", "Opções de download");
+  titulo.addEventListener("click", function () {{
+    if (opcoes.querySelector(".sc-Rmtcm")) return;
+    const links = elemento("div", "sc-Rmtcm cKiCd");
+    Object.keys(video.resolucoes).forEach(function (resolucao) {{
+      const link = elemento("a", "Button -small", resolucao);
+      link.href = video.resolucoes[resolucao];
+      links.appendChild(link);
+    }});
+    opcoes.appendChild(links);
+  }});
+  opcoes.appendChild(titulo);
+  player.appendChild(opcoes);
+}}
+
+function rotear() {{
+  const player = document.getElementById("player");
+  player.innerHTML = "";
+  const rota = location.pathname.match(/\\/aulas\\/(\\d+)\\/videos\\/(\\d+)/);
+  if (rota) mostrarVideo(Number(rota[1]), rota[2]);
+}}
+
+async function iniciar() {{
+  const curso = await api("/api/v3/cursos/" + CURSO);
+  const lista = document.getElementById("aulas");
+  curso.aulas.forEach(function (aula) {{
+    const bloco = elemento("div", "Collapse");
+    const cabecalho = elemento("a", "Collapse-header");
+    cabecalho.href = "#";
+    cabecalho.appendChild(elemento("h2", "SectionTitle", aula.nome));
+    cabecalho.appendChild(elemento("p", "sc-gZMcBi", aula.conteudo));
+    cabecalho.addEventListener("click", function (evento) {{
+      evento.preventDefault();
+      alternarAula(aula.id, bloco);
+    }});
+    bloco.appendChild(cabecalho);
+    lista.appendChild(bloco);
+  }});
+  rotear();
+}}
+
+window.addEventListener("popstate", rotear);
+iniciar();
+</script>
+<script src="/terceiros/beamer/embed.js" async></script>
+<script src="/terceiros/getsitecontrol/widget.js" async></script>
+</body></html>
+"""
+
+# Scripts de terceiros: o Beamer abre o modal de novidades na primeira visita da aba e o
+# getsitecontrol põe um widget fixo no rodapé
+SCRIPT_BEAMER = """
+(function () {
+  if (sessionStorage.getItem("beamerVisto")) return;
+  const modal = document.createElement("div");
+  modal.id = "beamerPushModalContent";
+  modal.innerHTML = "<p>Novidades da plataforma</p><button type='button'>Fechar</button>";
+  document.body.appendChild(modal);
+  modal.querySelector("button").addEventListener("click", function () {
+    sessionStorage.setItem("beamerVisto", "1");
+    modal.remove();
+  });
+})();
+"""
+
+SCRIPT_GETSITECONTROL = """
+(function () {
+  const widget = document.createElement("getsitecontrol-widget");
+  widget.style.cssText = "position: fixed; bottom: 0; left: 0; right: 0; height: 80px; background: #fc0; z-index: 20;";
+  widget.textContent = "Assine a newsletter";
+  document.body.appendChild(widget);
+})();
+"""
+
+# Capa e fonte: bytes quaisquer, só pelo peso que somam ao carregamento da página
+TAMANHO_CAPA = 300 * 1024
+TAMANHO_FONTE = 60 * 1024
+
+
+# ======= SERVIDOR =======
+class PlataformaFalsa(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, endereco, num_videos=10, videos_por_aula=10, tamanho_bytes=1024 * 1024,
+                 latencia_s=0.0, moov_no_fim=False):
+        super().__init__(endereco, ManipuladorPlataforma)
+        self.aulas = montar_curso(num_videos, videos_por_aula)
+        self.videos = {video["id"]: video for aula in self.aulas for video in aula["videos"]}
+        self.tamanho_bytes = tamanho_bytes
+        self.latencia_s = latencia_s
+        self.moov_no_fim = moov_no_fim
+        self.sessoes = set()
+
+    def urls(self):
+        """
+        Valores de URL_LOGIN, BASE_SITE e URL_AULAS para apontar o script para esta plataforma.
+        """
+        porta = self.server_address[1]
+        base_site = f"http://{HOST_SITE}:{porta}"
+        url_aulas = f"{base_site}/app/dashboard/cursos/{CURSO_ID}/aulas"
+        return {
+            "URL_LOGIN": f"http://{HOST_LOGIN}:{porta}/login?target={quote(url_aulas, safe='')}",
+            "BASE_SITE": base_site,
+            "URL_AULAS": url_aulas,
+        }
+
+
+class ManipuladorPlataforma(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "PlataformaFalsa/1.0"
+
+    def log_message(self, *args):
+        pass
+
+    # ----- respostas -----
+    def responder(self, status, corpo=b"", tipo="text/html; charset=utf-8", cabecalhos=None):
+        if isinstance(corpo, str):
+            corpo = corpo.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(corpo)))
+        for nome, valor in (cabecalhos or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(corpo)
+
+    def responder_json(self, status, dados):
+        self.responder(status, json.dumps(dados, ensure_ascii=False), "application/json; charset=utf-8")
+
+    def redirecionar(self, destino, status=302, cabecalhos=None):
+        self.responder(status, "", cabecalhos={"Location": destino, **(cabecalhos or {})})
+
+    def autenticado(self):
+        cookie = SimpleCookie(self.headers.get("Cookie", ""))
+        return "sessionid" in cookie and cookie["sessionid"].value in self.server.sessoes
+
+    def base_site(self):
+        return f"http://{HOST_SITE}:{self.server.server_address[1]}"
+
+    # ----- rotas -----
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        if self.server.latencia_s:
+            time.sleep(self.server.latencia_s)
+        url = urlparse(self.path)
+        caminho, params = url.path, parse_qs(url.query)
+
+        if caminho == "/login":
+            target = params.get("target", [f"{self.base_site()}/app/dashboard/cursos/{CURSO_ID}/aulas"])[0]
+            return self.responder(200, PAGINA_LOGIN.format(target=html.escape(quote(target, safe=""))))
+        if caminho == "/accounts/login/":
+            # Volta do login: troca o token pelo cookie de sessão do site
+            token = params.get("token", [""])[0]
+            if token not in self.server.sessoes:
+                return self.redirecionar(f"http://{HOST_LOGIN}:{self.server.server_address[1]}/login")
+            destino = params.get("next", [f"/app/dashboard/cursos/{CURSO_ID}/aulas"])[0]
+            return self.redirecionar(destino, cabecalhos={"Set-Cookie": f"sessionid={token}; Path=/; HttpOnly"})
+        if caminho == "/robots.txt":
+            return self.responder(200, "User-agent: *\nDisallow:\n", "text/plain")
+        if caminho.startswith("/media/"):
+            return self.servir_video(caminho)
+        if caminho == "/terceiros/beamer/embed.js":
+            return self.responder(200, SCRIPT_BEAMER, "application/javascript")
+        if caminho == "/terceiros/getsitecontrol/widget.js":
+            return self.responder(200, SCRIPT_GETSITECONTROL, "application/javascript")
+        if caminho == "/static/capa.jpg":
+            return self.responder(200, bytes(TAMANHO_CAPA), "image/jpeg", {"Cache-Control": "no-store"})
+        if caminho == "/static/plataforma.woff2":
+            return self.responder(200, bytes(TAMANHO_FONTE), "font/woff2", {"Cache-Control": "no-store"})
+        if caminho.startswith("/api/"):
+            return self.servir_api(caminho)
+
+        rota = re.fullmatch(r"/app/dashboard/cursos/(\d+)/aulas(/\d+/videos/\d+)?/?", caminho)
+        if rota:
+            if not self.autenticado():
+                destino = quote(self.base_site() + self.path, safe="")
+                return self.redirecionar(f"http://{HOST_LOGIN}:{self.server.server_address[1]}/login?target={destino}")
+            return self.responder(200, PAGINA_CURSO.format(curso_id=int(rota.group(1))))
+        self.responder(404, "não encontrado", "text/plain; charset=utf-8")
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/login":
+            return self.responder(404, "não encontrado", "text/plain; charset=utf-8")
+        tamanho = int(self.headers.get("Content-Length", 0) or 0)
+        campos = parse_qs(self.rfile.read(tamanho).decode("utf-8"))
+        if not campos.get("loginField") or not campos.get("passwordField"):
+            return self.responder(200, PAGINA_LOGIN.format(target=""))
+        token = secrets.token_hex(16)
+        self.server.sessoes.add(token)
+        target = parse_qs(url.query).get("target", [f"{self.base_site()}/app/dashboard/cursos/{CURSO_ID}/aulas"])[0]
+        self.redirecionar(f"{self.base_site()}/accounts/login/?token={token}&next={quote(target, safe='')}", status=303)
+
+    def servir_api(self, caminho):
+        if not self.autenticado():
+            return self.responder_json(401, {"erro": "não autenticado"})
+        rota = re.fullmatch(r"/api/v3/(cursos|aulas)/(\d+)", caminho)
+        if not rota:
+            return self.responder_json(404, {"erro": "não encontrado"})
+        tipo, identificador = rota.group(1), int(rota.group(2))
+        if tipo == "cursos":
+            aulas = [{"id": a["id"], "nome": a["nome"], "conteudo": a["conteudo"]} for a in self.server.aulas]
+            return self.responder_json(200, {"data": {"id": identificador, "nome": f"Curso {identificador}", "aulas": aulas}})
+        aula = next((a for a in self.server.aulas if a["id"] == identificador), None)
+        if aula is None:
+            return self.responder_json(404, {"erro": "aula não encontrada"})
+        videos = [
+            {
+                "id": video["id"],
+                "titulo": video["titulo"],
+                "duracao": video["duracao"],
+                "resolucoes": {res: f"{self.base_site()}/media/{video['id']}_{res}.mp4" for res in RESOLUCOES},
+            }
+            for video in aula["videos"]
+        ]
+        self.responder_json(200, {"data": {"id": aula["id"], "nome": aula["nome"], "videos": videos}})
+
+    def servir_video(self, caminho):
+        rota = re.fullmatch(r"/media/(\d+)_(\d+p)\.mp4", caminho)
+        video = self.server.videos.get(int(rota.group(1))) if rota else None
+        if video is None or rota.group(2) not in RESOLUCOES:
+            return self.responder(404, "não encontrado", "text/plain; charset=utf-8")
+        resolucao = rota.group(2)
+        tamanho = int(self.server.tamanho_bytes * RESOLUCOES[resolucao][2])
+        partes = montar_mp4(video["duracao"], resolucao, tamanho, self.server.moov_no_fim)
+        tamanho = tamanho_partes(partes)
+        etag = f'"{video["id"]}-{resolucao}-{tamanho}"'
+
+        inicio, fim, status = 0, tamanho - 1, 200
+        faixa = re.fullmatch(r"bytes=(\d*)-(\d*)", self.headers.get("Range", "").strip())
+        if faixa and (faixa.group(1) or faixa.group(2)):
+            if faixa.group(1):
+                inicio = int(faixa.group(1))
+                fim = min(int(faixa.group(2)), tamanho - 1) if faixa.group(2) else tamanho - 1
+            else:
+                inicio = max(0, tamanho - int(faixa.group(2)))
+            if inicio >= tamanho or inicio > fim:
+                return self.responder(416, "", "text/plain", {"Content-Range": f"bytes */{tamanho}"})
+            status = 206
+
+        self.send_response(status)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Length", str(fim - inicio + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {inicio}-{fim}/{tamanho}")
+        self.end_headers()
+        if self.command == "HEAD":
+            return
+        try:
+            for bloco in gerar_faixa(partes, inicio, fim):
+                self.wfile.write(bloco)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # cliente desistiu (ex.: sondagem de duração que só precisava do começo)
+
+
+def criar_plataforma(porta=0, num_videos=10, videos_por_aula=10, tamanho_bytes=1024 * 1024, latencia_s=0.0, moov_no_fim=False):
+    """
+    Cria a plataforma escutando em 'porta' (0 = porta livre escolhida pelo sistema).
+    Chame serve_forever() (de preferência em outro processo ou thread) para atendê-la.
+    """
+    return PlataformaFalsa(("127.0.0.1", porta), num_videos, videos_por_aula, tamanho_bytes, latencia_s, moov_no_fim)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plataforma de videoaulas falsa para testes e benchmarks.")
+    parser.add_argument("--porta", type=int, default=8800)
+    parser.add_argument("--videos", type=int, default=10, help="total de vídeos do curso")
+    parser.add_argument("--videos-por-aula", type=int, default=10)
+    parser.add_argument("--tamanho-mb", type=float, default=1.0, help="tamanho do vídeo em 720p (480p e 360p são menores)")
+    parser.add_argument("--latencia-ms", type=float, default=0.0, help="atraso acrescentado a cada requisição")
+    parser.add_argument("--moov-no-fim", action="store_true", help="grava o moov depois do mdat")
+    args = parser.parse_args()
+
+    plataforma = criar_plataforma(args.porta, args.videos, args.videos_por_aula, int(args.tamanho_mb * 1024 * 1024),
+                                  args.latencia_ms / 1000, args.moov_no_fim)
+    print(f"🧪 Plataforma falsa com {args.videos} vídeos em {len(plataforma.aulas)} aulas. Use no script:")
+    for nome, valor in plataforma.urls().items():
+        print(f'   {nome} = "{valor}"')
+    try:
+        plataforma.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -11,16 +11,44 @@ from selenium.common.exceptions import (
 )
 
 import time
+import math
 import csv
 import re
 import threading
+import queue
+from collections import deque
+import struct
+import mmap
+import sqlite3
+import json
+import functools
+import random
+import hashlib
+import http.client
+import ctypes
+import argparse
+import shutil
+import signal
+import subprocess
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
 import os
 import requests
 from urllib.parse import urlparse
+from datetime import datetime
 
 import sys
 
+try:
+    import fcntl  # travas de arquivo entre processos (Linux/macOS)
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt  # travas de arquivo entre processos (Windows)
+except ImportError:
+    msvcrt = None
+
 from dotenv import load_dotenv
 
 # ======= CONFIGURAÇÕES =======
@@ -36,6 +64,167 @@ URL_AULAS = "https://www.estrategiaconcursos.com.br/app/dashboard/cursos/226005/
 ARQUIVO_SAIDA = "Direito Administrativo.csv"
 PASTA_DESTINO = "videos_baixados"
 
+# Quantidade de downloads simultâneos enquanto o navegador continua resolvendo os links
+NUM_WORKERS_DOWNLOAD = 4
+
+# Quantas vezes um download interrompido é retomado (a partir do .part) antes de desistir
+TENTATIVAS_DOWNLOAD = 3
+SUFIXO_PARCIAL = ".part"
+# O download segmentado grava num arquivo pré-alocado com o tamanho final e cheio de "buracos": ele tem
+# nome próprio para o tamanho dele nunca ser tomado como offset da retomada sequencial do .part
+SUFIXO_PARCIAL_SEGMENTADO = ".seg.part"
+
+# Download segmentado: divide cada arquivo em N faixas de bytes baixadas em conexões paralelas.
+# Use 1 para desativar (um único stream por arquivo).
+SEGMENTOS_POR_ARQUIVO = 1
+TAMANHO_MINIMO_SEGMENTADO = 8 * 1024 * 1024  # arquivos menores que isso vão por um único stream
+
+# Gravação dos downloads: lê o corpo da resposta direto num buffer reutilizado (sem criar um
+# objeto bytes por bloco). O bloco cresce/encolhe entre os limites para cada leitura levar
+# por volta de ALVO_TEMPO_BLOCO_S. Use False para voltar ao iter_content de blocos fixos.
+GRAVACAO_OTIMIZADA = True
+TAMANHO_BLOCO_PADRAO = 1024 * 1024  # bloco fixo do iter_content (gravação não otimizada)
+TAMANHO_BLOCO_MIN = 256 * 1024
+TAMANHO_BLOCO_MAX = 4 * 1024 * 1024
+ALVO_TEMPO_BLOCO_S = 0.25
+PREALOCAR_ARQUIVOS = True  # reserva o espaço do arquivo no disco a partir do content-length
+# Quando forçar a gravação em disco (fsync): "nunca", "final" (antes de renomear o .part)
+# ou "periodico" (a cada INTERVALO_FSYNC_BYTES e no final)
+POLITICA_FSYNC = "final"
+INTERVALO_FSYNC_BYTES = 64 * 1024 * 1024
+
+# Duração (opção 1): lê só o cabeçalho do MP4 (caixas moov/mvhd) via HTTP Range em vez de tocar o vídeo
+DURACAO_VIA_RANGE = True
+NUM_SONDAGENS_DURACAO = 16  # sondagens de duração simultâneas
+TAMANHO_SONDA_MP4 = 64 * 1024  # bytes lidos por requisição Range ao procurar o moov
+
+# Varredura local (opção 4 / --varrer-downloads): duração, resolução e bitrate lidos dos MP4 já baixados
+# (mmap + caixas moov/mvhd/tkhd), com a estrutura das aulas recuperada dos nomes dos arquivos
+NUM_PROCESSOS_VARREDURA = 0  # 0 = um processo por CPU
+
+# Índice local (SQLite) com aulas, vídeos, durações e links já resolvidos, por curso
+ARQUIVO_INDICE = "indice_cursos.sqlite3"
+MODO_INCREMENTAL = True  # só reabre os vídeos de aulas que mudaram desde a última execução
+USAR_INDICE_SEM_NAVEGADOR = False  # se o índice já estiver completo, nem abre o navegador
+# Aulas cujo título/subtítulo não mudaram e que foram conferidas há menos de VALIDADE_INDICE_HORAS
+# nem são expandidas; depois disso a lista de vídeos é relida para pegar vídeos novos ou renomeados
+VALIDADE_INDICE_HORAS = 24
+
+# Durações (opção 1): cada linha vai para o CSV assim que o vídeo termina, e um checkpoint
+# ('<ARQUIVO_SAIDA>.checkpoint.json') guarda a última aula/vídeo concluídos.
+# Com RETOMAR_COLETA (ou --resume no modo lote), a coleta continua de onde a execução anterior parou.
+RETOMAR_COLETA = False
+SUFIXO_CHECKPOINT = ".checkpoint.json"
+
+# Extrai a hierarquia (títulos, hrefs, links de download) com um único execute_script por consulta,
+# em vez de uma chamada ao chromedriver por elemento/campo. False volta ao modo elemento a elemento.
+USAR_SNAPSHOT_DOM = True
+
+# Seletores alternativos (SELECTORES): todos os candidatos são testados num único script por sondagem e o
+# que venceu fica salvo para ser testado primeiro na próxima execução
+ARQUIVO_SELETORES_APRENDIDOS = ".seletores_aprendidos.json"
+INTERVALO_SONDAGEM_S = 0.1  # segundos entre sondagens enquanto a página renderiza
+
+# Navegação direta: colhe a URL de cada vídeo (/aulas/<id>/videos/<id>) uma vez e visita essas URLs
+# com driver.get, sem clicar no vídeo, sem driver.back() e sem reabrir as abas das aulas.
+NAVEGACAO_DIRETA = True
+
+# Rastreamento por fase: grava um trace no formato do Chrome (chrome://tracing / Perfetto)
+# e imprime um resumo (total, p50, p95 e tempo em time.sleep fixo) ao final da execução.
+# É diagnóstico: ligue só para investigar onde o tempo é gasto
+RASTREAMENTO_ATIVO = False
+ARQUIVO_TRACE = "trace_execucao.json"
+
+# Rastreamento em fatias: com mais de 1, faz login uma vez e divide as aulas entre N navegadores
+# (um processo por navegador), juntando os resultados na ordem original das aulas
+NUM_NAVEGADORES = 1
+NAVEGADORES_HEADLESS = True  # os navegadores das fatias não precisam de interação manual
+
+# Sessão salva após o login (cookies + localStorage) para pular o login nas próximas execuções
+ARQUIVO_SESSAO = ".sessao_navegador.json"
+REUTILIZAR_SESSAO = True
+TIMEOUT_VALIDACAO_SESSAO = 10  # segundos para a lista de aulas aparecer com a sessão restaurada
+
+# Perfil enxuto do navegador: driver.get retorna no DOMContentLoaded ("eager"), imagens e fontes não
+# são baixadas e widgets de terceiros/rastreadores são bloqueados pelo DevTools antes de qualquer página
+# carregar (o vídeo do player continua liberado). Páginas que dependem desses recursos podem quebrar,
+# por isso vem desligado; ligue aqui ou com --perfil-enxuto no modo lote. Compare com: --comparar-perfis
+PERFIL_ENXUTO = False
+ESTRATEGIA_CARREGAMENTO = "eager"
+URLS_BLOQUEADAS = [
+    # Widgets que limpar_popups_ou_overlays e fechar_modal_se_existir removeriam depois
+    "*getsitecontrol*", "*beamer*",
+    # Analytics e rastreadores
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*facebook.net*",
+    "*hotjar*", "*clarity.ms*", "*hubspot*", "*intercom*",
+    # Imagens e fontes, também com query de versão (ex.: "app.woff2?v=3")
+    *(padrao
+      for extensao in ("png", "jpg", "jpeg", "gif", "webp", "svg", "ico", "woff", "woff2", "ttf", "otf")
+      for padrao in (f"*.{extensao}", f"*.{extensao}?*")),
+]
+
+# Navegador residente: um Chrome logado fica aberto com depuração remota (--daemon) e as execuções
+# se anexam a ele numa aba nova (--anexar), sem pagar a abertura do Chrome nem o login a cada vez
+USAR_NAVEGADOR_RESIDENTE = False
+PORTA_DEPURACAO = 9222
+PASTA_PERFIL_RESIDENTE = ".perfil_navegador_residente"  # perfil próprio: cookies sobrevivem a um relançamento
+ARQUIVO_NAVEGADOR_RESIDENTE = ".navegador_residente.json"  # endereço, pid e tempos de início do daemon
+INTERVALO_VERIFICACAO_RESIDENTE_S = 15  # o daemon confere se o Chrome responde a cada N segundos
+INTERVALO_VERIFICACAO_SESSAO_S = 600  # e se a sessão ainda está logada a cada N segundos
+TIMEOUT_NAVEGADOR_RESIDENTE = 120  # segundos esperando um daemon (re)lançado ficar pronto
+
+# Cliente HTTP compartilhado (keep-alive, cookies do navegador, novas tentativas com backoff exponencial)
+TIMEOUT_CONEXAO = 10  # segundos para abrir a conexão
+TIMEOUT_LEITURA = 60  # segundos sem receber bytes
+TENTATIVAS_HTTP = 4
+BACKOFF_BASE = 0.5  # segundos; a espera máxima dobra a cada tentativa (com jitter aleatório)
+BACKOFF_MAXIMO = 30
+STATUS_REPETIVEIS = {429, 500, 502, 503, 504}
+
+# Modo API: captura (via log de rede do DevTools) o JSON que o próprio painel busca e, a partir daí,
+# monta a hierarquia e os links de download por HTTP, sem clicar na página
+MODO_API = False
+PASTA_CAPTURA_API = "captura_api"  # respostas gravadas (fixtures) e endpoints descobertos por curso
+URL_BASE_API = None  # ex.: "http://127.0.0.1:8000" para repetir as chamadas contra um servidor local de testes
+
+# Agendador de transferências: limite global de banda, limite por host, janelas de horário
+# e ajuste automático de quantos downloads ficam ativos (até NUM_WORKERS_DOWNLOAD)
+LIMITE_BANDA_MBPS = 0  # MB/s somando todos os downloads; 0 = sem limite
+MAX_DOWNLOADS_POR_HOST = 4
+JANELAS_DOWNLOAD = []  # ex.: [("22:00", "06:00")] para baixar só de madrugada; vazio = qualquer horário
+DOWNLOADS_ADAPTATIVOS = True  # aumenta/reduz os downloads ativos conforme a vazão medida
+INTERVALO_AJUSTE_S = 5  # segundos entre medições da vazão para o ajuste
+
+# Orçamento dos downloads de cada curso: com cota de disco e/ou prazo, a resolução de cada vídeo é escolhida
+# pelo tamanho das variantes (HEAD) e pela vazão medida para o curso inteiro caber, preferindo a maior
+# qualidade onde sobrar espaço. Sem cota nem prazo, vale a prioridade fixa (720p > 480p > 360p)
+COTA_DISCO_MB = 0  # 0 = sem cota
+PRAZO_DOWNLOADS_MIN = 0  # 0 = sem prazo
+VAZAO_ESTIMADA_MBPS = 5  # usada no primeiro plano, antes de haver vazão medida
+INTERVALO_REPLANEJAMENTO_S = 30
+
+# Manifesto de integridade (dentro de PASTA_DESTINO): hash SHA-256, tamanho, URL, resolução,
+# content-length e ETag de cada arquivo, calculados durante o download
+NOME_MANIFESTO = "manifesto.json"
+VERIFICAR_HASH_LOCAL = False  # na verificação, também recalcula o SHA-256 (lê todos os arquivos)
+
+# Armazém por conteúdo: cada vídeo (identificado pelo caminho da URL e pelo ETag, conferido depois pelo
+# SHA-256) é baixado uma única vez para PASTA_ARMAZEM; os nomes de cada curso viram hardlinks para ele
+# (cópia, se o sistema de arquivos não permitir hardlink entre as pastas)
+USAR_ARMAZEM_CONTEUDO = False
+PASTA_ARMAZEM = "armazem_videos"
+
+# Progresso dos downloads: os downloads só atualizam contadores; um único renderizador mostra
+# a visão consolidada a cada INTERVALO_PROGRESSO_S.
+# "terminal" = painel de várias linhas; "jsonl" = uma linha JSON por intervalo em ARQUIVO_METRICAS_JSONL;
+# "prometheus" = arquivo texto para o textfile collector do node_exporter em ARQUIVO_METRICAS_PROMETHEUS.
+# Fora de um terminal (saída redirecionada para arquivo/pipe) e nas fatias do modo paralelo, "terminal"
+# vira "jsonl": o painel não é desenhado no meio dos logs e o stdout fica só com as mensagens
+FORMATO_METRICAS = "terminal"
+ARQUIVO_METRICAS_JSONL = "metricas_downloads.jsonl"
+ARQUIVO_METRICAS_PROMETHEUS = "metricas_downloads.prom"  # o node_exporter só lê arquivos *.prom
+INTERVALO_PROGRESSO_S = 0.5
+
 # Seletores usados no script (centralizados para facilitar manutenção)
 SELECTORES = {
     "email": [
@@ -65,12 +254,146 @@ SELECTORES = {
     "titulo_video": ".VideoItem-info-title",
 }
 
+# ======= RASTREAMENTO DE FASES =======
+_SPANS = []  # (nome, categoria, inicio, duracao, thread, fase_pai)
+_TRAVA_SPANS = threading.Lock()
+_PILHA_FASES = threading.local()
+_INICIO_RASTREAMENTO = time.perf_counter()
+
+def fase_atual():
+    """
+    Retorna o nome da fase mais interna em andamento na thread atual (ou None).
+    """
+    pilha = getattr(_PILHA_FASES, "pilha", None)
+    return pilha[-1] if pilha else None
+
+def registrar_span(nome, categoria, inicio, duracao, fase_pai):
+    """
+    Guarda um intervalo medido (tempos em segundos a partir de time.perf_counter).
+    """
+    with _TRAVA_SPANS:
+        _SPANS.append((nome, categoria, inicio, duracao, threading.get_ident(), fase_pai))
+
+@contextmanager
+def medir_fase(nome):
+    """
+    Mede o tempo de um bloco de código como uma fase do rastreamento.
+    Fases podem ser aninhadas; os time.sleep feitos via dormir() são atribuídos à fase mais interna.
+    """
+    if not RASTREAMENTO_ATIVO:
+        yield
+        return
+    pilha = getattr(_PILHA_FASES, "pilha", None)
+    if pilha is None:
+        pilha = _PILHA_FASES.pilha = []
+    fase_pai = pilha[-1] if pilha else None
+    pilha.append(nome)
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        pilha.pop()
+        registrar_span(nome, "fase", inicio, time.perf_counter() - inicio, fase_pai)
+
+def rastrear(nome=None):
+    """
+    Decorador que mede cada chamada da função como uma fase (por padrão, com o nome da função).
+    """
+    def decorador(funcao):
+        nome_fase = nome or funcao.__name__
+
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            with medir_fase(nome_fase):
+                return funcao(*args, **kwargs)
+        return envolvida
+    return decorador
+
+def dormir(segundos):
+    """
+    time.sleep que conta como espera fixa da fase atual no resumo do rastreamento.
+    """
+    inicio = time.perf_counter()
+    time.sleep(segundos)
+    if RASTREAMENTO_ATIVO:
+        registrar_span("time.sleep", "sleep", inicio, time.perf_counter() - inicio, fase_atual())
+
+def percentil(valores_ordenados, p):
+    """
+    Percentil pelo método do posto mais próximo, sobre uma lista já ordenada.
+    """
+    if not valores_ordenados:
+        return 0.0
+    posicao = max(0, min(len(valores_ordenados) - 1, math.ceil(p / 100 * len(valores_ordenados)) - 1))
+    return valores_ordenados[posicao]
+
+def exportar_trace(caminho=ARQUIVO_TRACE):
+    """
+    Grava os spans no formato JSON do Chrome trace (eventos completos 'X', tempos em microssegundos).
+    """
+    with _TRAVA_SPANS:
+        spans = list(_SPANS)
+    eventos = [
+        {
+            "name": nome,
+            "cat": categoria,
+            "ph": "X",
+            "ts": round((inicio - _INICIO_RASTREAMENTO) * 1e6),
+            "dur": round(duracao * 1e6),
+            "pid": os.getpid(),
+            "tid": thread,
+            "args": {"fase_pai": fase_pai} if fase_pai else {},
+        }
+        for nome, categoria, inicio, duracao, thread, fase_pai in spans
+    ]
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": eventos, "displayTimeUnit": "ms"}, f)
+    print(f"🧾 Trace salvo em {caminho} ({len(eventos)} eventos)")
+
+def imprimir_resumo_fases():
+    """
+    Imprime, por fase: chamadas, tempo total, p50, p95 e quanto desse tempo foi time.sleep fixo.
+    Fases aninhadas contam no total de cada uma (ex.: clicar_elemento_com_rolagem dentro de realizar_login).
+    """
+    with _TRAVA_SPANS:
+        spans = list(_SPANS)
+    if not spans:
+        return
+
+    duracoes = {}
+    sleep_por_fase = {}
+    for nome, categoria, _, duracao, _, fase_pai in spans:
+        if categoria == "sleep":
+            sleep_por_fase[fase_pai] = sleep_por_fase.get(fase_pai, 0.0) + duracao
+        else:
+            duracoes.setdefault(nome, []).append(duracao)
+
+    print("\n📊 Resumo por fase (segundos):")
+    print(f"{'Fase':<42}{'Chamadas':>9}{'Total':>10}{'p50':>9}{'p95':>9}{'Sleep':>9}")
+    for nome, valores in sorted(duracoes.items(), key=lambda item: -sum(item[1])):
+        valores.sort()
+        print(
+            f"{nome[:41]:<42}{len(valores):>9}{sum(valores):>10.2f}"
+            f"{percentil(valores, 50):>9.2f}{percentil(valores, 95):>9.2f}{sleep_por_fase.get(nome, 0.0):>9.2f}"
+        )
+
+    total_execucao = time.perf_counter() - _INICIO_RASTREAMENTO
+    total_sleep = sum(sleep_por_fase.values())
+    print(f"⏱️ Execução: {total_execucao:.2f}s | em time.sleep fixo: {total_sleep:.2f}s "
+          f"| espera real/trabalho: {max(0.0, total_execucao - total_sleep):.2f}s")
+
 # ======= CONFIGURAÇÃO DO NAVEGADOR =======
-def iniciar_driver(headless=False):
+@rastrear()
+def iniciar_driver(headless=False, enxuto=None, registrar_rede=None, porta_depuracao=None, pasta_perfil=None):
     """
     Inicializa o driver do Chrome com opções básicas.
     Em headless, algumas interações manuais podem falhar — usar com cautela.
+    Com o perfil enxuto (padrão: PERFIL_ENXUTO, desligado), usa ESTRATEGIA_CARREGAMENTO e bloqueia URLS_BLOQUEADAS.
+    Com registrar_rede (padrão: MODO_API), liga o log de performance do DevTools (eventos Network.*).
+    Com porta_depuracao, o Chrome aceita outros clientes nessa porta (navegador residente).
     """
+    enxuto = PERFIL_ENXUTO if enxuto is None else enxuto
+    registrar_rede = MODO_API if registrar_rede is None else registrar_rede
     options = webdriver.ChromeOptions()
     if headless:
         options.add_argument("--headless=new")  # modo invisível / cuidado com headless e interação manual
@@ -78,10 +401,103 @@ def iniciar_driver(headless=False):
     options.add_argument("--disable-dev-shm-usage")
     options.add_argument("--no-sandbox")
     options.add_argument("--disable-blink-features=AutomationControlled")
+    if porta_depuracao:
+        options.add_argument(f"--remote-debugging-port={porta_depuracao}")
+    if pasta_perfil:
+        options.add_argument(f"--user-data-dir={os.path.abspath(pasta_perfil)}")
+    if registrar_rede:
+        # Log de performance do DevTools: traz os eventos Network.* com as chamadas XHR do painel
+        options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    if enxuto:
+        options.page_load_strategy = ESTRATEGIA_CARREGAMENTO
+        options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
     driver = webdriver.Chrome(options=options)
+    preparar_driver(driver, enxuto)
     return driver
 
+def preparar_driver(driver, enxuto):
+    """
+    Ajustes feitos em todo driver recém-criado ou anexado: bloqueio de URLs do perfil enxuto
+    (vale para a aba atual) e contador de round trips.
+    """
+    driver.urls_bloqueadas = []
+    if enxuto and URLS_BLOQUEADAS:
+        bloquear_urls(driver, URLS_BLOQUEADAS)
+    instalar_contador_round_trips(driver)
+
+def bloquear_urls(driver, padroes):
+    """
+    Bloqueia no DevTools as requisições cujas URLs casam com 'padroes' (curingas '*').
+    Vale para todas as páginas abertas depois nesta aba, antes de qualquer byte ser baixado.
+    """
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(padroes)})
+        driver.urls_bloqueadas = list(padroes)
+    except Exception as e:
+        print(f"⚠️ Não foi possível bloquear URLs pelo DevTools: {e}")
+
+def instalar_contador_round_trips(driver):
+    """
+    Envolve driver.execute para contar cada comando enviado ao chromedriver (cada um é
+    um round trip HTTP). Os totais ficam em driver.round_trips (total e por comando).
+    """
+    driver.round_trips = {"total": 0, "por_comando": {}, "ultimo_registro": 0}
+    execute_original = driver.execute
+
+    def execute_contando(driver_command, params=None):
+        contador = driver.round_trips
+        contador["total"] += 1
+        contador["por_comando"][driver_command] = contador["por_comando"].get(driver_command, 0) + 1
+        return execute_original(driver_command, params)
+
+    driver.execute = execute_contando
+
+def obter_driver(headless=False):
+    """
+    Driver para o fluxo principal: com USAR_NAVEGADOR_RESIDENTE, uma aba nova no navegador residente
+    (relançando-o se estiver fora do ar); se não der, um Chrome novo como antes.
+    """
+    if USAR_NAVEGADOR_RESIDENTE:
+        driver = anexar_navegador_residente(headless)
+        if driver is not None:
+            return driver
+        print("⚠️ Navegador residente indisponível, abrindo um navegador novo.")
+    return iniciar_driver(headless=headless)
+
+def liberar_driver(driver):
+    """
+    Encerra o driver do fluxo principal. Anexado ao navegador residente, fecha só a aba desta
+    execução e desconecta, deixando o navegador (e a sessão) abertos para a próxima.
+    """
+    if not getattr(driver, "residente", False):
+        driver.quit()
+        return
+    try:
+        driver.close()
+    except Exception:
+        pass
+    try:
+        # Com debuggerAddress o chromedriver não é dono do Chrome: o quit só encerra esta conexão
+        driver.quit()
+    except Exception:
+        pass
+    print("🔌 Desanexado do navegador residente (continua aberto).")
+
+def registrar_round_trips(driver, etapa):
+    """
+    Mostra quantos round trips ao chromedriver foram feitos desde o último registro.
+    """
+    contador = getattr(driver, "round_trips", None)
+    if contador is None:
+        return
+    parcial = contador["total"] - contador["ultimo_registro"]
+    contador["ultimo_registro"] = contador["total"]
+    modo = "snapshot" if USAR_SNAPSHOT_DOM else "elemento a elemento"
+    print(f"🔁 {parcial} round trips ao chromedriver em {etapa} ({modo}; total {contador['total']})")
+
 # ======= FUNÇÕES AUXILIARES =======
+@rastrear()
 def try_accept_alert(driver, short_wait=3):
     """
     Tenta aceitar alertas popup caso existam.
@@ -105,22 +521,129 @@ def try_accept_alert(driver, short_wait=3):
         except Exception:
             return False
 
+# Recebe [[by, seletor], ...] e devolve [índice, elemento] do primeiro candidato com um elemento
+# visível e habilitado (mesmo critério do EC.element_to_be_clickable), ou null
+JS_PRIMEIRO_CLICAVEL = """
+    var candidatos = arguments[0];
+    function buscar(tipo, seletor) {
+        if (tipo === 'xpath') {
+            var resultado = document.evaluate(seletor, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+            var lista = [];
+            for (var i = 0; i < resultado.snapshotLength; i++) lista.push(resultado.snapshotItem(i));
+            return lista;
+        }
+        if (tipo === 'link text' || tipo === 'partial link text') {
+            return Array.from(document.querySelectorAll('a')).filter(function (a) {
+                var texto = a.innerText.trim();
+                return tipo === 'link text' ? texto === seletor : texto.indexOf(seletor) !== -1;
+            });
+        }
+        if (tipo === 'id') seletor = '#' + CSS.escape(seletor);
+        else if (tipo === 'name') seletor = '[name="' + CSS.escape(seletor) + '"]';
+        else if (tipo === 'class name') seletor = '.' + CSS.escape(seletor);
+        else if (tipo !== 'css selector' && tipo !== 'tag name') throw new Error('estratégia não suportada: ' + tipo);
+        return Array.from(document.querySelectorAll(seletor));
+    }
+    function clicavel(el) {
+        if (el.disabled) return false;
+        var estilo = window.getComputedStyle(el);
+        return el.getClientRects().length > 0 && estilo.visibility !== 'hidden' && estilo.display !== 'none';
+    }
+    for (var i = 0; i < candidatos.length; i++) {
+        var elementos;
+        try {
+            elementos = buscar(candidatos[i][0], candidatos[i][1]);
+        } catch (e) {
+            continue;  // seletor inválido nesta página
+        }
+        for (var j = 0; j < elementos.length; j++) {
+            if (clicavel(elementos[j])) return [i, elementos[j]];
+        }
+    }
+    return null;
+"""
+# Estratégias do By que o JS_PRIMEIRO_CLICAVEL sabe traduzir
+ESTRATEGIAS_SELETOR = {By.ID, By.NAME, By.XPATH, By.CSS_SELECTOR, By.CLASS_NAME, By.TAG_NAME,
+                       By.LINK_TEXT, By.PARTIAL_LINK_TEXT}
+_SELETORES_APRENDIDOS = None  # chave da lista de seletores -> "by=seletor" que venceu por último
+_TRAVA_SELETORES = threading.Lock()
+
+def chave_seletores(locator_list):
+    """
+    Identifica uma lista de seletores pelo conteúdo (mudou a lista em SELECTORES, o aprendizado antigo é ignorado).
+    """
+    return " || ".join(f"{by}={sel}" for by, sel in locator_list)
+
+def carregar_seletores_aprendidos():
+    """
+    Deve ser chamado com _TRAVA_SELETORES adquirida.
+    """
+    global _SELETORES_APRENDIDOS
+    if _SELETORES_APRENDIDOS is None:
+        try:
+            with open(ARQUIVO_SELETORES_APRENDIDOS, encoding="utf-8") as f:
+                _SELETORES_APRENDIDOS = json.load(f)
+        except (OSError, ValueError):
+            _SELETORES_APRENDIDOS = {}
+    return _SELETORES_APRENDIDOS
+
+def ordenar_por_aprendizado(locator_list):
+    """
+    Coloca na frente o seletor que venceu da última vez; os demais mantêm a ordem de SELECTORES.
+    """
+    with _TRAVA_SELETORES:
+        vencedor = carregar_seletores_aprendidos().get(chave_seletores(locator_list))
+    return sorted(locator_list, key=lambda locator: f"{locator[0]}={locator[1]}" != vencedor)
+
+def aprender_seletor(locator_list, locator):
+    """
+    Registra o seletor vencedor da lista (o arquivo só é regravado quando o vencedor muda).
+    """
+    chave, vencedor = chave_seletores(locator_list), f"{locator[0]}={locator[1]}"
+    with _TRAVA_SELETORES:
+        aprendidos = carregar_seletores_aprendidos()
+        if aprendidos.get(chave) == vencedor:
+            return
+        aprendidos[chave] = vencedor
+        try:
+            gravar_json_atomico(ARQUIVO_SELETORES_APRENDIDOS, aprendidos)
+        except OSError as e:
+            print(f"⚠️ Não foi possível salvar os seletores aprendidos: {e}")
+
+def sondar_seletores(driver, locator_list):
+    """
+    Uma única sondagem: testa todos os seletores de uma vez, num só execute_script.
+    Retorna (locator, elemento) do primeiro clicável ou (None, None).
+    """
+    nao_suportados = [by for by, _ in locator_list if by not in ESTRATEGIAS_SELETOR]
+    if nao_suportados:
+        # No JS, um erro de seletor só pula o candidato: sem esta checagem o erro passaria calado
+        raise ValueError(f"Estratégia de seletor não suportada: {', '.join(map(str, nao_suportados))}")
+    candidatos = ordenar_por_aprendizado(locator_list)
+    try:
+        achado = driver.execute_script(JS_PRIMEIRO_CLICAVEL, [[by, sel] for by, sel in candidatos])
+    except Exception:
+        achado = None  # página trocando no meio da sondagem, alerta aberto etc.
+    if not achado:
+        return None, None
+    indice, elemento = achado
+    aprender_seletor(locator_list, candidatos[indice])
+    return candidatos[indice], elemento
+
+@rastrear()
 def find_clickable(driver, locator_list, timeout=20):
     """
     Tenta encontrar o primeiro elemento clicável dentre vários seletores.
+    Todos são testados juntos a cada INTERVALO_SONDAGEM_S (o vencedor anterior na frente), então a
+    espera é só o tempo de a página renderizar, sem fatias de timeout por seletor.
     Retorna o elemento ou None se não encontrado.
     """
-    deadline = time.time() + timeout
-    wait = WebDriverWait(driver, max(2, int(timeout // len(locator_list))))
-    for by, sel in locator_list:
-        try:
-            element = wait.until(EC.element_to_be_clickable((by, sel)))
-            return element
-        except Exception:
-            if time.time() > deadline:
-                break
-            continue
-    return None
+    limite = time.time() + timeout
+    while True:
+        _, elemento = sondar_seletores(driver, locator_list)
+        if elemento is not None or time.time() >= limite:
+            return elemento
+        time.sleep(INTERVALO_SONDAGEM_S)
 
 def format_seconds_to_hhmmss(sec_float):
     """
@@ -140,6 +663,7 @@ def format_seconds_to_hhmmss(sec_float):
     else:
         return f"{minutes:02d}:{seconds:02d}"
 
+@rastrear()
 def limpar_popups_ou_overlays(driver):
     """
     Remove pop-ups ou overlays conhecidos (como getsitecontrol, modais, banners, etc.)
@@ -154,7 +678,69 @@ def limpar_popups_ou_overlays(driver):
         """)
     except JavascriptException:
         pass
-    time.sleep(0.3)
+    dormir(0.3)
+
+# ======= SNAPSHOT DO DOM (UMA CHAMADA POR CONSULTA) =======
+JS_SNAPSHOT_AULAS = """
+    return Array.from(document.querySelectorAll('a.Collapse-header')).map(function(aula){
+        var titulo = aula.querySelector('h2.SectionTitle');
+        var subtitulo = aula.querySelector('p.sc-gZMcBi');
+        return {
+            el: aula,
+            titulo: titulo ? titulo.innerText.trim() : '(Sem título)',
+            subtitulo: subtitulo ? subtitulo.innerText.trim() : ''
+        };
+    });
+"""
+
+JS_SNAPSHOT_VIDEOS = """
+    var seletorTitulo = arguments[1];
+    return Array.from(document.querySelectorAll(arguments[0])).map(function(video){
+        var titulo = video.querySelector(seletorTitulo);
+        var texto = (titulo ? titulo.innerText : video.innerText).trim();
+        return {el: video, titulo: texto || '(sem título)', href: video.href || video.getAttribute('href')};
+    });
+"""
+
+JS_SNAPSHOT_LINKS_DOWNLOAD = """
+    return Array.from(document.querySelectorAll('div.sc-Rmtcm.cKiCd a.Button.-small')).map(function(link){
+        return {texto: link.innerText.trim().toLowerCase(), href: link.href || link.getAttribute('href')};
+    }).filter(function(link){ return link.href; });
+"""
+
+def snapshot_aulas(driver):
+    """
+    Lê todas as aulas da página com um único execute_script.
+    Retorna lista de tuplas (elemento, titulo, subtitulo), ou None se o script falhar.
+    """
+    try:
+        aulas = driver.execute_script(JS_SNAPSHOT_AULAS)
+    except JavascriptException:
+        return None
+    return [(aula["el"], aula["titulo"], aula["subtitulo"]) for aula in aulas]
+
+def snapshot_videos(driver):
+    """
+    Lê título, href e elemento de todos os vídeos visíveis com um único execute_script.
+    Retorna lista de tuplas (titulo, elemento, href), ou None se o script falhar.
+    """
+    lista_css = ",".join(SELECTORES["lista_videos"])
+    try:
+        videos = driver.execute_script(JS_SNAPSHOT_VIDEOS, lista_css, SELECTORES["titulo_video"])
+    except JavascriptException:
+        return None
+    return [(video["titulo"], video["el"], video["href"]) for video in videos]
+
+def snapshot_links_download(driver):
+    """
+    Lê o texto (minúsculo) e o href de todos os links de "Opções de download" com um único execute_script.
+    Retorna lista de tuplas (texto, href), ou None se o script falhar.
+    """
+    try:
+        links = driver.execute_script(JS_SNAPSHOT_LINKS_DOWNLOAD)
+    except JavascriptException:
+        return None
+    return [(link["texto"], link["href"]) for link in links]
 
 # ======= FUNÇÕES PRINCIPAIS =======
 def aguardar_resolucao_manual_captcha(enter_event):
@@ -167,6 +753,7 @@ def aguardar_resolucao_manual_captcha(enter_event):
           "Quando terminar, clique em 'Continuar' no navegador ou aperte Enter aqui para continuar...\n")
     enter_event.set()
 
+@rastrear()
 def realizar_login(driver, usuario, senha):
     """
     Realiza o login no site com o usuário e senha fornecidos.
@@ -174,7 +761,6 @@ def realizar_login(driver, usuario, senha):
     """
     print("🔐 Iniciando processo de login...")
     driver.get(URL_LOGIN)
-    time.sleep(0.5)
     try_accept_alert(driver, short_wait=5)
 
     # Preencher email
@@ -197,7 +783,7 @@ def realizar_login(driver, usuario, senha):
         except Exception:
             try:
                 email_input.send_keys(Keys.TAB)
-                time.sleep(0.3)
+                dormir(0.3)
                 driver.switch_to.active_element.send_keys(senha)
                 print("🔑 Senha preenchida via TAB.")
             except Exception:
@@ -208,6 +794,7 @@ def realizar_login(driver, usuario, senha):
         return False
 
     # Clicar automaticamente no botão Continuar (primeiro clique)
+    url_login = driver.current_url
     continuar_btn = find_clickable(driver, SELECTORES["botao_continuar"], timeout=5)
     if continuar_btn:
         continuar_btn.click()
@@ -231,10 +818,15 @@ def realizar_login(driver, usuario, senha):
                 break
 
             # Aguarda meio segundo antes de tentar novamente para não sobrecarregar o CPU
-            time.sleep(0.5)
+            dormir(0.5)
 
-    # Dá um tempo para a página carregar o CAPTCHA (se houver)
-    time.sleep(3)
+    # Dá um tempo para a página reagir: sai da tela de login ou carrega o CAPTCHA (no máximo 3s)
+    try:
+        WebDriverWait(driver, 3, poll_frequency=INTERVALO_SONDAGEM_S).until(
+            lambda d: d.current_url != url_login or d.find_elements(By.CSS_SELECTOR, "iframe[src*='recaptcha']")
+        )
+    except (TimeoutException, UnexpectedAlertPresentException):
+        pass
 
     # Detectar se captcha apareceu
     captcha_iframes = driver.find_elements(By.CSS_SELECTOR, "iframe[src*='recaptcha']")
@@ -254,7 +846,7 @@ def realizar_login(driver, usuario, senha):
             try_accept_alert(driver, short_wait=5)
             if captchas:
                 print("⏳ Aguardando resolução do CAPTCHA...")
-                time.sleep(1)
+                dormir(1)
                 continue
 
             # Verifica se a URL mudou (assumindo avanço)
@@ -263,23 +855,15 @@ def realizar_login(driver, usuario, senha):
                 break
             
             # Usado para cobrir o caso em que o CAPTCHA é resolvido mas a URL não muda imediatamente
-            # Tenta achar algum botão continuar entre todos os seletores possíveis
-            btn = None
-            for by, sel in SELECTORES["botao_continuar"]:
-                try:
-                    candidate = driver.find_element(by, sel)
-                    if candidate.is_displayed() and candidate.is_enabled():
-                        btn = candidate
-                        break
-                except:
-                    continue
+            # Tenta achar algum botão continuar entre todos os seletores possíveis (uma sondagem só)
+            seletor_btn, btn = sondar_seletores(driver, SELECTORES["botao_continuar"])
 
             if btn:
                 print("▶️ Botão 'Continuar' reapareceu após CAPTCHA. Por favor, clique nele ou aperte Enter.")
                 while True:
                     try:
                         # Recheca se o botão ainda está clicável
-                        candidate_check = driver.find_element(by, sel)
+                        candidate_check = driver.find_element(*seletor_btn)
                         if not candidate_check.is_displayed() or not candidate_check.is_enabled():
                             print("▶️ Detectado clique no botão 'Continuar' após CAPTCHA.")
                             break
@@ -291,11 +875,11 @@ def realizar_login(driver, usuario, senha):
                         print("▶️ Enter pressionado no terminal. Continuando fluxo.")
                         break
 
-                    time.sleep(0.3)
+                    dormir(0.3)
                 break
             else:
                 print("⏳ Botão 'Continuar' não encontrado ainda, aguardando...")
-                time.sleep(1)
+                dormir(1)
 
             if enter_event.is_set():
                 print("▶️ Enter pressionado no terminal. Continuando fluxo.")
@@ -306,110 +890,223 @@ def realizar_login(driver, usuario, senha):
     try_accept_alert(driver, short_wait=6)
     return True
 
-def garantir_pagina_aulas(driver):
+def salvar_sessao(driver, caminho=ARQUIVO_SESSAO):
+    """
+    Salva a sessão autenticada (cookies e localStorage do site) para reaproveitar no próximo início.
+    O arquivo contém credenciais de sessão: é criado legível apenas pelo usuário atual.
+    """
+    sessao = exportar_sessao(driver)
+    sessao["salva_em"] = time.time()
+    descritor = os.open(caminho, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(descritor, "w", encoding="utf-8") as f:
+        json.dump(sessao, f)
+    print(f"💾 Sessão salva em {caminho}.")
+
+def sessao_ativa(driver, timeout=TIMEOUT_VALIDACAO_SESSAO):
+    """
+    Confere de forma barata se a sessão está viva: abre URL_AULAS e espera a lista de aulas
+    aparecer, desistindo na hora se o site redirecionar para fora (tela de login).
+    """
+    driver.get(URL_AULAS)
+    try:
+        WebDriverWait(driver, timeout).until(
+            lambda d: not d.current_url.startswith(BASE_SITE)
+            or d.find_elements(By.CSS_SELECTOR, "a.Collapse-header")
+        )
+    except TimeoutException:
+        return False
+    return driver.current_url.startswith(BASE_SITE) and bool(driver.find_elements(By.CSS_SELECTOR, "a.Collapse-header"))
+
+@rastrear()
+def restaurar_sessao(driver, caminho=ARQUIVO_SESSAO):
+    """
+    Restaura a sessão salva por salvar_sessao e valida se ela ainda está ativa.
+    Retorna True se o navegador já está autenticado na página das aulas.
+    """
+    if not os.path.exists(caminho):
+        return False
+    try:
+        with open(caminho, encoding="utf-8") as f:
+            sessao = json.load(f)
+        aplicar_sessao(driver, sessao)
+        return sessao_ativa(driver)
+    except Exception as e:
+        print(f"⚠️ Não foi possível restaurar a sessão salva: {e}")
+        return False
+
+def garantir_login(driver, usuario, senha):
+    """
+    Reaproveita a sessão salva quando ela ainda é válida (início a quente); caso contrário
+    faz o login completo com realizar_login e salva a nova sessão.
+    Retorna True se o navegador terminou autenticado.
+    """
+    if getattr(driver, "residente", False):
+        # O navegador residente normalmente já está logado: basta conferir na aba nova
+        if sessao_ativa(driver):
+            print("⚡ Navegador residente já autenticado, login pulado.")
+            sincronizar_cookies_http(driver)
+            return True
+        print("🔐 Sessão do navegador residente expirada, autenticando novamente...")
+
+    if REUTILIZAR_SESSAO:
+        inicio = time.time()
+        if restaurar_sessao(driver):
+            print(f"⚡ Sessão salva reaproveitada, login pulado ({time.time() - inicio:.1f}s).")
+            sincronizar_cookies_http(driver)
+            return True
+        print("🔐 Sessão salva ausente ou expirada, fazendo login completo...")
+
+    if not realizar_login(driver, usuario, senha):
+        return False
+
+    # Os cookies que importam são os do site das aulas: sincroniza/salva a partir de lá
+    garantir_pagina_aulas(driver)
+    sincronizar_cookies_http(driver)
+    if REUTILIZAR_SESSAO:
+        try:
+            salvar_sessao(driver)
+        except Exception as e:
+            print(f"⚠️ Não foi possível salvar a sessão: {e}")
+    return True
+
+@rastrear()
+def garantir_pagina_aulas(driver, forcar=False):
     """
     Garante que estamos na página das aulas, navegando para ela se necessário.
+    Com forcar=True, recarrega a lista mesmo que a URL atual já seja de uma aula.
     """
     try:
         current_url = driver.current_url
     except Exception:
         current_url = ""
 
-    if not current_url.startswith(BASE_SITE) or "aulas" not in current_url:
+    if forcar or not current_url.startswith(BASE_SITE) or "aulas" not in current_url:
         print("🔎 Indo para a URL das aulas...")
         driver.get(URL_AULAS)
         try_accept_alert(driver, short_wait=5)
-        time.sleep(2)
+        dormir(2)
 
+@rastrear()
 def coletar_lista_videos(driver):
     """
-    Coleta os títulos e elementos dos vídeos da página.
-    Retorna lista de tuplas (titulo, elemento).
+    Coleta os títulos, elementos e hrefs dos vídeos da página.
+    Retorna lista de tuplas (titulo, elemento, href).
     """
     print("⏳ Coletando lista de vídeos na página...")
     lista_css = ",".join(SELECTORES["lista_videos"])
     elementos_video = WebDriverWait(driver, 20).until(
         EC.presence_of_all_elements_located((By.CSS_SELECTOR, lista_css))
     )
-    videos = []
-    for el in elementos_video:
-        try:
-            title_el = el.find_element(By.CSS_SELECTOR, SELECTORES["titulo_video"])
-            titulo = title_el.text.strip()
-        except Exception:
-            titulo = el.text.strip() or "(sem título)"
-        videos.append((titulo, el))
+
+    videos = snapshot_videos(driver) if USAR_SNAPSHOT_DOM else None
+    if videos is None:
+        # Fallback: uma chamada ao chromedriver por elemento/campo
+        videos = []
+        for el in elementos_video:
+            try:
+                title_el = el.find_element(By.CSS_SELECTOR, SELECTORES["titulo_video"])
+                titulo = title_el.text.strip()
+            except Exception:
+                titulo = el.text.strip() or "(sem título)"
+            videos.append((titulo, el, el.get_attribute("href")))
     print(f"🎥 {len(videos)} vídeos encontrados.")
     return videos
 
+@rastrear()
 def extrair_duracao_video(driver, video_el):
     """
     Abre o vídeo clicando no elemento, espera o player carregar, toca o vídeo mudo,
     extrai a duração e volta para a lista.
+    Com video_el None (navegação direta), o vídeo já está aberto e não há volta para a lista.
     Retorna duração formatada (hh:mm:ss) ou mensagem de erro.
     """
-    try:
-        driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", video_el)
-        WebDriverWait(driver, 5).until(EC.element_to_be_clickable(video_el)).click()
-    except Exception:
-        return "ERRO AO ABRIR"
+    if video_el is not None:
+        try:
+            driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", video_el)
+            WebDriverWait(driver, 5).until(EC.element_to_be_clickable(video_el)).click()
+        except Exception:
+            return "ERRO AO ABRIR"
 
     try:
         WebDriverWait(driver, 15).until(
             EC.presence_of_element_located((By.CSS_SELECTOR, SELECTORES["video_player"]))
         )
     except TimeoutException:
-        driver.back()
+        voltar_para_lista(driver, video_el)
         return "SEM PLAYER"
 
     try:
-        # Força o vídeo a tocar mudo para carregar metadadosW
-        driver.execute_script("""
-            var v=document.querySelector('video');
-            if(v){
-                v.muted = true;
-                v.play().catch(()=>{});
-            }
-        """)
-
-        # Espera até que a duração esteja disponível
-        start_time = time.time()
-        duracao = None
-        while time.time() - start_time < 30:
-            duracao = driver.execute_script("""
-                var v=document.querySelector('video');
-                if(v && typeof v.duration === 'number' && isFinite(v.duration) && v.duration > 0){
-                    return v.duration;
-                }
-                return null;
-            """)
-            if duracao:
-                break
-            time.sleep(0.2)
-
-        driver.back()
+        duracao = ler_duracao_do_player(driver)
+        voltar_para_lista(driver, video_el)
         return format_seconds_to_hhmmss(duracao) if duracao else "DURAÇÃO N/D"
     except Exception:
-        driver.back()
+        voltar_para_lista(driver, video_el)
         return "ERRO AO PEGAR DURAÇÃO"
 
+def voltar_para_lista(driver, video_el):
+    """
+    Volta para a lista de vídeos após abrir um vídeo clicando nele.
+    Na navegação direta (video_el None) não há para onde voltar: o próximo vídeo é aberto pela URL.
+    """
+    if video_el is not None:
+        driver.back()
+
+@rastrear()
+def ler_duracao_do_player(driver, timeout=30):
+    """
+    Toca o vídeo da página atual (mudo) e espera o player informar a duração.
+    Retorna a duração em segundos ou None se não ficar disponível dentro do timeout.
+    """
+    # Força o vídeo a tocar mudo para carregar metadados
+    driver.execute_script("""
+        var v=document.querySelector('video');
+        if(v){
+            v.muted = true;
+            v.play().catch(()=>{});
+        }
+    """)
+
+    # Espera até que a duração esteja disponível
+    start_time = time.time()
+    duracao = None
+    while time.time() - start_time < timeout:
+        duracao = driver.execute_script("""
+            var v=document.querySelector('video');
+            if(v && typeof v.duration === 'number' && isFinite(v.duration) && v.duration > 0){
+                return v.duration;
+            }
+            return null;
+        """)
+        if duracao:
+            break
+        dormir(0.2)
+    return duracao
+
+@rastrear()
 def fechar_modal_se_existir(driver):
     """
     Fecha o modal 'beamerPushModalContent' se ele estiver presente na tela.
+    Com o Beamer bloqueado pelo perfil enxuto, o modal nunca aparece e a espera é pulada.
     """
+    if any("beamer" in padrao for padrao in getattr(driver, "urls_bloqueadas", [])):
+        return
     try:
-        modal = WebDriverWait(driver, 2).until(
-            EC.presence_of_element_located((By.ID, "beamerPushModalContent"))
-        )
-        fechar_btn = modal.find_element(By.TAG_NAME, "button")
-        driver.execute_script("arguments[0].click();", fechar_btn)
-        WebDriverWait(driver, 5).until(
-            EC.invisibility_of_element_located((By.ID, "beamerPushModalContent"))
+        # Procura e clica no botão de fechar no mesmo script, sondando com o intervalo curto
+        clicado = WebDriverWait(driver, 2, poll_frequency=INTERVALO_SONDAGEM_S).until(
+            lambda d: d.execute_script(
+                "var b = document.querySelector('#beamerPushModalContent button');"
+                "if (b) { b.click(); return true; } return false;"
+            )
         )
-        print("ℹ️ Modal fechado com sucesso.")
+        if clicado:
+            WebDriverWait(driver, 5, poll_frequency=INTERVALO_SONDAGEM_S).until(
+                EC.invisibility_of_element_located((By.ID, "beamerPushModalContent"))
+            )
+            print("ℹ️ Modal fechado com sucesso.")
     except:
         pass  # Modal não estava aberto
 
+@rastrear()
 def clicar_elemento_com_rolagem(driver, elemento, espera_clicavel=True, sleep_apos=1, ajuste_rolagem=-100):
     """
     Rola a página para o elemento, ajusta para evitar sobreposição,
@@ -419,7 +1116,7 @@ def clicar_elemento_com_rolagem(driver, elemento, espera_clicavel=True, sleep_ap
     """
     driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", elemento)
     driver.execute_script(f"window.scrollBy(0, {ajuste_rolagem});")  # Ajusta rolagem vertical
-    time.sleep(0.5)
+    dormir(0.5)
 
     if espera_clicavel:
         try:
@@ -435,7 +1132,7 @@ def clicar_elemento_com_rolagem(driver, elemento, espera_clicavel=True, sleep_ap
     except Exception:
         driver.execute_script("arguments[0].click();", elemento)
 
-    time.sleep(sleep_apos)
+    dormir(sleep_apos)
 
 # ========= FUNÇÕES NOVAS PARA EVITAR REPETIÇÃO =========
 def obter_titulo_e_subtitulo(aula):
@@ -452,12 +1149,16 @@ def obter_titulo_e_subtitulo(aula):
         subtitulo = ""
     return titulo, subtitulo
 
-def processar_aula(driver, aula, callback_video):
+@rastrear()
+def processar_aula(driver, aula, callback_video, aula_inalterada=None, titulos=None):
     """
     Processa uma aula expandindo, coletando os vídeos e executando um callback em cada vídeo.
     O callback recebe (idx, titulo_video, elemento_video, titulo_aula, subtitulo_aula, total_videos).
+    Se 'aula_inalterada(titulo_aula, subtitulo_aula, videoaulas)' retornar True, os vídeos
+    não são abertos (os dados já conhecidos são reaproveitados por quem chamou).
+    'titulos' pode trazer (titulo, subtitulo) já lidos por snapshot_aulas.
     """
-    titulo_aula, subtitulo_aula = obter_titulo_e_subtitulo(aula)
+    titulo_aula, subtitulo_aula = titulos or obter_titulo_e_subtitulo(aula)
     print(f"📖 {titulo_aula}")
     print(f"📝 {subtitulo_aula}")
 
@@ -478,24 +1179,115 @@ def processar_aula(driver, aula, callback_video):
     
     # Coleta vídeos da aula
     videoaulas = coletar_lista_videos(driver)
-    for idx, (titulo, video_el) in enumerate(videoaulas, start=1):
-        callback_video(idx, titulo, video_el, titulo_aula, subtitulo_aula, len(videoaulas))
+    if aula_inalterada and aula_inalterada(titulo_aula, subtitulo_aula, videoaulas):
+        print("♻️ Aula sem alterações desde a última execução, usando o índice local.")
+    else:
+        for idx, (titulo, video_el, _) in enumerate(videoaulas, start=1):
+            callback_video(idx, titulo, video_el, titulo_aula, subtitulo_aula, len(videoaulas))
 
     # Fecha a aba após processar
     clicar_elemento_com_rolagem(driver, aula, espera_clicavel=False, sleep_apos=0.5, ajuste_rolagem=-100)
 
-def coletar_aulas_e_videoaulas(driver):
+def percorrer_aulas(driver, callback_video, indice=None, campo_indice=None, callback_reaproveitado=None, contexto=None, filtro_aulas=None, pular_video=None):
     """
-    Coleta todas as aulas (abas) e suas videoaulas com duração.
-    Retorna lista de tuplas: (titulo_aula, subtitulo_aula, numero_video, titulo_video, duracao).
+    Percorre todas as aulas ('a.Collapse-header') e executa o callback em cada vídeo.
+    Com NAVEGACAO_DIRETA, primeiro colhe as URLs de todos os vídeos e depois visita cada uma
+    com driver.get (o callback recebe elemento_video None); senão usa processar_aula (clique e volta).
+    Com um índice aberto, cada aula é comparada com o que foi salvo: se o número e os títulos
+    dos vídeos não mudaram e todos têm 'campo_indice' preenchido, os vídeos não são abertos e
+    callback_reaproveitado(linha) é chamado com cada registro salvo (na ordem dos vídeos).
+    O callback_video pode retornar um dict de campos a gravar no índice para aquele vídeo.
+    Se 'contexto' for informado, contexto["posicao"] indica a aula sendo processada.
+    Se 'filtro_aulas(posicao)' for informado, só as aulas para as quais ele retornar True são processadas.
+    Se 'pular_video(posicao, idx)' retornar True, o vídeo não é aberto nem entregue aos callbacks (retomada).
     """
-    resultado = []
-    elementos_aulas = driver.find_elements(By.CSS_SELECTOR, "a.Collapse-header")
+    contexto = {} if contexto is None else contexto
+    curso_id = obter_id_curso(URL_AULAS)
 
-    def callback(idx, titulo, video_el, titulo_aula, subtitulo_aula, total_videos):
-        duracao = extrair_duracao_video(driver, video_el)
-        print(f"   🕒 Vídeo {idx}/{total_videos}: {titulo} - {duracao}")
-        resultado.append((titulo_aula, subtitulo_aula, idx, titulo, duracao))
+    # Elementos e títulos de todas as aulas numa única chamada (com fallback elemento a elemento)
+    aulas = snapshot_aulas(driver) if USAR_SNAPSHOT_DOM else None
+    if aulas is None:
+        aulas = [(aula, None, None) for aula in driver.find_elements(By.CSS_SELECTOR, "a.Collapse-header")]
+    if indice is not None and aulas:
+        podar_curso_indice(indice, curso_id, len(aulas))
+
+    def entregar_do_indice(posicao, linhas):
+        for linha in linhas:
+            if not (pular_video and pular_video(posicao, linha["idx"])):
+                callback_reaproveitado(linha)
+
+    def reaproveitar_do_indice(posicao, titulo_aula, subtitulo_aula, videoaulas):
+        # True se a aula não mudou e os dados salvos foram entregues ao callback_reaproveitado
+        if indice is None:
+            return False
+        titulos = [titulo for titulo, _, _ in videoaulas]
+        linhas = carregar_aula_indice(indice, curso_id, posicao, titulo_aula, subtitulo_aula, titulos, campo_indice)
+        if linhas is None:
+            hrefs = [href for _, _, href in videoaulas]
+            salvar_aula_indice(indice, curso_id, posicao, titulo_aula, subtitulo_aula, titulos, hrefs)
+            return False
+        marcar_aula_conferida(indice, curso_id, posicao)
+        entregar_do_indice(posicao, linhas)
+        return True
+
+    # Aulas cujo cabeçalho (lido no snapshot) bate com o índice conferido recentemente: nem são expandidas
+    sem_expandir = {}
+    if indice is not None:
+        for posicao, (_, titulo_aula, subtitulo_aula) in enumerate(aulas, start=1):
+            if titulo_aula is None or (filtro_aulas and not filtro_aulas(posicao)):
+                continue
+            linhas = carregar_aula_indice(
+                indice, curso_id, posicao, titulo_aula, subtitulo_aula, None,
+                campo_indice, validade=VALIDADE_INDICE_HORAS * 3600,
+            )
+            if linhas is not None:
+                sem_expandir[posicao] = linhas
+        if sem_expandir:
+            print(f"♻️ {len(sem_expandir)} aulas inalteradas no índice local não serão expandidas.")
+
+    def entregar_sem_expandir(posicao):
+        contexto["posicao"] = posicao
+        linhas = sem_expandir[posicao]
+        print(f"📖 {linhas[0]['titulo_aula']}")
+        print(f"📝 {linhas[0]['subtitulo_aula']}")
+        print("♻️ Aula sem alterações desde a última execução, usando o índice local.")
+        entregar_do_indice(posicao, linhas)
+
+    def executar_callback(posicao, idx, titulo, video_el, titulo_aula, subtitulo_aula, total_videos):
+        if pular_video and pular_video(posicao, idx):
+            return
+        campos = callback_video(idx, titulo, video_el, titulo_aula, subtitulo_aula, total_videos)
+        if indice is not None and campos:
+            atualizar_video_indice(indice, curso_id, posicao, idx, **campos)
+
+    if NAVEGACAO_DIRETA:
+        def filtro_colheita(posicao):
+            return posicao not in sem_expandir and (not filtro_aulas or filtro_aulas(posicao))
+
+        roteiro = colher_urls_videos(driver, aulas, filtro_colheita)
+        if roteiro is not None:
+            # Intercala as aulas vindas do índice com as colhidas, mantendo a ordem do curso
+            roteiro = sorted(roteiro + [(posicao, None, None, None) for posicao in sem_expandir])
+            for posicao, titulo_aula, subtitulo_aula, videoaulas in roteiro:
+                if videoaulas is None:
+                    entregar_sem_expandir(posicao)
+                    continue
+                contexto["posicao"] = posicao
+                print(f"📖 {titulo_aula}")
+                print(f"📝 {subtitulo_aula}")
+                if reaproveitar_do_indice(posicao, titulo_aula, subtitulo_aula, videoaulas):
+                    print("♻️ Aula sem alterações desde a última execução, usando o índice local.")
+                    continue
+                for idx, (titulo, _, href) in enumerate(videoaulas, start=1):
+                    if pular_video and pular_video(posicao, idx):
+                        continue
+                    driver.get(href)
+                    executar_callback(posicao, idx, titulo, None, titulo_aula, subtitulo_aula, len(videoaulas))
+                registrar_round_trips(driver, f"aula {posicao}/{len(roteiro)}")
+            return
+        print("⚠️ Nem todos os vídeos têm URL própria; usando a navegação por clique.")
+        garantir_pagina_aulas(driver, forcar=True)
+        aulas = [(aula, None, None) for aula in driver.find_elements(By.CSS_SELECTOR, "a.Collapse-header")]
 
     # maximo = 0
     # for aula in elementos_aulas:
@@ -503,26 +1295,471 @@ def coletar_aulas_e_videoaulas(driver):
     #     if maximo >= 2:
     #         break
     #     maximo += 1
-    
-    for aula in elementos_aulas:
-        processar_aula(driver, aula, callback)
 
-    return resultado
+    for posicao, (aula, titulo_aula, subtitulo_aula) in enumerate(aulas, start=1):
+        if filtro_aulas and not filtro_aulas(posicao):
+            continue
+        if posicao in sem_expandir:
+            entregar_sem_expandir(posicao)
+            continue
+        contexto["posicao"] = posicao
 
-def salvar_em_csv(nome_arquivo, dados, header=None):
+        def verificar(titulo_aula, subtitulo_aula, videoaulas, posicao=posicao):
+            return reaproveitar_do_indice(posicao, titulo_aula, subtitulo_aula, videoaulas)
+
+        def callback(idx, titulo, video_el, titulo_aula, subtitulo_aula, total_videos, posicao=posicao):
+            executar_callback(posicao, idx, titulo, video_el, titulo_aula, subtitulo_aula, total_videos)
+
+        processar_aula(
+            driver, aula, callback,
+            aula_inalterada=verificar if indice is not None else None,
+            titulos=(titulo_aula, subtitulo_aula) if titulo_aula is not None else None,
+        )
+        registrar_round_trips(driver, f"aula {posicao}/{len(aulas)}")
+
+@rastrear()
+def colher_urls_videos(driver, aulas, filtro_aulas=None):
     """
-    Salva a lista dos dados fornecidos em um arquivo CSV.
-    Se quiser salvar na lista os nomes das colunas para o cabeçalho do CSV, remova o valor None de header.
+    Expande cada aula uma única vez só para ler a lista de vídeos (título e href) e fecha em seguida.
+    Recebe a lista de (elemento, titulo, subtitulo) de snapshot_aulas e o filtro opcional de posições.
+    Retorna lista de (posicao, titulo_aula, subtitulo_aula, videoaulas), ou None se algum vídeo não tiver href.
     """
-    with open(nome_arquivo, "w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f, delimiter=";")
-        if header:
-            writer.writerow(header)
-        for linha in dados:
-            writer.writerow(linha)
-    print(f"✅ Dados salvos no arquivo {nome_arquivo}")
+    print("🗺️ Colhendo as URLs de todos os vídeos...")
+    roteiro = []
+    for posicao, (aula, titulo_aula, subtitulo_aula) in enumerate(aulas, start=1):
+        if filtro_aulas and not filtro_aulas(posicao):
+            continue
+        if titulo_aula is None:
+            titulo_aula, subtitulo_aula = obter_titulo_e_subtitulo(aula)
 
-def construir_nome_arquivo(titulo_aula, subtitulo_aula, idx, titulo_video, url, resolucao):
+        fechar_modal_se_existir(driver)
+        clicar_elemento_com_rolagem(driver, aula, espera_clicavel=True, sleep_apos=1, ajuste_rolagem=-100)
+        videoaulas = coletar_lista_videos(driver)
+        clicar_elemento_com_rolagem(driver, aula, espera_clicavel=False, sleep_apos=0.5, ajuste_rolagem=-100)
+
+        if any(not href for _, _, href in videoaulas):
+            return None
+        roteiro.append((posicao, titulo_aula, subtitulo_aula, videoaulas))
+
+    total = sum(len(videoaulas) for _, _, _, videoaulas in roteiro)
+    print(f"🗺️ {total} URLs de vídeos colhidas em {len(roteiro)} aulas.")
+    return roteiro
+
+@rastrear()
+def coletar_aulas_e_videoaulas(driver, filtro_aulas=None, saida=None):
+    """
+    Coleta todas as aulas (abas) e suas videoaulas com duração.
+    Retorna lista de tuplas: (titulo_aula, subtitulo_aula, numero_video, titulo_video, duracao).
+    Com 'saida' (SaidaCsvIncremental), cada linha é gravada no CSV assim que o vídeo termina,
+    nada é acumulado em memória (o retorno fica vazio) e a coleta pula o que o checkpoint já registrou.
+    """
+    entregar, filtro_aulas, pular_video = preparar_entrega(filtro_aulas, saida)
+    if DURACAO_VIA_RANGE:
+        coletar_aulas_e_videoaulas_via_range(driver, filtro_aulas=filtro_aulas, entregar=entregar, pular_video=pular_video)
+        return entregar.resultado
+
+    indice = abrir_indice() if MODO_INCREMENTAL else None
+    contexto = {}
+
+    def callback(idx, titulo, video_el, titulo_aula, subtitulo_aula, total_videos):
+        duracao = extrair_duracao_video(driver, video_el)
+        print(f"   🕒 Vídeo {idx}/{total_videos}: {titulo} - {duracao}")
+        entregar(contexto["posicao"], (titulo_aula, subtitulo_aula, idx, titulo, duracao))
+        # Só grava no índice durações válidas, para que erros sejam refeitos na próxima execução
+        return {"duracao": duracao} if ":" in duracao else None
+
+    def reaproveitado(linha):
+        entregar(contexto["posicao"], (linha["titulo_aula"], linha["subtitulo_aula"], linha["idx"], linha["titulo"], linha["duracao"]))
+
+    try:
+        percorrer_aulas(driver, callback, indice, "duracao", reaproveitado, contexto, filtro_aulas, pular_video)
+    finally:
+        if indice is not None:
+            indice.close()
+
+    return entregar.resultado
+
+def preparar_entrega(filtro_aulas, saida):
+    """
+    Define para onde vão as linhas da coleta de durações: uma lista em memória (sem 'saida')
+    ou o CSV incremental. Com checkpoint, acrescenta ao filtro de aulas e ao filtro de vídeos
+    o ponto onde a execução anterior parou.
+    Retorna (entregar(posicao, linha), filtro_aulas, pular_video); entregar.resultado é a lista em memória.
+    """
+    resultado = []
+
+    def entregar(posicao, linha):
+        if saida is None:
+            resultado.append(linha)
+        else:
+            saida.escrever(posicao, linha)
+
+    entregar.resultado = resultado
+    if saida is None or saida.retomada is None:
+        return entregar, filtro_aulas, None
+
+    aula_parada, video_parado = saida.retomada
+
+    def filtro_retomada(posicao):
+        return posicao >= aula_parada and (filtro_aulas is None or filtro_aulas(posicao))
+
+    def pular_video(posicao, idx):
+        return posicao == aula_parada and idx <= video_parado
+
+    return entregar, filtro_retomada, pular_video
+
+def coletar_aulas_e_videoaulas_via_range(driver, num_sondagens=NUM_SONDAGENS_DURACAO, filtro_aulas=None, entregar=None, pular_video=None):
+    """
+    Mesmo resultado de coletar_aulas_e_videoaulas, mas sem tocar os vídeos: o navegador só
+    resolve o link de download de cada vídeo e a duração é lida do cabeçalho MP4 (moov/mvhd)
+    por sondagens HTTP Range executadas em paralelo enquanto a navegação continua.
+    Se um vídeo não tiver link de download, a duração é lida do player na própria página.
+    As linhas são entregues em ordem a entregar(posicao, linha) assim que a sondagem delas
+    (e de todas as anteriores) termina; sem 'entregar', são retornadas numa lista.
+    """
+    if entregar is None:
+        entregar, filtro_aulas, pular_video = preparar_entrega(filtro_aulas, None)
+    pendentes = deque()  # (posicao_aula, titulo_aula, subtitulo_aula, idx, titulo, futuro_ou_duracao, do_indice)
+    indice = abrir_indice() if MODO_INCREMENTAL else None
+    curso_id = obter_id_curso(URL_AULAS)
+    contexto = {}
+
+    def descarregar(esperar=False):
+        # Entrega as linhas já resolvidas do começo da fila (mantém a ordem dos vídeos)
+        while pendentes:
+            posicao, titulo_aula, subtitulo_aula, idx, titulo, duracao, do_indice = pendentes[0]
+            if not isinstance(duracao, str):
+                if not esperar and not duracao.done():
+                    return
+                duracao = duracao.result()
+            pendentes.popleft()
+            if indice is not None and not do_indice and ":" in duracao:
+                atualizar_video_indice(indice, curso_id, posicao, idx, duracao=duracao)
+            entregar(posicao, (titulo_aula, subtitulo_aula, idx, titulo, duracao))
+
+    with ThreadPoolExecutor(max_workers=max(1, num_sondagens), thread_name_prefix="sonda-mp4") as executor:
+
+        def callback(idx, titulo, video_el, titulo_aula, subtitulo_aula, total_videos):
+            resolucao, url = abrir_video_e_obter_link(driver, video_el)
+            if url:
+                print(f"   🔗 Vídeo {idx}/{total_videos}: {titulo} - sondando duração ({resolucao})")
+                duracao = executor.submit(sondar_duracao, url)
+            else:
+                try:
+                    duracao = ler_duracao_do_player(driver)
+                    duracao = format_seconds_to_hhmmss(duracao) if duracao else "DURAÇÃO N/D"
+                except Exception:
+                    duracao = "ERRO AO PEGAR DURAÇÃO"
+                print(f"   🕒 Vídeo {idx}/{total_videos}: {titulo} - {duracao}")
+            pendentes.append((contexto["posicao"], titulo_aula, subtitulo_aula, idx, titulo, duracao, False))
+            voltar_para_lista(driver, video_el)
+            descarregar()
+            return {"resolucao": resolucao, "url_download": url} if url else None
+
+        def reaproveitado(linha):
+            pendentes.append((contexto["posicao"], linha["titulo_aula"], linha["subtitulo_aula"], linha["idx"], linha["titulo"], linha["duracao"], True))
+            descarregar()
+
+        try:
+            percorrer_aulas(driver, callback, indice, "duracao", reaproveitado, contexto, filtro_aulas, pular_video)
+
+            print("⏳ Aguardando as sondagens de duração terminarem...")
+            descarregar(esperar=True)
+        except BaseException:
+            # Interrompida no meio: as sondagens já disparadas ainda viram linhas (e checkpoint) antes de sair
+            try:
+                descarregar(esperar=True)
+            except Exception:
+                pass
+            raise
+        finally:
+            if indice is not None:
+                indice.close()
+
+    return entregar.resultado
+
+def salvar_em_csv(nome_arquivo, dados, header=None):
+    """
+    Salva a lista dos dados fornecidos em um arquivo CSV.
+    Se quiser salvar na lista os nomes das colunas para o cabeçalho do CSV, remova o valor None de header.
+    """
+    with open(nome_arquivo, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, delimiter=";")
+        if header:
+            writer.writerow(header)
+        for linha in dados:
+            writer.writerow(linha)
+    # O CSV foi reescrito inteiro: um checkpoint de coleta interrompida dele não vale mais
+    if os.path.exists(nome_arquivo + SUFIXO_CHECKPOINT):
+        os.remove(nome_arquivo + SUFIXO_CHECKPOINT)
+    print(f"✅ Dados salvos no arquivo {nome_arquivo}")
+
+class SaidaCsvIncremental:
+    """
+    CSV gravado linha a linha, com checkpoint da última linha concluída em '<csv>.checkpoint.json'
+    (curso, posição da aula, número do vídeo e tamanho do CSV naquele ponto).
+    Com retomar=True e um checkpoint do mesmo curso, o CSV é cortado no tamanho registrado
+    (descarta uma linha pela metade) e 'retomada' traz (posicao_aula, idx_video) onde a coleta parou.
+    """
+
+    def __init__(self, caminho, header=None, retomar=False):
+        self.caminho = caminho
+        self.caminho_checkpoint = caminho + SUFIXO_CHECKPOINT
+        checkpoint = ler_checkpoint(caminho) if retomar else None
+        self.retomada = None
+        self.total_linhas = 0
+        if checkpoint and os.path.exists(caminho) and os.path.getsize(caminho) >= checkpoint["bytes"]:
+            self.retomada = (checkpoint["posicao_aula"], checkpoint["idx_video"])
+            self.total_linhas = checkpoint["linhas"]
+            os.truncate(caminho, checkpoint["bytes"])
+            self.arquivo = open(caminho, "a", newline="", encoding="utf-8")
+            print(f"⏯️ Retomando a coleta após a aula {self.retomada[0]}, vídeo {self.retomada[1]} ({self.total_linhas} linhas já no CSV).")
+        else:
+            if os.path.exists(self.caminho_checkpoint):
+                os.remove(self.caminho_checkpoint)  # coleta nova: o checkpoint antigo não vale mais
+            self.arquivo = open(caminho, "w", newline="", encoding="utf-8")
+        self.escritor = csv.writer(self.arquivo, delimiter=";")
+        if self.retomada is None and header:
+            self.escritor.writerow(header)
+            self.arquivo.flush()
+
+    def escrever(self, posicao_aula, linha):
+        """
+        Grava a linha no CSV e atualiza o checkpoint para ela.
+        """
+        self.escritor.writerow(linha)
+        self.arquivo.flush()
+        self.total_linhas += 1
+        gravar_json_atomico(self.caminho_checkpoint, {
+            "url_aulas": URL_AULAS,
+            "posicao_aula": posicao_aula,
+            "idx_video": linha[2],
+            "linhas": self.total_linhas,
+            "bytes": os.fstat(self.arquivo.fileno()).st_size,
+        })
+
+    def fechar(self, concluido):
+        """
+        Fecha o CSV; se a coleta terminou, o checkpoint deixa de ser necessário e é apagado.
+        """
+        self.arquivo.close()
+        if concluido and os.path.exists(self.caminho_checkpoint):
+            os.remove(self.caminho_checkpoint)
+        if concluido:
+            print(f"✅ Dados salvos no arquivo {self.caminho}")
+        else:
+            print(f"💾 Coleta interrompida: {self.total_linhas} linhas em {self.caminho}; use a retomada para continuar.")
+
+def ler_checkpoint(caminho_csv):
+    """
+    Lê o checkpoint do CSV se ele existir e for do curso atual (URL_AULAS); senão retorna None.
+    """
+    caminho = caminho_csv + SUFIXO_CHECKPOINT
+    if not os.path.exists(caminho):
+        return None
+    try:
+        with open(caminho, encoding="utf-8") as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return checkpoint if checkpoint.get("url_aulas") == URL_AULAS else None
+
+def gravar_json_atomico(caminho, dados):
+    """
+    Grava o JSON num temporário e o renomeia por cima do arquivo, para nunca deixá-lo pela metade.
+    """
+    # Nome único por processo e thread: as fatias e os workers podem gravar o mesmo arquivo ao mesmo tempo
+    temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(dados, f, ensure_ascii=False)
+    os.replace(temporario, caminho)
+
+@contextmanager
+def trava_arquivo(caminho, intervalo=0.1):
+    """
+    Trava exclusiva entre processos (as fatias do NUM_NAVEGADORES) e threads, sobre o arquivo 'caminho'.
+    Usa a trava do sistema operacional, que é liberada sozinha se o processo morrer; o arquivo
+    de trava fica no disco e é reaproveitado.
+    """
+    os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+    with open(caminho, "a+b") as arquivo:
+        if fcntl is not None:
+            fcntl.flock(arquivo.fileno(), fcntl.LOCK_EX)
+        elif msvcrt is not None:
+            arquivo.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(arquivo.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    time.sleep(intervalo)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(arquivo.fileno(), fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                arquivo.seek(0)
+                msvcrt.locking(arquivo.fileno(), msvcrt.LK_UNLCK, 1)
+
+# ======= ÍNDICE LOCAL DO CURSO =======
+def obter_id_curso(url):
+    """
+    Extrai o id do curso de uma URL do tipo '.../cursos/<id>/aulas'.
+    Se a URL não seguir esse padrão, usa a própria URL como identificador.
+    """
+    padrao = re.search(r"/cursos/(\d+)", url)
+    return padrao.group(1) if padrao else url
+
+def abrir_indice(caminho=ARQUIVO_INDICE):
+    """
+    Abre (criando se necessário) o índice SQLite com as aulas e vídeos já coletados.
+    """
+    conexao = sqlite3.connect(caminho, timeout=30)  # várias fatias podem gravar ao mesmo tempo
+    conexao.row_factory = sqlite3.Row
+    conexao.executescript("""
+        CREATE TABLE IF NOT EXISTS aulas (
+            curso_id TEXT NOT NULL,
+            posicao INTEGER NOT NULL,
+            titulo TEXT,
+            subtitulo TEXT,
+            total_videos INTEGER,
+            atualizado_em REAL,
+            PRIMARY KEY (curso_id, posicao)
+        );
+        CREATE TABLE IF NOT EXISTS videos (
+            curso_id TEXT NOT NULL,
+            aula_posicao INTEGER NOT NULL,
+            idx INTEGER NOT NULL,
+            titulo TEXT,
+            href TEXT,
+            duracao TEXT,
+            resolucao TEXT,
+            url_download TEXT,
+            PRIMARY KEY (curso_id, aula_posicao, idx)
+        );
+    """)
+    return conexao
+
+def carregar_aula_indice(conexao, curso_id, posicao, titulo_aula, subtitulo_aula, titulos_videos, campo=None, validade=None):
+    """
+    Retorna os vídeos salvos da aula se o snapshot do índice bater com a página atual
+    (mesmo título, subtítulo, quantidade e títulos dos vídeos) e, se 'campo' for informado,
+    todos os vídeos tiverem esse campo preenchido. Caso contrário retorna None.
+    Com titulos_videos None (aula ainda não expandida) só título e subtítulo são comparados,
+    e 'validade' (segundos) exige que a aula tenha sido conferida há menos desse tempo.
+    Cada linha é um dict com titulo_aula, subtitulo_aula, idx, titulo, href, duracao, resolucao e url_download.
+    """
+    aula = conexao.execute(
+        "SELECT titulo, subtitulo, total_videos, atualizado_em FROM aulas WHERE curso_id = ? AND posicao = ?",
+        (curso_id, posicao),
+    ).fetchone()
+    if aula is None or (aula["titulo"], aula["subtitulo"]) != (titulo_aula, subtitulo_aula):
+        return None
+    if titulos_videos is not None and aula["total_videos"] != len(titulos_videos):
+        return None
+    if validade is not None and (aula["atualizado_em"] or 0) < time.time() - validade:
+        return None
+
+    videos = conexao.execute(
+        "SELECT * FROM videos WHERE curso_id = ? AND aula_posicao = ? ORDER BY idx",
+        (curso_id, posicao),
+    ).fetchall()
+    if titulos_videos is None:
+        if not videos or len(videos) != aula["total_videos"]:
+            return None
+    elif [video["titulo"] for video in videos] != list(titulos_videos):
+        return None
+    if campo and any(not video[campo] for video in videos):
+        return None
+
+    return [dict(video, titulo_aula=titulo_aula, subtitulo_aula=subtitulo_aula) for video in videos]
+
+def marcar_aula_conferida(conexao, curso_id, posicao):
+    """
+    Renova a data de conferência de uma aula cuja lista de vídeos foi relida e não mudou.
+    """
+    with conexao:
+        conexao.execute(
+            "UPDATE aulas SET atualizado_em = ? WHERE curso_id = ? AND posicao = ?",
+            (time.time(), curso_id, posicao),
+        )
+
+def podar_curso_indice(conexao, curso_id, total_aulas):
+    """
+    Remove do índice as aulas (e seus vídeos) além da quantidade atual do curso,
+    para que um curso que encolheu não mantenha registros de aulas que não existem mais.
+    """
+    with conexao:
+        conexao.execute("DELETE FROM aulas WHERE curso_id = ? AND posicao > ?", (curso_id, total_aulas))
+        conexao.execute("DELETE FROM videos WHERE curso_id = ? AND aula_posicao > ?", (curso_id, total_aulas))
+
+def salvar_aula_indice(conexao, curso_id, posicao, titulo_aula, subtitulo_aula, titulos_videos, hrefs=None):
+    """
+    Grava o snapshot de uma aula. Vídeos cujo título mudou perdem duração e link salvos.
+    """
+    hrefs = hrefs or [None] * len(titulos_videos)
+    with conexao:
+        conexao.execute(
+            "INSERT OR REPLACE INTO aulas (curso_id, posicao, titulo, subtitulo, total_videos, atualizado_em) VALUES (?, ?, ?, ?, ?, ?)",
+            (curso_id, posicao, titulo_aula, subtitulo_aula, len(titulos_videos), time.time()),
+        )
+        conexao.execute(
+            "DELETE FROM videos WHERE curso_id = ? AND aula_posicao = ? AND idx > ?",
+            (curso_id, posicao, len(titulos_videos)),
+        )
+        for idx, (titulo, href) in enumerate(zip(titulos_videos, hrefs), start=1):
+            atual = conexao.execute(
+                "SELECT titulo FROM videos WHERE curso_id = ? AND aula_posicao = ? AND idx = ?",
+                (curso_id, posicao, idx),
+            ).fetchone()
+            if atual is not None and atual["titulo"] == titulo:
+                conexao.execute(
+                    "UPDATE videos SET href = COALESCE(?, href) WHERE curso_id = ? AND aula_posicao = ? AND idx = ?",
+                    (href, curso_id, posicao, idx),
+                )
+            else:
+                conexao.execute(
+                    "INSERT OR REPLACE INTO videos (curso_id, aula_posicao, idx, titulo, href) VALUES (?, ?, ?, ?, ?)",
+                    (curso_id, posicao, idx, titulo, href),
+                )
+
+def atualizar_video_indice(conexao, curso_id, posicao, idx, **campos):
+    """
+    Atualiza campos de um vídeo do índice (ex.: duracao, resolucao, url_download).
+    """
+    colunas = [coluna for coluna in ("href", "duracao", "resolucao", "url_download") if coluna in campos]
+    if not colunas:
+        return
+    with conexao:
+        conexao.execute(
+            f"UPDATE videos SET {', '.join(f'{coluna} = ?' for coluna in colunas)} "
+            "WHERE curso_id = ? AND aula_posicao = ? AND idx = ?",
+            [campos[coluna] for coluna in colunas] + [curso_id, posicao, idx],
+        )
+
+def carregar_curso_do_indice(curso_id, campo, caminho=ARQUIVO_INDICE):
+    """
+    Carrega todos os vídeos de um curso do índice, na ordem das aulas.
+    Retorna None se o curso não estiver no índice ou se algum vídeo não tiver 'campo' preenchido.
+    """
+    if not os.path.exists(caminho):
+        return None
+    conexao = abrir_indice(caminho)
+    try:
+        linhas = conexao.execute(
+            "SELECT a.titulo AS titulo_aula, a.subtitulo AS subtitulo_aula, v.* "
+            "FROM aulas a JOIN videos v ON v.curso_id = a.curso_id AND v.aula_posicao = a.posicao "
+            "WHERE a.curso_id = ? ORDER BY a.posicao, v.idx",
+            (curso_id,),
+        ).fetchall()
+    finally:
+        conexao.close()
+    if not linhas or any(not linha[campo] for linha in linhas):
+        return None
+    return [dict(linha) for linha in linhas]
+
+def construir_nome_arquivo(titulo_aula, subtitulo_aula, idx, titulo_video, url, resolucao):
     """
     Gera um nome de arquivo limpo com base no título da aula e do vídeo.
     """
@@ -544,10 +1781,301 @@ def extrair_resolucao(url):
         return padrao.group(1)
     return None
 
+# ======= CLIENTE HTTP COMPARTILHADO =======
+_CLIENTE_HTTP = None
+_TRAVA_CLIENTE_HTTP = threading.Lock()
+ESTATISTICAS_HTTP = {"requisicoes": 0, "novas_tentativas": 0}
+_TRAVA_ESTATISTICAS_HTTP = threading.Lock()
+
+def contar_http(chave):
+    """
+    Incrementa um contador de ESTATISTICAS_HTTP (chamado por várias threads).
+    """
+    with _TRAVA_ESTATISTICAS_HTTP:
+        ESTATISTICAS_HTTP[chave] += 1
+
+def tamanho_pool_http():
+    """
+    Quantidade de conexões mantidas por host: o máximo de requisições simultâneas que o script faz.
+    """
+    return NUM_WORKERS_DOWNLOAD * max(1, SEGMENTOS_POR_ARQUIVO) + NUM_SONDAGENS_DURACAO
+
+def obter_cliente_http():
+    """
+    Retorna a requests.Session compartilhada por todas as chamadas de rede do script,
+    com um pool de conexões keep-alive dimensionado para a concorrência configurada.
+    """
+    global _CLIENTE_HTTP
+    with _TRAVA_CLIENTE_HTTP:
+        if _CLIENTE_HTTP is None:
+            cliente = requests.Session()
+            adaptador = requests.adapters.HTTPAdapter(pool_connections=8, pool_maxsize=tamanho_pool_http())
+            cliente.mount("https://", adaptador)
+            cliente.mount("http://", adaptador)
+            _CLIENTE_HTTP = cliente
+        return _CLIENTE_HTTP
+
+def sincronizar_cookies_http(driver):
+    """
+    Copia os cookies e o User-Agent do navegador para o cliente HTTP,
+    para que downloads e sondagens usem a mesma sessão autenticada.
+    """
+    cliente = obter_cliente_http()
+    for cookie in driver.get_cookies():
+        cliente.cookies.set(cookie["name"], cookie["value"], domain=cookie.get("domain"), path=cookie.get("path", "/"))
+    try:
+        cliente.headers["User-Agent"] = driver.execute_script("return navigator.userAgent;")
+    except JavascriptException:
+        pass
+
+def esperar_backoff(tentativa, resposta=None):
+    """
+    Espera antes de uma nova tentativa: backoff exponencial com jitter completo
+    (aleatório entre 0 e BACKOFF_BASE * 2^tentativa, limitado a BACKOFF_MAXIMO).
+    Respeita o cabeçalho Retry-After (em segundos) quando o servidor o envia.
+    """
+    espera = random.uniform(0, min(BACKOFF_MAXIMO, BACKOFF_BASE * 2 ** tentativa))
+    retry_after = resposta.headers.get("retry-after", "") if resposta is not None else ""
+    if retry_after.isdigit():
+        espera = min(BACKOFF_MAXIMO, max(espera, int(retry_after)))
+    dormir(espera)
+
+def requisitar(metodo, url, tentativas=TENTATIVAS_HTTP, **kwargs):
+    """
+    Faz uma requisição pelo cliente compartilhado, com timeouts separados de conexão/leitura
+    e novas tentativas (backoff com jitter) em erros de rede e status repetíveis (429/5xx).
+    Retorna a resposta (que pode ter status de erro, para o chamador decidir).
+    """
+    kwargs.setdefault("timeout", (TIMEOUT_CONEXAO, TIMEOUT_LEITURA))
+    cliente = obter_cliente_http()
+    for tentativa in range(tentativas):
+        contar_http("requisicoes")
+        try:
+            resposta = cliente.request(metodo, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if tentativa == tentativas - 1:
+                raise
+            contar_http("novas_tentativas")
+            print(f"🔁 {metodo} falhou ({e.__class__.__name__}), nova tentativa {tentativa + 2}/{tentativas}...")
+            esperar_backoff(tentativa)
+            continue
+
+        if resposta.status_code in STATUS_REPETIVEIS and tentativa < tentativas - 1:
+            contar_http("novas_tentativas")
+            print(f"🔁 {metodo} retornou HTTP {resposta.status_code}, nova tentativa {tentativa + 2}/{tentativas}...")
+            resposta.close()
+            esperar_backoff(tentativa, resposta)
+            continue
+        return resposta
+
+def estatisticas_conexoes():
+    """
+    Soma, nos pools do urllib3 ainda ativos, as conexões abertas e as requisições feitas.
+    Requisições além das conexões abertas reaproveitaram uma conexão keep-alive.
+    """
+    abertas = requisicoes = 0
+    for adaptador in set(obter_cliente_http().adapters.values()):
+        pools = adaptador.poolmanager.pools
+        for chave in list(pools.keys()):
+            pool = pools.get(chave)
+            if pool is not None:
+                abertas += pool.num_connections
+                requisicoes += pool.num_requests
+    return {"conexoes_abertas": abertas, "conexoes_reaproveitadas": max(0, requisicoes - abertas)}
+
+def imprimir_estatisticas_http():
+    """
+    Mostra as conexões abertas vs. reaproveitadas e as novas tentativas feitas pelo cliente HTTP.
+    """
+    if _CLIENTE_HTTP is None:
+        return
+    conexoes = estatisticas_conexoes()
+    print(
+        f"🌐 HTTP: {ESTATISTICAS_HTTP['requisicoes']} requisições, "
+        f"{conexoes['conexoes_abertas']} conexões abertas, {conexoes['conexoes_reaproveitadas']} reaproveitadas, "
+        f"{ESTATISTICAS_HTTP['novas_tentativas']} novas tentativas"
+    )
+
+# ======= LEITURA DE CABEÇALHOS MP4 =======
+def ler_cabecalho_caixa_mp4(dados, offset):
+    """
+    Lê o cabeçalho de uma caixa (box/atom) MP4 que começa em 'offset' dentro de 'dados'
+    (bytes ou mmap). Retorna (tipo, tamanho_total, tamanho_cabecalho).
+    Um tamanho 0 significa "até o fim do arquivo" e é devolvido como 0.
+    """
+    tamanho, tipo = struct.unpack_from(">I4s", dados, offset)
+    tamanho_cabecalho = 8
+    if tamanho == 1:
+        # Caixa com tamanho de 64 bits logo após o tipo
+        tamanho = struct.unpack_from(">Q", dados, offset + 8)[0]
+        tamanho_cabecalho = 16
+    return tipo.decode("latin-1"), tamanho, tamanho_cabecalho
+
+def ler_duracao_mvhd(dados, offset):
+    """
+    Interpreta o conteúdo de uma caixa 'mvhd' (a partir do byte de versão em 'offset')
+    e retorna a duração do filme em segundos, ou None se a escala de tempo for inválida.
+    """
+    versao = dados[offset]
+    if versao == 1:
+        escala_tempo, duracao = struct.unpack_from(">IQ", dados, offset + 4 + 16)
+    else:
+        escala_tempo, duracao = struct.unpack_from(">II", dados, offset + 4 + 8)
+    if not escala_tempo:
+        return None
+    return duracao / escala_tempo
+
+def procurar_caixa_filha(dados, inicio, fim, tipo_procurado):
+    """
+    Procura a caixa 'tipo_procurado' entre as filhas diretas da região [inicio, fim) de 'dados'.
+    Retorna o offset do conteúdo da caixa encontrada (após o cabeçalho) ou None.
+    """
+    offset = inicio
+    while offset + 8 <= fim:
+        tipo, tamanho, tamanho_cabecalho = ler_cabecalho_caixa_mp4(dados, offset)
+        if tipo == tipo_procurado:
+            return offset + tamanho_cabecalho
+        if tamanho < tamanho_cabecalho:
+            return None  # tamanho 0 (até o fim) ou caixa corrompida
+        offset += tamanho
+    return None
+
+def ler_dimensoes_tkhd(dados, offset):
+    """
+    Interpreta o conteúdo de uma caixa 'tkhd' (a partir do byte de versão em 'offset') e retorna
+    (largura, altura) da faixa em pixels; faixas de áudio têm (0, 0).
+    """
+    # Largura e altura (ponto fixo 16.16) são os últimos campos, depois da matriz de transformação
+    inicio_dimensoes = offset + (88 if dados[offset] == 1 else 76)
+    largura, altura = struct.unpack_from(">II", dados, inicio_dimensoes)
+    return largura >> 16, altura >> 16
+
+def ler_info_mp4_local(caminho):
+    """
+    Lê de um MP4 local, mapeado em memória, só as caixas moov/mvhd/trak/tkhd (o 'mdat' é pulado
+    pelo tamanho declarado, sem ser lido). Retorna dict com duracao (s), largura, altura, bytes e
+    bitrate_kbps; duracao é None se o arquivo não tiver um moov legível.
+    """
+    info = {"duracao": None, "largura": 0, "altura": 0, "bytes": os.path.getsize(caminho), "bitrate_kbps": 0}
+    if info["bytes"] < 8:
+        return info
+    with open(caminho, "rb") as arquivo, mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) as dados:
+        fim = len(dados)
+        offset = 0
+        while offset + 8 <= fim:
+            tipo, tamanho, tamanho_cabecalho = ler_cabecalho_caixa_mp4(dados, offset)
+            tamanho = tamanho or fim - offset
+            if tipo == "moov":
+                fim_moov = min(offset + tamanho, fim)
+                filho = offset + tamanho_cabecalho
+                while filho + 8 <= fim_moov:
+                    tipo_filho, tamanho_filho, cabecalho_filho = ler_cabecalho_caixa_mp4(dados, filho)
+                    if tamanho_filho < cabecalho_filho:
+                        break
+                    if tipo_filho == "mvhd":
+                        info["duracao"] = ler_duracao_mvhd(dados, filho + cabecalho_filho)
+                    elif tipo_filho == "trak" and not info["largura"]:
+                        offset_tkhd = procurar_caixa_filha(dados, filho + cabecalho_filho, filho + tamanho_filho, "tkhd")
+                        if offset_tkhd is not None:
+                            info["largura"], info["altura"] = ler_dimensoes_tkhd(dados, offset_tkhd)
+                    filho += tamanho_filho
+                break
+            if tamanho < tamanho_cabecalho:
+                break
+            offset += tamanho
+    if info["duracao"]:
+        info["bitrate_kbps"] = round(info["bytes"] * 8 / info["duracao"] / 1000)
+    return info
+
+def ler_faixa_http(url, inicio, fim):
+    """
+    Busca os bytes [inicio, fim] de uma URL com um cabeçalho Range.
+    Retorna (dados, tamanho_total_do_arquivo); o tamanho é 0 se o servidor não o informar.
+    A resposta é lida em streaming e só até o tamanho pedido: se o servidor ignorar o Range e
+    responder 200 com o arquivo inteiro, o restante não é baixado.
+    """
+    limite = fim - inicio + 1
+    resposta = requisitar("GET", url, headers={"Range": f"bytes={inicio}-{fim}"}, stream=True)
+    try:
+        resposta.raise_for_status()
+        if resposta.status_code != 206 and inicio > 0:
+            raise IOError("servidor não suporta requisições Range")
+        dados = bytearray()
+        for bloco in resposta.iter_content(chunk_size=min(limite, 64 * 1024)):
+            dados += bloco
+            if len(dados) >= limite:
+                break
+        return bytes(dados[:limite]), tamanho_total_da_resposta(resposta, inicio)
+    finally:
+        resposta.close()
+
+def obter_duracao_mp4_por_range(url, tamanho_sonda=TAMANHO_SONDA_MP4):
+    """
+    Descobre a duração de um MP4 remoto lendo apenas o cabeçalho do arquivo.
+    Percorre as caixas de nível superior com pequenas requisições Range (pulando o 'mdat'
+    pelo seu tamanho declarado, seja o 'moov' no início ou no fim do arquivo) e lê a 'mvhd'.
+    Retorna a duração em segundos ou None se não for possível determiná-la.
+    """
+    dados, tamanho_total = ler_faixa_http(url, 0, tamanho_sonda - 1)
+    inicio_dados = 0  # offset no arquivo correspondente a dados[0]
+    offset = 0
+
+    for _ in range(64):  # limite de segurança para arquivos malformados
+        if tamanho_total and offset >= tamanho_total:
+            return None
+
+        # Garante que o cabeçalho da próxima caixa está no buffer
+        if offset < inicio_dados or offset + 16 > inicio_dados + len(dados):
+            dados, _ = ler_faixa_http(url, offset, offset + tamanho_sonda - 1)
+            inicio_dados = offset
+            if len(dados) < 8:
+                return None
+
+        tipo, tamanho, tamanho_cabecalho = ler_cabecalho_caixa_mp4(dados, offset - inicio_dados)
+        if tipo == "moov":
+            fim_moov = offset + (tamanho or tamanho_total - offset)
+            # A mvhd costuma ser a primeira filha do moov: basta trazer o começo dele
+            if offset + tamanho_cabecalho + 128 > inicio_dados + len(dados):
+                dados, _ = ler_faixa_http(url, offset, min(fim_moov, offset + tamanho_sonda) - 1)
+                inicio_dados = offset
+            fim_no_buffer = min(fim_moov, inicio_dados + len(dados)) - inicio_dados
+            offset_mvhd = procurar_caixa_filha(dados, offset + tamanho_cabecalho - inicio_dados, fim_no_buffer, "mvhd")
+            return ler_duracao_mvhd(dados, offset_mvhd) if offset_mvhd is not None else None
+
+        if tamanho < tamanho_cabecalho:
+            return None
+        offset += tamanho
+
+    return None
+
+@rastrear()
+def sondar_duracao(url):
+    """
+    Versão de obter_duracao_mp4_por_range para uso no pool: nunca lança exceção.
+    Retorna a duração formatada (hh:mm:ss) ou mensagem de erro, como extrair_duracao_video.
+    """
+    try:
+        duracao = obter_duracao_mp4_por_range(url)
+    except Exception as e:
+        print(f"⚠️ Falha ao sondar duração via Range: {e}")
+        return "ERRO AO PEGAR DURAÇÃO"
+    return format_seconds_to_hhmmss(duracao) if duracao else "DURAÇÃO N/D"
+
+@rastrear()
 def obter_link_download_maior_resolucao(driver):
     """
     Aguarda e retorna o link da maior resolução disponível (prioridade: 720p > 480p > 360p).
     """
+    links_info = obter_links_download(driver)
+    if not links_info:
+        return None, None
+    return escolher_link_por_prioridade(links_info)
+
+def obter_links_download(driver):
+    """
+    Expande "Opções de download" e retorna todos os links como lista de (texto_minusculo, href),
+    ou lista vazia se não aparecerem.
+    """
     try:
         # Clica na seção "Opções de download" para expandir os links
         download_section = WebDriverWait(driver, 10).until(
@@ -560,171 +2088,2687 @@ def obter_link_download_maior_resolucao(driver):
         if not links_container:  
             # Só clica se os links ainda não estiverem disponíveis
             download_section.click()
-            time.sleep(1) # Dá tempo para o DOM expandir e os links aparecerem
+            dormir(1) # Dá tempo para o DOM expandir e os links aparecerem
 
             # Aguarda os links aparecerem
             links_container = WebDriverWait(driver, 10).until(
                 EC.presence_of_all_elements_located((By.CSS_SELECTOR, "div.sc-Rmtcm.cKiCd"))
             )
 
-        # Agora coleta os links
-        links = driver.find_elements(By.CSS_SELECTOR, "div.sc-Rmtcm.cKiCd a.Button.-small")
-        links_info = [(link.text.strip().lower(), link.get_attribute("href")) for link in links if link.get_attribute("href")]
-
-        # Define a ordem de prioridade das resoluções
-        resolucoes_prioridade = ["720p", "480p", "360p"]
-        #resolucoes_prioridade = ["1080p"]
-
-        # Tenta pegar o primeiro link disponível de acordo com a prioridade
-        for resolucao in resolucoes_prioridade:
-            for link in links:
-                href = link.get_attribute("href")
-                if href and resolucao in link.text.strip().lower():
-                    print(f"🎯 Link encontrado com resolução/prioridade {resolucao}")
-                    return resolucao, href  # retorna a resolução e o href
-    
-        # Se não encontrar nenhum link com as resoluções prioritárias, retorna o primeiro link válido
-        if links_info:
-            #primeira_resolucao, primeiro_href = links_info[0]
-            primeiro_href = links_info[0][1]
-            primeira_resolucao = extrair_resolucao(primeiro_href)
-            print(f"⚠️ Nenhum link nas resoluções preferidas. Usando: {primeira_resolucao}, que é o primeiro link válido.")
-            return primeira_resolucao, primeiro_href  # fallback
-
-        print("❌ Nenhum link disponível.")
-        return None, None
+        # Agora coleta os links (texto e href de todos numa única chamada, com fallback elemento a elemento)
+        links_info = snapshot_links_download(driver) if USAR_SNAPSHOT_DOM else None
+        if links_info is None:
+            links = driver.find_elements(By.CSS_SELECTOR, "div.sc-Rmtcm.cKiCd a.Button.-small")
+            links_info = [(link.text.strip().lower(), link.get_attribute("href")) for link in links]
+            links_info = [(texto, href) for texto, href in links_info if href]
+
+        return links_info
     
     except TimeoutException as e:
         print(f"⚠️ Erro ao obter link de download: {e}")
 
-    return None, None
+    return []
 
-def baixar_arquivo(url, caminho_arquivo):
+def escolher_link_por_prioridade(links_info):
     """
-    Faz o download via requests, com contagem progressiva de porcentagem.
+    Escolhe, numa lista de (texto_minusculo, href), o link de maior resolução (720p > 480p > 360p).
+    Retorna (resolucao, href) ou (None, None).
     """
-    try:
-        resposta = requests.get(url, stream=True, timeout=60)
-        resposta.raise_for_status()
-        
-        tamanho_total_bytes = int(resposta.headers.get('content-length', 0))
-        tamanho_bloco = 1024 * 1024  # 1MB
-        total_bytes_baixados = 0
-        tempo_inicio = time.time()
-
-        # Faz o download do arquivo, iterando em blocos (bloco) de até 1MB cada (tamanho_bloco)
-        with open(caminho_arquivo, "wb") as arquivo:
-            for bloco in resposta.iter_content(chunk_size=tamanho_bloco):
-                if bloco:
-                    arquivo.write(bloco)
-                    total_bytes_baixados += len(bloco)
-                    porcentagem = (total_bytes_baixados / tamanho_total_bytes) * 100 if tamanho_total_bytes else 0
-
-                    # Tempo decorrido e velocidade média
-                    tempo_decorrido = time.time() - tempo_inicio
-                    minutos = int(tempo_decorrido // 60)
-                    segundos = int(tempo_decorrido % 60)
-                    tempo_formatado = f"{minutos:02d}:{segundos:02d}"
-                    velocidade_media = (total_bytes_baixados / 1024 / 1024) / tempo_decorrido if tempo_decorrido > 0 else 0
-
-                    # Atualiza a linha com o progresso
-                    sys.stdout.write(
-                        f"\r⬇️ Download: {porcentagem:.2f}% "
-                        f"({total_bytes_baixados // (1024 * 1024)} MB de {tamanho_total_bytes // (1024 * 1024)} MB) "
-                        f"[{tempo_formatado}, {velocidade_media:.2f}MB/s]"
-                    )
-                    sys.stdout.flush()
-
-        print(f"\n✅ Download concluído: {os.path.basename(caminho_arquivo)}")
-        
-    except Exception as e:
-        print(f"❌ Erro ao baixar: {e}")
+    # Define a ordem de prioridade das resoluções
+    resolucoes_prioridade = ["720p", "480p", "360p"]
+    #resolucoes_prioridade = ["1080p"]
+
+    # Tenta pegar o primeiro link disponível de acordo com a prioridade
+    for resolucao in resolucoes_prioridade:
+        for texto, href in links_info:
+            if resolucao in texto:
+                print(f"🎯 Link encontrado com resolução/prioridade {resolucao}")
+                return resolucao, href  # retorna a resolução e o href
+
+    # Se não encontrar nenhum link com as resoluções prioritárias, retorna o primeiro link válido
+    if links_info:
+        #primeira_resolucao, primeiro_href = links_info[0]
+        primeiro_href = links_info[0][1]
+        primeira_resolucao = extrair_resolucao(primeiro_href)
+        print(f"⚠️ Nenhum link nas resoluções preferidas. Usando: {primeira_resolucao}, que é o primeiro link válido.")
+        return primeira_resolucao, primeiro_href  # fallback
 
-def realizar_downloads(driver):
+    print("❌ Nenhum link disponível.")
+    return None, None
+
+def abrir_video_e_obter_link(driver, video_el, todas=False):
     """
-    Percorre todas as aulas e baixa os vídeos na maior resolução disponível (preferencialmente 720p).
-    Retorna uma lista de vídeos processados para permitir contagem fora da função.
+    Abre o vídeo clicando no elemento, remove overlays e resolve o link de maior resolução.
+    Não volta para a lista: quem chama decide quando chamar voltar_para_lista.
+    Com video_el None (navegação direta), o vídeo já está aberto na página atual.
+    Retorna (resolucao, url) ou (None, None); com todas=True, a lista de (texto, href) de todas as resoluções.
     """
-    print("📥 Iniciando processo de download das videoaulas...")
-    
-    os.makedirs(PASTA_DESTINO, exist_ok=True)
-    elementos_aulas = driver.find_elements(By.CSS_SELECTOR, "a.Collapse-header")
+    if video_el is not None:
+        clicar_elemento_com_rolagem(driver, video_el, espera_clicavel=True)
 
-    resultados = []  # lista para acumular vídeos processados
+    # Remove pop-ups ou overlays conhecidos (Neste caso, remover o pop-up de aceitação de cookies)
+    limpar_popups_ou_overlays(driver)
 
-    def callback(idx, titulo, video_el, titulo_aula, subtitulo_aula, total_videos):
-        # salva info do vídeo processado
-        resultados.append((titulo_aula, subtitulo_aula, idx, titulo))
+    if todas:
+        return obter_links_download(driver)
+    return obter_link_download_maior_resolucao(driver)
 
-        print(f"▶️ {idx}/{total_videos} - {titulo}")
-        clicar_elemento_com_rolagem(driver, video_el, espera_clicavel=True)
+# ======= AGENDADOR DE TRANSFERÊNCIAS =======
+class AgendadorTransferencias:
+    """
+    Coordena todos os downloads do processo:
+    - balde de fichas (token bucket) global para limitar a banda total;
+    - limite de downloads simultâneos por host;
+    - janelas de horário em que downloads podem começar;
+    - ajuste do número de downloads ativos pela vazão medida: acrescenta um enquanto a vazão
+      agregada sobe, recua quando ela estabiliza ou quando aparecem erros.
+    """
 
-        # Remove pop-ups ou overlays conhecidos (Neste caso, remover o pop-up de aceitação de cookies)
-        limpar_popups_ou_overlays(driver)
-        
-        resolucao, url = obter_link_download_maior_resolucao(driver)
-        if url:
-            nome_arquivo = construir_nome_arquivo(titulo_aula, subtitulo_aula, idx, titulo, url, resolucao)
-            caminho = os.path.join(PASTA_DESTINO, nome_arquivo)
+    def __init__(self, limite_bytes_s=0, max_por_host=MAX_DOWNLOADS_POR_HOST, janelas=None,
+                 max_ativos=NUM_WORKERS_DOWNLOAD, adaptativo=DOWNLOADS_ADAPTATIVOS):
+        self.limite_bytes_s = limite_bytes_s
+        self.janelas = janelas or []
+        self.max_ativos = max(1, max_ativos)
+        self.adaptativo = adaptativo
+        self.limite_ativos = min(2, self.max_ativos) if adaptativo else self.max_ativos
+        self.max_por_host = max_por_host
+        self.ativos = 0
+        self.por_host = {}
+        self.condicao = threading.Condition()
 
-            if os.path.exists(caminho):
-                print(f"✔️ Já existe: {nome_arquivo}")
-            else:
-                print(f"⬇️ Baixando: {nome_arquivo}")
-                baixar_arquivo(url, caminho)
-        else:
-            print("❌ Nenhum link de vídeo encontrado.")
+        # Balde de fichas: capacidade de 1 segundo de banda, começando vazio (sem rajada inicial)
+        self.fichas = 0.0
+        self.ultima_reposicao = time.monotonic()
+        self.trava_fichas = threading.Lock()
 
-        driver.back()
+        # Medições para o ajuste adaptativo e para o resumo final
+        self.inicio = time.monotonic()
+        self.bytes_total = 0
+        self.bytes_intervalo = 0
+        self.erros_intervalo = 0
+        self.erros_total = 0
+        self.inicio_intervalo = self.inicio
+        self.vazao_anterior = 0.0
+        self.ultima_acao = None
+        self.historico_limite = [self.limite_ativos]
+        self.tempo_espera_banda = 0.0
+        self.tempo_espera_janela = 0.0
 
-    for aula in elementos_aulas:
-        processar_aula(driver, aula, callback)
+    # ----- janelas de horário -----
+    def dentro_da_janela(self, agora=None):
+        if not self.janelas:
+            return True
+        agora = (agora or datetime.now()).strftime("%H:%M")
+        for inicio, fim in self.janelas:
+            if (inicio <= fim and inicio <= agora < fim) or (inicio > fim and (agora >= inicio or agora < fim)):
+                return True
+        return False
 
-    return resultados
+    def aguardar_janela(self):
+        if self.dentro_da_janela():
+            return
+        print(f"🌙 Fora das janelas de download {self.janelas}, aguardando...")
+        inicio = time.monotonic()
+        while not self.dentro_da_janela():
+            dormir(30)
+        self.tempo_espera_janela += time.monotonic() - inicio
 
-# ======= FLUXO PRINCIPAL =======
-def main():
-    print("🧠 Escolha o que deseja fazer:")
-    print("1 - Extrair duração das videoaulas")
-    print("2 - Baixar todas as videoaulas (resolução mais alta disponível)")
+    # ----- vagas (concorrência global e por host) -----
+    def adquirir(self, host):
+        """
+        Bloqueia até haver vaga para um novo download (janela, limite global adaptativo e limite do host).
+        """
+        self.aguardar_janela()
+        with self.condicao:
+            while self.ativos >= self.limite_ativos or self.por_host.get(host, 0) >= self.max_por_host:
+                self.condicao.wait()
+            self.ativos += 1
+            self.por_host[host] = self.por_host.get(host, 0) + 1
 
-    escolha = input("Digite 1 ou 2: ").strip()
-    if escolha not in ["1", "2"]:
-        print("❌ Opção inválida. Encerrando.")
-        return
+    def liberar(self, host, erro=False):
+        with self.condicao:
+            self.ativos -= 1
+            self.por_host[host] -= 1
+            if erro:
+                self.erros_intervalo += 1
+                self.erros_total += 1
+            self.condicao.notify_all()
+        self.ajustar()
 
-    driver = iniciar_driver(headless=False)
+    # ----- banda -----
+    def consumir(self, num_bytes):
+        """
+        Registra bytes recebidos e, com limite de banda, espera o necessário para respeitá-lo.
+        """
+        with self.condicao:
+            self.bytes_total += num_bytes
+            self.bytes_intervalo += num_bytes
+        if self.limite_bytes_s:
+            with self.trava_fichas:
+                agora = time.monotonic()
+                self.fichas = min(self.limite_bytes_s, self.fichas + (agora - self.ultima_reposicao) * self.limite_bytes_s)
+                self.ultima_reposicao = agora
+                self.fichas -= num_bytes
+                espera = -self.fichas / self.limite_bytes_s if self.fichas < 0 else 0
+                self.tempo_espera_banda += espera
+            if espera:
+                time.sleep(espera)  # espera de controle de banda, não um sleep fixo
+        self.ajustar()
 
-    try:
-        sucesso_login = realizar_login(driver, USUARIO, SENHA)
-        if not sucesso_login:
-            print("❌ Falha no login. Encerrando.")
+    # ----- ajuste adaptativo -----
+    def ajustar(self):
+        if not self.adaptativo:
             return
+        with self.condicao:
+            agora = time.monotonic()
+            decorrido = agora - self.inicio_intervalo
+            if decorrido < INTERVALO_AJUSTE_S:
+                return
+            vazao = self.bytes_intervalo / decorrido
+            limite_anterior = self.limite_ativos
+            perto_do_limite_de_banda = self.limite_bytes_s and vazao >= 0.9 * self.limite_bytes_s
 
-        garantir_pagina_aulas(driver)
-        time.sleep(3)
+            if self.erros_intervalo:
+                self.limite_ativos = max(1, self.limite_ativos - 1)
+                self.ultima_acao = "-"
+            elif self.ultima_acao == "+" and vazao < self.vazao_anterior * 1.05:
+                # O download extra não aumentou a vazão: desfaz
+                self.limite_ativos = max(1, self.limite_ativos - 1)
+                self.ultima_acao = "-"
+            elif self.ativos >= self.limite_ativos and self.limite_ativos < self.max_ativos and not perto_do_limite_de_banda:
+                self.limite_ativos += 1
+                self.ultima_acao = "+"
+            else:
+                self.ultima_acao = None
 
-        if escolha == "1":
-            # -------------------- OPÇÃO 1: DURAÇÃO ------------------------
-            # Coleta a estrutura hierárquica: aulas e videoaulas com durações
-            aulas_e_videoaulas = coletar_aulas_e_videoaulas(driver)
+            if self.limite_ativos != limite_anterior:
+                print(f"🎚️ Downloads ativos: {limite_anterior} → {self.limite_ativos} "
+                      f"(vazão {vazao / 1024 / 1024:.2f}MB/s, erros no intervalo: {self.erros_intervalo})")
+                self.historico_limite.append(self.limite_ativos)
+                self.condicao.notify_all()
 
-            total_videos = len(aulas_e_videoaulas)
-            print(f"🎥 {total_videos} vídeos encontrados no total.")
+            self.vazao_anterior = vazao
+            self.bytes_intervalo = 0
+            self.erros_intervalo = 0
+            self.inicio_intervalo = agora
 
-            salvar_em_csv(ARQUIVO_SAIDA, aulas_e_videoaulas, header=["Aula", "Subtítulo", "Vídeo", "Videoaula", "Duração"])
+    def imprimir_estatisticas(self):
+        decorrido = time.monotonic() - self.inicio
+        vazao = self.bytes_total / decorrido / 1024 / 1024 if decorrido > 0 else 0
+        configurado = f"{self.limite_bytes_s / 1024 / 1024:.2f}MB/s" if self.limite_bytes_s else "sem limite"
+        print(
+            f"🚦 Transferências: {self.bytes_total / 1024 / 1024:.1f} MB em {decorrido:.1f}s | "
+            f"vazão média {vazao:.2f}MB/s (configurado: {configurado}) | "
+            f"downloads ativos: {min(self.historico_limite)}–{max(self.historico_limite)} (final {self.limite_ativos}) | "
+            f"erros: {self.erros_total} | espera por banda: {self.tempo_espera_banda:.1f}s, por janela: {self.tempo_espera_janela:.1f}s"
+        )
 
-        elif escolha == "2":
-            # -------------------- OPÇÃO 2: DOWNLOAD ------------------------
-            # Realiza o download das videoaulas de acordo com a estrutura hierárquica: aulas e videoaulas
-            videos_baixados = realizar_downloads(driver)
+_AGENDADOR = None
+_TRAVA_AGENDADOR = threading.Lock()
 
-            total_videos = len(videos_baixados)
-            print(f"🎥 {total_videos} vídeos processados no total.")
+def obter_agendador():
+    """
+    Retorna o agendador de transferências do processo, criado com as configurações do topo do script.
+    """
+    global _AGENDADOR
+    with _TRAVA_AGENDADOR:
+        if _AGENDADOR is None:
+            _AGENDADOR = AgendadorTransferencias(
+                limite_bytes_s=int(LIMITE_BANDA_MBPS * 1024 * 1024),
+                max_por_host=MAX_DOWNLOADS_POR_HOST,
+                janelas=JANELAS_DOWNLOAD,
+                max_ativos=NUM_WORKERS_DOWNLOAD,
+                adaptativo=DOWNLOADS_ADAPTATIVOS,
+            )
+        return _AGENDADOR
 
-    finally:
-        driver.quit()
-        print("🔚 Processo finalizado.")
+def imprimir_estatisticas_agendador():
+    """
+    Mostra a banda obtida vs. configurada e a evolução dos downloads ativos, se houve downloads.
+    """
+    if _AGENDADOR is not None:
+        _AGENDADOR.imprimir_estatisticas()
+
+# ======= ORÇAMENTO DE DOWNLOADS (RESOLUÇÃO POR VÍDEO) =======
+def orcamento_ativo():
+    return bool(COTA_DISCO_MB or PRAZO_DOWNLOADS_MIN)
+
+def qualidade_resolucao(resolucao):
+    """
+    '720p' -> 720 (resolução desconhecida fica por último).
+    """
+    return int(resolucao[:-1]) if resolucao and resolucao[:-1].isdigit() else 0
+
+def formatar_mb(num_bytes):
+    return f"{num_bytes / 1024 / 1024:.1f} MB"
+
+class PlanejadorDownloads:
+    """
+    Escolhe a resolução de cada vídeo para o curso inteiro caber na cota de disco e/ou no prazo.
+    Mede o tamanho de todas as variantes (HEAD content-length), começa todos os vídeos na menor
+    resolução e sobe um degrau por rodada em todos eles (os aumentos mais baratos primeiro) enquanto
+    sobrar orçamento: a qualidade fica a mais alta e uniforme possível.
+    Os vídeos são enfileirados aos poucos e os que ainda não foram enfileirados são replanejados a
+    cada INTERVALO_REPLANEJAMENTO_S com a vazão medida pelo agendador.
+    """
+
+    def __init__(self, cota_bytes=0, prazo_s=0, vazao_estimada=VAZAO_ESTIMADA_MBPS * 1024 * 1024):
+        self.cota_bytes = cota_bytes
+        self.prazo = time.monotonic() + prazo_s if prazo_s else None
+        self.vazao = vazao_estimada
+        self.itens = []
+        self.bytes_enfileirados = 0
+
+    def adicionar(self, titulo_aula, subtitulo_aula, idx, titulo, links):
+        """
+        Acrescenta um vídeo com suas variantes: 'links' é a lista de (texto, href) dos links de download.
+        Retorna o item (variantes da maior para a menor resolução) ou None se não houver links.
+        """
+        variantes = [
+            {"resolucao": extrair_resolucao(texto) or extrair_resolucao(href), "url": href, "bytes": None}
+            for texto, href in links if href
+        ]
+        if not variantes:
+            return None
+        variantes.sort(key=lambda variante: qualidade_resolucao(variante["resolucao"]), reverse=True)
+        item = {"tarefa": (titulo_aula, subtitulo_aula, idx, titulo), "variantes": variantes, "escolha": 0, "baixada": None}
+        self.itens.append(item)
+        return item
+
+    def medir_tamanhos(self, num_sondagens=NUM_SONDAGENS_DURACAO):
+        """
+        Tamanho de todas as variantes em paralelo: HEAD e, se o servidor recusar ou não informar
+        o content-length (comum em links assinados), um GET de 'Range: bytes=0-0' lido pelo Content-Range.
+        Uma variante já baixada segundo o manifesto (arquivo_ja_baixado) fixa a escolha do vídeo (custo zero). Variantes de
+        tamanho ainda desconhecido saem do plano, e um vídeo sem nenhuma variante medida é tratado
+        como fora do orçamento (não é baixado).
+        """
+        def tamanho(url):
+            try:
+                resposta = requisitar("HEAD", url, allow_redirects=True)
+                resposta.raise_for_status()
+                num_bytes = int(resposta.headers.get("content-length", 0) or 0)
+                if num_bytes:
+                    return num_bytes
+            except Exception:
+                pass
+            try:
+                resposta = requisitar("GET", url, headers={"Range": "bytes=0-0"}, stream=True)
+                try:
+                    resposta.raise_for_status()
+                    return tamanho_total_da_resposta(resposta, 0) or None
+                finally:
+                    resposta.close()
+            except Exception:
+                return None
+
+        variantes = [variante for item in self.itens for variante in item["variantes"]]
+        print(f"📏 Consultando o tamanho de {len(variantes)} variantes de {len(self.itens)} vídeos...")
+        with ThreadPoolExecutor(max_workers=max(1, num_sondagens), thread_name_prefix="tamanhos") as executor:
+            for variante, num_bytes in zip(variantes, executor.map(tamanho, [v["url"] for v in variantes])):
+                variante["bytes"] = num_bytes
+
+        sem_tamanho = []
+        for item in list(self.itens):
+            for variante in item["variantes"]:
+                nome = construir_nome_arquivo(*item["tarefa"], variante["url"], variante["resolucao"])
+                # Mesmo critério dos workers (manifesto): um arquivo incompleto ou corrompido não conta como baixado
+                if arquivo_ja_baixado(nome, os.path.join(PASTA_DESTINO, nome), variante["url"], variante["resolucao"]):
+                    item["variantes"], item["baixada"], item["escolha"] = [variante], 0, 0
+                    break
+            else:
+                item["variantes"] = [variante for variante in item["variantes"] if variante["bytes"]]
+                if not item["variantes"]:
+                    self.itens.remove(item)
+                    sem_tamanho.append(item["tarefa"][3])
+        if sem_tamanho:
+            print(f"⚠️ {len(sem_tamanho)} vídeo(s) sem tamanho conhecido (HEAD e Range recusados) ficaram fora do plano:")
+            for titulo in sem_tamanho:
+                print(f"      - {titulo}")
+
+    @staticmethod
+    def custo(item):
+        return 0 if item["baixada"] is not None else item["variantes"][item["escolha"]]["bytes"]
+
+    def orcamento(self, bytes_baixados):
+        """
+        Bytes que ainda cabem: o que sobra da cota e/ou o que a vazão atual transfere até o prazo
+        (descontado o que já está enfileirado e não terminou). None = sem limite.
+        """
+        limites = []
+        if self.cota_bytes:
+            limites.append(self.cota_bytes - self.bytes_enfileirados)
+        if self.prazo is not None:
+            em_andamento = max(0, self.bytes_enfileirados - bytes_baixados)
+            limites.append(self.vazao * max(0.0, self.prazo - time.monotonic()) - em_andamento)
+        return min(limites) if limites else None
+
+    def planejar(self, itens, orcamento):
+        """
+        Distribui 'orcamento' entre 'itens' (ajusta item["escolha"]). Retorna quantos bytes faltaram
+        para caber tudo na menor resolução (0 se coube).
+        """
+        for item in itens:
+            if item["baixada"] is None:
+                item["escolha"] = len(item["variantes"]) - 1 if orcamento is not None else 0
+        if orcamento is None:
+            return 0
+        restante = orcamento - sum(self.custo(item) for item in itens)
+        if restante < 0:
+            return -restante
+        subiu = True
+        while subiu:
+            subiu = False
+            degraus = sorted(
+                (item["variantes"][item["escolha"] - 1]["bytes"] - item["variantes"][item["escolha"]]["bytes"], numero)
+                for numero, item in enumerate(itens)
+                if item["baixada"] is None and item["escolha"] > 0
+            )
+            for aumento, numero in degraus:
+                if aumento <= restante:
+                    itens[numero]["escolha"] -= 1
+                    restante -= aumento
+                    subiu = True
+        return 0
+
+    def resumo(self, itens):
+        """
+        {resolucao: [videos, bytes]} da escolha atual (os já baixados ficam em "já baixado").
+        """
+        por_resolucao = {}
+        for item in itens:
+            chave = "já baixado" if item["baixada"] is not None else item["variantes"][item["escolha"]]["resolucao"]
+            contagem = por_resolucao.setdefault(chave, [0, 0])
+            contagem[0] += 1
+            contagem[1] += self.custo(item)
+        return por_resolucao
+
+    def imprimir_plano(self, itens, orcamento, faltando, titulo="📋 Plano de downloads"):
+        por_resolucao = self.resumo(itens)
+        total = sum(num_bytes for _, num_bytes in por_resolucao.values())
+        limite = f"orçamento {formatar_mb(orcamento)}" if orcamento is not None else "sem orçamento"
+        print(f"{titulo}: {len(itens)} vídeos, {formatar_mb(total)}, {limite}, vazão {self.vazao / 1024 / 1024:.2f}MB/s")
+        for resolucao, (videos, num_bytes) in sorted(por_resolucao.items(), key=lambda item: -qualidade_resolucao(item[0])):
+            print(f"   {resolucao:>10}: {videos:>4} vídeos | {formatar_mb(num_bytes):>11} | ETA {format_seconds_to_hhmmss(num_bytes / self.vazao)}")
+        print(f"   {'total':>10}: ETA {format_seconds_to_hhmmss(total / self.vazao)}")
+        if faltando:
+            print(f"⚠️ Nem na menor resolução o curso cabe no orçamento (faltam {formatar_mb(faltando)}).")
+
+    def executar(self, fila_downloads, janela=NUM_WORKERS_DOWNLOAD):
+        """
+        Mede, planeja, mostra o plano e enfileira os vídeos aos poucos (no máximo 'janela' esperando
+        na fila), replanejando os restantes conforme a vazão medida. Com cota, um vídeo que não cabe
+        mais é pulado. Retorna quantos vídeos foram enfileirados.
+        """
+        if not self.itens:
+            return 0
+        self.medir_tamanhos()
+        agendador = obter_agendador()
+        bytes_iniciais = agendador.bytes_total
+        ultima_medicao = (time.monotonic(), bytes_iniciais)
+        pendentes = list(self.itens)
+        orcamento = self.orcamento(0)
+        self.imprimir_plano(pendentes, orcamento, self.planejar(pendentes, orcamento))
+
+        enfileirados = pulados = 0
+        while pendentes:
+            # Só alguns vídeos esperam na fila: os demais ainda podem mudar de resolução
+            while fila_downloads.qsize() >= max(1, janela):
+                time.sleep(0.2)
+
+            agora, baixados_total = time.monotonic(), agendador.bytes_total
+            if agora - ultima_medicao[0] >= INTERVALO_REPLANEJAMENTO_S:
+                recente = (baixados_total - ultima_medicao[1]) / (agora - ultima_medicao[0])
+                if recente > 0:
+                    self.vazao = 0.5 * self.vazao + 0.5 * recente  # média móvel: um intervalo ruim não derruba o plano
+                ultima_medicao = (agora, baixados_total)
+                antes = self.resumo(pendentes)
+                orcamento = self.orcamento(baixados_total - bytes_iniciais)
+                faltando = self.planejar(pendentes, orcamento)
+                if self.resumo(pendentes) != antes:
+                    self.imprimir_plano(pendentes, orcamento, faltando, titulo="🔁 Replanejado com a vazão medida")
+
+            item = pendentes.pop(0)
+            custo = self.custo(item)
+            if self.cota_bytes and self.bytes_enfileirados + custo > self.cota_bytes:
+                print(f"⛔ Cota de disco esgotada, pulando: {item['tarefa'][3]}")
+                pulados += 1
+                continue
+            variante = item["variantes"][item["escolha"]]
+            self.bytes_enfileirados += custo
+            fila_downloads.put((*item["tarefa"], variante["resolucao"], variante["url"]))
+            enfileirados += 1
+
+        if pulados:
+            print(f"⚠️ {pulados} vídeo(s) ficaram fora por causa da cota de disco.")
+        return enfileirados
+
+def criar_planejador():
+    """
+    Planejador com a cota e o prazo configurados, ou None se não houver orçamento.
+    """
+    if not orcamento_ativo():
+        return None
+    return PlanejadorDownloads(cota_bytes=int(COTA_DISCO_MB * 1024 * 1024), prazo_s=PRAZO_DOWNLOADS_MIN * 60,
+                               vazao_estimada=VAZAO_ESTIMADA_MBPS * 1024 * 1024)
+
+# ======= PROGRESSO E MÉTRICAS DOS DOWNLOADS =======
+class SaidaComPainel:
+    """
+    Substitui sys.stdout enquanto o painel está ativo: antes de qualquer print do script,
+    apaga o painel desenhado, para que mensagens e painel não se misturem na tela.
+    """
+
+    def __init__(self, painel, saida_original):
+        self.painel = painel
+        self.saida_original = saida_original
+
+    def write(self, texto):
+        with self.painel.trava_tela:
+            self.painel.apagar()
+            return self.saida_original.write(texto)
+
+    def flush(self):
+        self.saida_original.flush()
+
+    def __getattr__(self, nome):
+        return getattr(self.saida_original, nome)
+
+class PainelProgresso:
+    """
+    Progresso centralizado dos downloads. As transferências só incrementam contadores
+    (registrar/atualizar/concluir/finalizar); uma thread renderiza a cada 'intervalo' segundos
+    uma visão por arquivo e agregada (MB/s e ETA), ou grava métricas em JSON lines / Prometheus.
+    """
+
+    def __init__(self, formato=FORMATO_METRICAS, arquivo=None, intervalo=INTERVALO_PROGRESSO_S):
+        if formato == "terminal" and not sys.stdout.isatty():
+            formato = "jsonl"  # sem terminal o painel só embaralharia os logs; o progresso vai para o arquivo
+        self.formato = formato
+        # Cada formato tem seu arquivo padrão, para um não sobrescrever o outro
+        self.arquivo = arquivo or (ARQUIVO_METRICAS_PROMETHEUS if formato == "prometheus" else ARQUIVO_METRICAS_JSONL)
+        self.intervalo = intervalo
+        self.trava = threading.Lock()
+        self.trava_tela = threading.RLock()
+        self.transferencias = {}  # id -> [nome, total, baixados, baixados_na_ultima_renderizacao]
+        self.proximo_id = 0
+        self.bytes_total = 0
+        self.concluidos = 0
+        self.falhos = 0
+        self.linhas_desenhadas = 0
+        self.saida_original = None
+        self.parar = threading.Event()
+        self.ultima_renderizacao = time.monotonic()
+        self.inicio = self.ultima_renderizacao
+        self.vazao_agregada = 0.0
+        self.thread = threading.Thread(target=self.executar, name="painel-progresso", daemon=True)
+
+    # ----- chamadas das transferências (baratas) -----
+    def registrar(self, nome, total=0):
+        with self.trava:
+            self.proximo_id += 1
+            self.transferencias[self.proximo_id] = [nome, total, 0, 0, False]
+            return self.proximo_id
+
+    def definir_total(self, transferencia, total, ja_baixados=0):
+        with self.trava:
+            dados = self.transferencias[transferencia]
+            dados[1], dados[2], dados[3] = total, ja_baixados, ja_baixados
+
+    def atualizar(self, transferencia, num_bytes):
+        with self.trava:
+            self.transferencias[transferencia][2] += num_bytes
+            self.bytes_total += num_bytes
+
+    def concluir(self, transferencia):
+        with self.trava:
+            self.transferencias[transferencia][4] = True
+
+    def finalizar(self, transferencia):
+        with self.trava:
+            dados = self.transferencias.pop(transferencia, None)
+            if dados is not None:
+                if dados[4]:
+                    self.concluidos += 1
+                else:
+                    self.falhos += 1
+
+    # ----- renderização -----
+    def iniciar(self):
+        if self.formato == "terminal":
+            self.saida_original = sys.stdout
+            sys.stdout = SaidaComPainel(self, self.saida_original)
+        self.thread.start()
+
+    def encerrar(self):
+        self.parar.set()
+        self.thread.join()
+        self.renderizar()
+        with self.trava_tela:
+            self.apagar()
+        if self.saida_original is not None:
+            sys.stdout = self.saida_original
+            self.saida_original = None
+
+    def executar(self):
+        while not self.parar.wait(self.intervalo):
+            try:
+                self.renderizar()
+            except Exception as e:
+                print(f"⚠️ Falha ao atualizar o progresso: {e}")
+
+    def coletar(self):
+        """
+        Tira uma foto dos contadores e calcula as vazões desde a última renderização.
+        """
+        agora = time.monotonic()
+        decorrido = max(agora - self.ultima_renderizacao, 1e-6)
+        with self.trava:
+            arquivos = []
+            for nome, total, baixados, anteriores, _ in self.transferencias.values():
+                arquivos.append({"nome": nome, "total": total, "baixados": baixados, "vazao": (baixados - anteriores) / decorrido})
+            for dados in self.transferencias.values():
+                dados[3] = dados[2]
+            bytes_total, concluidos, falhos = self.bytes_total, self.concluidos, self.falhos
+        vazao = sum(arquivo["vazao"] for arquivo in arquivos)
+        # Média móvel exponencial para a vazão agregada não oscilar a cada intervalo
+        self.vazao_agregada = vazao if not self.vazao_agregada else 0.7 * self.vazao_agregada + 0.3 * vazao
+        self.ultima_renderizacao = agora
+        restantes = sum(max(0, a["total"] - a["baixados"]) for a in arquivos if a["total"])
+        return {
+            "ts": time.time(),
+            "ativos": len(arquivos),
+            "concluidos": concluidos,
+            "falhos": falhos,
+            "bytes_total": bytes_total,
+            "vazao_bytes_s": self.vazao_agregada,
+            "eta_s": restantes / self.vazao_agregada if self.vazao_agregada > 0 else None,
+            "arquivos": arquivos,
+        }
+
+    def renderizar(self):
+        foto = self.coletar()
+        if self.formato == "jsonl":
+            with open(self.arquivo, "a", encoding="utf-8") as f:
+                f.write(json.dumps(foto, ensure_ascii=False) + "\n")
+        elif self.formato == "prometheus":
+            self.gravar_prometheus(foto)
+        elif self.saida_original is not None:
+            self.desenhar(foto)
+
+    def gravar_prometheus(self, foto):
+        linhas = [
+            "# HELP videoaulas_download_bytes_total Bytes baixados nesta execução.",
+            "# TYPE videoaulas_download_bytes_total counter",
+            f"videoaulas_download_bytes_total {foto['bytes_total']}",
+            "# HELP videoaulas_download_vazao_bytes Vazão agregada atual em bytes por segundo.",
+            "# TYPE videoaulas_download_vazao_bytes gauge",
+            f"videoaulas_download_vazao_bytes {foto['vazao_bytes_s']:.0f}",
+            "# TYPE videoaulas_downloads_ativos gauge",
+            f"videoaulas_downloads_ativos {foto['ativos']}",
+            "# TYPE videoaulas_downloads_concluidos_total counter",
+            f"videoaulas_downloads_concluidos_total {foto['concluidos']}",
+            "# TYPE videoaulas_downloads_falhos_total counter",
+            f"videoaulas_downloads_falhos_total {foto['falhos']}",
+        ]
+        temporario = self.arquivo + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            f.write("\n".join(linhas) + "\n")
+        os.replace(temporario, self.arquivo)  # o coletor nunca lê um arquivo pela metade
+
+    def desenhar(self, foto):
+        if not foto["arquivos"] and not self.linhas_desenhadas:
+            return
+        linhas = []
+        for arquivo in foto["arquivos"]:
+            porcentagem = arquivo["baixados"] / arquivo["total"] * 100 if arquivo["total"] else 0
+            linhas.append(
+                f"⬇️ {arquivo['nome'][:60]:<60} {porcentagem:6.2f}% "
+                f"{arquivo['baixados'] / 1024 / 1024:8.1f}/{arquivo['total'] / 1024 / 1024:.1f} MB "
+                f"{arquivo['vazao'] / 1024 / 1024:7.2f}MB/s"
+            )
+        eta = foto["eta_s"]
+        linhas.append(
+            f"📦 {foto['ativos']} ativos | {foto['concluidos']} concluídos | {foto['falhos']} falhos | "
+            f"{foto['bytes_total'] / 1024 / 1024:.1f} MB | {foto['vazao_bytes_s'] / 1024 / 1024:.2f}MB/s | "
+            f"ETA {format_seconds_to_hhmmss(eta) if eta is not None else '--:--'}"
+        )
+        with self.trava_tela:
+            self.apagar()
+            self.saida_original.write("\n".join(linhas) + "\n")
+            self.saida_original.flush()
+            self.linhas_desenhadas = len(linhas)
+
+    def apagar(self):
+        """
+        Apaga as linhas do último desenho (chamado com trava_tela adquirida).
+        """
+        if self.linhas_desenhadas and self.saida_original is not None:
+            self.saida_original.write(f"\x1b[{self.linhas_desenhadas}F\x1b[J")
+            self.linhas_desenhadas = 0
+
+_PAINEL = None
+_TRAVA_PAINEL = threading.Lock()
+
+def obter_painel():
+    """
+    Retorna o painel de progresso do processo, iniciando o renderizador na primeira chamada.
+    """
+    global _PAINEL
+    with _TRAVA_PAINEL:
+        if _PAINEL is None:
+            _PAINEL = PainelProgresso(formato=FORMATO_METRICAS)
+            _PAINEL.iniciar()
+        return _PAINEL
+
+def encerrar_painel():
+    """
+    Faz a última renderização, limpa o painel da tela e restaura o sys.stdout.
+    """
+    global _PAINEL
+    with _TRAVA_PAINEL:
+        if _PAINEL is not None:
+            _PAINEL.encerrar()
+            _PAINEL = None
+
+# ======= GRAVAÇÃO EM DISCO =======
+FALLOC_FL_KEEP_SIZE = 0x01
+_FALLOCATE = None
+
+def obter_fallocate():
+    """
+    Retorna a função fallocate(2) da libc (só no Linux), ou False se não estiver disponível.
+    """
+    global _FALLOCATE
+    if _FALLOCATE is None:
+        _FALLOCATE = False
+        if sys.platform.startswith("linux"):
+            try:
+                fallocate = ctypes.CDLL(None, use_errno=True).fallocate
+                fallocate.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_longlong, ctypes.c_longlong]
+                fallocate.restype = ctypes.c_int
+                _FALLOCATE = fallocate
+            except (OSError, AttributeError):
+                pass
+    return _FALLOCATE
+
+def prealocar(arquivo, inicio, tamanho, manter_tamanho=True):
+    """
+    Reserva no disco os blocos de [inicio, inicio + tamanho) do arquivo aberto, evitando
+    fragmentação e a falta de espaço no meio do download.
+    Com manter_tamanho=True o tamanho aparente não muda (FALLOC_FL_KEEP_SIZE): o tamanho do .part
+    continua sendo a quantidade de bytes recebidos, que é o que a retomada usa. Sem suporte, não faz nada.
+    Com manter_tamanho=False o arquivo passa a ter o tamanho final (posix_fallocate, ou truncate como alternativa).
+    """
+    if tamanho <= 0:
+        return
+    if not manter_tamanho:
+        if PREALOCAR_ARQUIVOS and hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(arquivo.fileno(), inicio, tamanho)
+                return
+            except OSError:
+                pass
+        arquivo.truncate(inicio + tamanho)
+        return
+    fallocate = obter_fallocate() if PREALOCAR_ARQUIVOS else False
+    if fallocate:
+        # Falha (ex.: sistema de arquivos sem suporte) não impede o download: só perde a reserva
+        fallocate(arquivo.fileno(), FALLOC_FL_KEEP_SIZE, inicio, tamanho)
+
+def sincronizar_disco(arquivo, final=True):
+    """
+    Aplica a POLITICA_FSYNC: força os dados do arquivo para o disco antes de renomear o .part
+    ("final") ou também durante o download ("periodico", chamado com final=False).
+    """
+    if POLITICA_FSYNC == "nunca" or (not final and POLITICA_FSYNC != "periodico"):
+        return
+    arquivo.flush()
+    os.fsync(arquivo.fileno())
+
+def obter_leitor_bruto(resposta):
+    """
+    Retorna uma função readinto(buffer) que lê o corpo da resposta direto para um buffer,
+    ou None quando o corpo precisa ser decodificado (gzip etc.) ou a resposta não expõe a
+    resposta do http.client; nesses casos gravar_corpo_resposta usa o iter_content.
+    O HTTPResponse.readinto do urllib3 2.x chama read() e copia o resultado (um bytes novo por
+    bloco), então só a resposta do http.client por baixo dele copia direto do socket para o buffer.
+    """
+    if resposta.headers.get("content-encoding", "identity").lower() not in ("identity", ""):
+        return None
+    fp = getattr(getattr(resposta, "raw", None), "_fp", None)
+    if isinstance(fp, http.client.HTTPResponse):
+        return fp.readinto
+    return None
+
+def gravar_corpo_resposta(resposta, arquivo, hash_arquivo=None, ao_receber=None):
+    """
+    Copia o corpo da resposta (stream=True) para o 'arquivo' já aberto e posicionado e retorna
+    o total de bytes gravados. Cada bloco atualiza o hash (se houver), o agendador de banda,
+    chama ao_receber(n) e segue a POLITICA_FSYNC periódica.
+    Com GRAVACAO_OTIMIZADA, o mesmo bytearray é reutilizado em todas as leituras (via memoryview).
+    """
+    total = 0
+    desde_fsync = 0
+
+    def processar(bloco):
+        nonlocal total, desde_fsync
+        arquivo.write(bloco)
+        if hash_arquivo is not None:
+            hash_arquivo.update(bloco)
+        total += len(bloco)
+        desde_fsync += len(bloco)
+        obter_agendador().consumir(len(bloco))
+        if ao_receber is not None:
+            ao_receber(len(bloco))
+        if desde_fsync >= INTERVALO_FSYNC_BYTES:
+            sincronizar_disco(arquivo, final=False)
+            desde_fsync = 0
+
+    leitor = obter_leitor_bruto(resposta) if GRAVACAO_OTIMIZADA else None
+    if leitor is None:
+        for bloco in resposta.iter_content(chunk_size=TAMANHO_BLOCO_PADRAO):
+            if bloco:
+                processar(bloco)
+        return total
+
+    tamanho_bloco = TAMANHO_BLOCO_MIN
+    visao = memoryview(bytearray(tamanho_bloco))
+    while True:
+        if len(visao) < tamanho_bloco:
+            # O buffer só é trocado quando o bloco cresce (no máximo log2(MAX/MIN) vezes)
+            visao.release()
+            visao = memoryview(bytearray(tamanho_bloco))
+        inicio = time.monotonic()
+        lidos = leitor(visao[:tamanho_bloco])
+        if not lidos:
+            break
+        processar(visao[:lidos])
+        # Bloco adaptativo: conexões rápidas usam blocos maiores (menos chamadas por MB),
+        # lentas usam menores (o progresso e o limite de banda continuam sendo atualizados com frequência)
+        duracao = time.monotonic() - inicio
+        if lidos == tamanho_bloco and duracao < ALVO_TEMPO_BLOCO_S / 2 and tamanho_bloco < TAMANHO_BLOCO_MAX:
+            tamanho_bloco *= 2
+        elif duracao > ALVO_TEMPO_BLOCO_S * 2 and tamanho_bloco > TAMANHO_BLOCO_MIN:
+            tamanho_bloco //= 2
+
+    # O corpo foi lido por fora do urllib3: devolve a conexão (já no fim da resposta) ao pool
+    if hasattr(resposta.raw, "release_conn"):
+        resposta.raw.release_conn()
+    return total
+
+# ======= DOWNLOAD DOS ARQUIVOS =======
+def tamanho_total_da_resposta(resposta, offset):
+    """
+    Descobre o tamanho final do arquivo a partir dos cabeçalhos da resposta.
+    Em respostas parciais (206) usa o total do 'Content-Range'; caso contrário, offset + 'content-length'.
+    Retorna 0 se o servidor não informar o tamanho.
+    """
+    content_range = resposta.headers.get("content-range", "")
+    padrao = re.search(r"/(\d+)$", content_range)
+    if resposta.status_code == 206 and padrao:
+        return int(padrao.group(1))
+    content_length = int(resposta.headers.get("content-length", 0) or 0)
+    return offset + content_length if content_length else 0
+
+@rastrear()
+def baixar_arquivo(url, caminho_arquivo, tentativas=TENTATIVAS_DOWNLOAD):
+    """
+    Faz o download via requests, com contagem progressiva de porcentagem.
+    O conteúdo é gravado em '<arquivo>.part' e, se a conexão cair, o download é retomado
+    do ponto onde parou com um cabeçalho 'Range'. Só depois de conferir o tamanho final
+    o arquivo é renomeado (de forma atômica) para o nome definitivo.
+    O SHA-256 é calculado enquanto os blocos são gravados (na retomada, o trecho já existente
+    do .part é lido uma vez para continuar o hash).
+    Retorna um dict {sha256, bytes, content_length, etag} se o arquivo foi baixado por completo, ou None.
+    """
+    caminho_parcial = caminho_arquivo + SUFIXO_PARCIAL
+    if os.path.exists(caminho_arquivo + SUFIXO_PARCIAL_SEGMENTADO):
+        os.remove(caminho_arquivo + SUFIXO_PARCIAL_SEGMENTADO)  # sobra de um segmentado interrompido: não se retoma
+    painel = obter_painel()
+    transferencia = painel.registrar(os.path.basename(caminho_arquivo))
+    try:
+        return _baixar_arquivo_com_retomada(url, caminho_arquivo, caminho_parcial, tentativas, painel, transferencia)
+    finally:
+        painel.finalizar(transferencia)
+
+def _baixar_arquivo_com_retomada(url, caminho_arquivo, caminho_parcial, tentativas, painel, transferencia):
+    """
+    Laço de tentativas de baixar_arquivo; o progresso vai para o painel na 'transferencia' registrada.
+    """
+    for tentativa in range(1, tentativas + 1):
+        try:
+            offset = os.path.getsize(caminho_parcial) if os.path.exists(caminho_parcial) else 0
+            headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+            resposta = requisitar("GET", url, stream=True, headers=headers)
+
+            if resposta.status_code == 416 and offset:
+                # O .part já tem todos os bytes (ou está maior que o arquivo remoto): confere o tamanho pelo HEAD
+                # e, como um .part pré-alocado por uma versão antiga do download segmentado tem o tamanho
+                # final com "buracos" zerados, também o final do conteúdo com o do servidor
+                cabecalho = requisitar("HEAD", url, allow_redirects=True)
+                tamanho_remoto = int(cabecalho.headers.get("content-length", 0) or 0)
+                if tamanho_remoto and tamanho_remoto == offset and final_confere(url, caminho_parcial, offset):
+                    os.replace(caminho_parcial, caminho_arquivo)
+                    print(f"✅ Download concluído: {os.path.basename(caminho_arquivo)}")
+                    return {
+                        "sha256": calcular_sha256(caminho_arquivo).hexdigest(),
+                        "bytes": offset,
+                        "content_length": tamanho_remoto,
+                        "etag": cabecalho.headers.get("etag"),
+                    }
+                os.remove(caminho_parcial)
+                raise IOError("arquivo parcial inconsistente com o servidor, recomeçando do zero")
+
+            resposta.raise_for_status()
+
+            if offset and resposta.status_code != 206:
+                # Servidor ignorou o Range: recomeça do início
+                print("⚠️ Servidor não suporta retomada, recomeçando do início.")
+                offset = 0
+            elif offset:
+                print(f"⏯️ Retomando download a partir de {offset // (1024 * 1024)} MB.")
+
+            tamanho_total_bytes = tamanho_total_da_resposta(resposta, offset)
+            painel.definir_total(transferencia, tamanho_total_bytes, offset)
+            hash_arquivo = calcular_sha256(caminho_parcial) if offset else hashlib.sha256()
+
+            with open(caminho_parcial, "ab" if offset else "wb") as arquivo:
+                if tamanho_total_bytes:
+                    prealocar(arquivo, offset, tamanho_total_bytes - offset)
+                # O progresso só incrementa um contador: a formatação fica com o renderizador do painel
+                total_bytes_baixados = offset + gravar_corpo_resposta(
+                    resposta, arquivo, hash_arquivo, functools.partial(painel.atualizar, transferencia)
+                )
+                if not tamanho_total_bytes or total_bytes_baixados == tamanho_total_bytes:
+                    sincronizar_disco(arquivo)
+
+            if tamanho_total_bytes and total_bytes_baixados != tamanho_total_bytes:
+                raise IOError(f"tamanho incompleto ({total_bytes_baixados} de {tamanho_total_bytes} bytes)")
+
+            os.replace(caminho_parcial, caminho_arquivo)
+            painel.concluir(transferencia)
+            print(f"✅ Download concluído: {os.path.basename(caminho_arquivo)}")
+            return {
+                "sha256": hash_arquivo.hexdigest(),
+                "bytes": total_bytes_baixados,
+                "content_length": tamanho_total_bytes or None,
+                "etag": resposta.headers.get("etag"),
+            }
+
+        except Exception as e:
+            print(f"❌ Erro ao baixar (tentativa {tentativa}/{tentativas}): {e}")
+            if tentativa < tentativas:
+                esperar_backoff(tentativa)
+
+    print(f"⚠️ Download incompleto mantido em {os.path.basename(caminho_parcial)} para retomar na próxima execução.")
+    return None
+
+def final_confere(url, caminho_parcial, tamanho, bytes_conferidos=1024 * 1024):
+    """
+    Compara os últimos 'bytes_conferidos' do arquivo local com os do servidor (uma requisição Range).
+    """
+    inicio = max(0, tamanho - bytes_conferidos)
+    try:
+        remotos, _ = ler_faixa_http(url, inicio, tamanho - 1)
+    except Exception:
+        return False
+    with open(caminho_parcial, "rb") as arquivo:
+        arquivo.seek(inicio)
+        return arquivo.read() == remotos
+
+def baixar_segmento(url, caminho_parcial, numero, inicio, fim, estatisticas, transferencia=None):
+    """
+    Baixa a faixa de bytes [inicio, fim] e grava no arquivo pré-alocado a partir do offset 'inicio'.
+    Registra em estatisticas[numero] os bytes recebidos e o tempo gasto, e o progresso na 'transferencia' do painel.
+    """
+    tempo_inicio = time.time()
+    resposta = requisitar("GET", url, stream=True, headers={"Range": f"bytes={inicio}-{fim}"})
+    resposta.raise_for_status()
+    if resposta.status_code != 206:
+        raise IOError(f"segmento {numero}: servidor ignorou o Range (HTTP {resposta.status_code})")
+
+    ao_receber = functools.partial(obter_painel().atualizar, transferencia) if transferencia is not None else None
+    with open(caminho_parcial, "r+b") as arquivo:
+        arquivo.seek(inicio)
+        bytes_recebidos = gravar_corpo_resposta(resposta, arquivo, ao_receber=ao_receber)
+
+    esperado = fim - inicio + 1
+    if bytes_recebidos != esperado:
+        raise IOError(f"segmento {numero} incompleto ({bytes_recebidos} de {esperado} bytes)")
+    estatisticas[numero] = (bytes_recebidos, time.time() - tempo_inicio)
+
+@rastrear()
+def baixar_arquivo_segmentado(url, caminho_arquivo, num_segmentos=SEGMENTOS_POR_ARQUIVO):
+    """
+    Baixa um arquivo dividindo-o em 'num_segmentos' faixas de bytes buscadas em paralelo,
+    cada uma gravada no offset correto de um arquivo '.seg.part' pré-alocado (o '.part' da
+    retomada sequencial de baixar_arquivo não é tocado).
+    Se o servidor não anunciar 'Accept-Ranges: bytes' (ou o arquivo for pequeno), usa baixar_arquivo.
+    Informa a vazão de cada segmento e a vazão agregada, para ajudar a escolher N.
+    Como os segmentos chegam fora de ordem, o SHA-256 é calculado lendo o arquivo ao final.
+    Retorna o mesmo dict de baixar_arquivo, ou None se o download falhar.
+    """
+    try:
+        cabecalho = requisitar("HEAD", url, allow_redirects=True)
+        cabecalho.raise_for_status()
+        tamanho_total_bytes = int(cabecalho.headers.get("content-length", 0) or 0)
+        aceita_range = cabecalho.headers.get("accept-ranges", "").lower() == "bytes"
+    except Exception as e:
+        print(f"⚠️ HEAD falhou ({e}), usando download em stream único.")
+        return baixar_arquivo(url, caminho_arquivo)
+
+    if num_segmentos <= 1 or not aceita_range or tamanho_total_bytes < TAMANHO_MINIMO_SEGMENTADO:
+        return baixar_arquivo(url, caminho_arquivo)
+
+    caminho_parcial = caminho_arquivo + SUFIXO_PARCIAL_SEGMENTADO
+    tamanho_segmento = -(-tamanho_total_bytes // num_segmentos)  # divisão com arredondamento para cima
+    faixas = [
+        (numero, inicio, min(inicio + tamanho_segmento, tamanho_total_bytes) - 1)
+        for numero, inicio in enumerate(range(0, tamanho_total_bytes, tamanho_segmento))
+    ]
+
+    # Pré-aloca o arquivo com o tamanho final para que cada segmento escreva na sua posição
+    with open(caminho_parcial, "wb") as arquivo:
+        prealocar(arquivo, 0, tamanho_total_bytes, manter_tamanho=False)
+
+    estatisticas = {}
+    erros = []
+    painel = obter_painel()
+    transferencia = painel.registrar(os.path.basename(caminho_arquivo), tamanho_total_bytes)
+
+    def executar(numero, inicio, fim):
+        try:
+            baixar_segmento(url, caminho_parcial, numero, inicio, fim, estatisticas, transferencia)
+        except Exception as e:
+            erros.append((numero, e))
+
+    print(f"🧩 Download segmentado em {len(faixas)} partes ({tamanho_total_bytes // (1024 * 1024)} MB)...")
+    tempo_inicio = time.time()
+    threads = [threading.Thread(target=executar, args=faixa, daemon=True) for faixa in faixas]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    tempo_total = time.time() - tempo_inicio
+    if not erros:
+        painel.concluir(transferencia)
+    painel.finalizar(transferencia)
+
+    if erros:
+        for numero, erro in erros:
+            print(f"❌ Erro no segmento {numero + 1}/{len(faixas)}: {erro}")
+        # O parcial segmentado tem "buracos": não serve para a retomada sequencial, então é descartado
+        os.remove(caminho_parcial)
+        print("↩️ Tentando novamente em stream único...")
+        return baixar_arquivo(url, caminho_arquivo)
+
+    for numero, _, _ in faixas:
+        bytes_segmento, tempo_segmento = estatisticas[numero]
+        velocidade = (bytes_segmento / 1024 / 1024) / tempo_segmento if tempo_segmento > 0 else 0
+        print(f"   🧩 Segmento {numero + 1}/{len(faixas)}: {bytes_segmento // (1024 * 1024)} MB em {tempo_segmento:.1f}s ({velocidade:.2f}MB/s)")
+    velocidade_agregada = (tamanho_total_bytes / 1024 / 1024) / tempo_total if tempo_total > 0 else 0
+    print(f"   📊 Vazão agregada: {velocidade_agregada:.2f}MB/s com {len(faixas)} conexões")
+
+    with open(caminho_parcial, "r+b") as arquivo:
+        sincronizar_disco(arquivo)
+    os.replace(caminho_parcial, caminho_arquivo)
+    print(f"✅ Download concluído: {os.path.basename(caminho_arquivo)}")
+    return {
+        "sha256": calcular_sha256(caminho_arquivo).hexdigest(),
+        "bytes": tamanho_total_bytes,
+        "content_length": tamanho_total_bytes,
+        "etag": cabecalho.headers.get("etag"),
+    }
+
+# ======= DURAÇÕES DOS ARQUIVOS JÁ BAIXADOS (SEM NAVEGADOR) =======
+# Inverso de construir_nome_arquivo, usado só quando o vídeo não está no índice local; sem subtítulo,
+# o nome fica "Aula - - Vídeo 01 - ...". Um " - " no título da aula ou no subtítulo é ambíguo no nome:
+# o título da aula fica com o máximo possível
+PADRAO_NOME_ARQUIVO = re.compile(
+    r"^(?P<aula>.*) - (?:(?P<subtitulo>.*?) )?- Vídeo (?P<idx>\d+) - (?P<titulo>.*) \((?P<resolucao>[^()]*)\)$"
+)
+PADRAO_RESOLUCAO_NO_NOME = re.compile(r"^(?P<base>.*) \((?P<resolucao>[^()]*)\)$")
+CABECALHO_CSV_DETALHES = ["Resolução", "Largura", "Altura", "Bitrate (kbps)"]
+
+def interpretar_nome_arquivo(nome_arquivo):
+    """
+    Recupera (titulo_aula, subtitulo_aula, idx, titulo_video, resolucao) do nome gerado por
+    construir_nome_arquivo, ou None se o nome não seguir o padrão. Os caracteres que
+    construir_nome_arquivo removeu não voltam.
+    """
+    encontrado = PADRAO_NOME_ARQUIVO.match(os.path.splitext(nome_arquivo)[0])
+    if not encontrado:
+        return None
+    return (encontrado["aula"], encontrado["subtitulo"] or "", int(encontrado["idx"]),
+            encontrado["titulo"], encontrado["resolucao"])
+
+def base_nome_arquivo(titulo_aula, subtitulo_aula, idx, titulo_video):
+    """
+    Nome que construir_nome_arquivo gera para o vídeo, sem a resolução e a extensão.
+    """
+    base = re.sub(r'[\\/*?:"<>|]', "", f"{titulo_aula} - {subtitulo_aula} - Vídeo {idx:02d} - {titulo_video}")
+    return base.strip().replace("  ", " ")
+
+def catalogo_do_indice(caminho=ARQUIVO_INDICE):
+    """
+    Títulos exatos e ordem do curso de cada vídeo do índice local, pela base do nome de arquivo
+    (base_nome_arquivo). Se o mesmo nome aparecer em mais de um curso, vale o de URL_AULAS.
+    Retorna {base: (ordem, titulo_aula, subtitulo_aula, idx, titulo)}.
+    """
+    if not os.path.exists(caminho):
+        return {}
+    conexao = abrir_indice(caminho)
+    try:
+        linhas = conexao.execute(
+            "SELECT a.curso_id, a.posicao, a.titulo AS titulo_aula, a.subtitulo AS subtitulo_aula, v.idx, v.titulo "
+            "FROM aulas a JOIN videos v ON v.curso_id = a.curso_id AND v.aula_posicao = a.posicao"
+        ).fetchall()
+    finally:
+        conexao.close()
+    curso_atual = obter_id_curso(URL_AULAS)
+    catalogo = {}
+    for linha in linhas:
+        titulo_aula, subtitulo_aula = linha["titulo_aula"] or "", linha["subtitulo_aula"] or ""
+        base = base_nome_arquivo(titulo_aula, subtitulo_aula, linha["idx"], linha["titulo"] or "")
+        ordem = (linha["curso_id"] != curso_atual, linha["curso_id"], linha["posicao"], linha["idx"])
+        if base not in catalogo or ordem < catalogo[base][0]:
+            catalogo[base] = (ordem, titulo_aula, subtitulo_aula, linha["idx"], linha["titulo"] or "")
+    return catalogo
+
+def analisar_arquivo_baixado(caminho):
+    """
+    Trabalho de cada processo da varredura: nunca lança exceção.
+    Retorna (caminho, info) ou (caminho, mensagem de erro).
+    """
+    try:
+        return caminho, ler_info_mp4_local(caminho)
+    except Exception as e:
+        return caminho, f"{type(e).__name__}: {e}"
+
+def chave_ordem_natural(texto):
+    """
+    Ordena "Aula 2" antes de "Aula 10".
+    """
+    return [int(parte) if parte.isdigit() else parte.lower() for parte in re.split(r"(\d+)", texto)]
+
+@rastrear()
+def varrer_downloads(pasta=None, arquivo_saida=None, detalhes=False, num_processos=None):
+    """
+    Gera o CSV de durações (mesmo layout de salvar_em_csv na opção 1) a partir dos MP4 já baixados
+    em 'pasta', sem navegador nem rede: cada arquivo é mapeado em memória por um pool de processos,
+    que lê só o moov. Títulos e ordem vêm do índice local quando o vídeo está nele (mesmo CSV da
+    opção 1); senão, do nome do arquivo, e esses vídeos vão para o fim em ordem natural de nome.
+    Com detalhes, acrescenta resolução, largura, altura e bitrate às linhas.
+    Retorna as linhas gravadas.
+    """
+    pasta = pasta or PASTA_DESTINO
+    arquivo_saida = arquivo_saida or ARQUIVO_SAIDA
+    num_processos = num_processos or NUM_PROCESSOS_VARREDURA or os.cpu_count() or 1
+    caminhos = [
+        os.path.join(raiz, nome)
+        for raiz, _, nomes in os.walk(pasta)
+        for nome in nomes
+        if nome.lower().endswith(".mp4")
+    ]
+    if not caminhos:
+        print(f"⚠️ Nenhum MP4 encontrado em {pasta}.")
+        return []
+
+    inicio = time.time()
+    catalogo = catalogo_do_indice()
+    print(f"🔎 Lendo os cabeçalhos de {len(caminhos)} arquivos com {num_processos} processos...")
+    linhas, fora_do_padrao, com_erro = [], [], []  # linhas: (chave de ordem, linha)
+    with ProcessPoolExecutor(max_workers=num_processos) as executor:
+        # Lotes grandes: cada arquivo custa pouco e o envio entre processos dominaria o tempo
+        for caminho, info in executor.map(analisar_arquivo_baixado, caminhos,
+                                          chunksize=max(1, len(caminhos) // (num_processos * 4))):
+            nome = os.path.basename(caminho)
+            nome_sem_resolucao = PADRAO_RESOLUCAO_NO_NOME.match(os.path.splitext(nome)[0])
+            do_indice = catalogo.get(nome_sem_resolucao["base"]) if nome_sem_resolucao else None
+            if do_indice is not None:
+                ordem, titulo_aula, subtitulo_aula, idx, titulo = do_indice
+                resolucao, chave = nome_sem_resolucao["resolucao"], (0, ordem)
+            else:
+                partes = interpretar_nome_arquivo(nome)
+                if partes is None:
+                    fora_do_padrao.append(nome)
+                    continue
+                titulo_aula, subtitulo_aula, idx, titulo, resolucao = partes
+                chave = (1, (chave_ordem_natural(titulo_aula), chave_ordem_natural(subtitulo_aula), idx))
+            if isinstance(info, str) or not info["duracao"]:
+                com_erro.append(nome if isinstance(info, str) else f"{nome}: sem moov/mvhd")
+                duracao = "DURAÇÃO N/D"
+            else:
+                duracao = format_seconds_to_hhmmss(info["duracao"])
+            linha = [titulo_aula, subtitulo_aula, idx, titulo, duracao]
+            if detalhes:
+                info = info if isinstance(info, dict) else {}
+                linha += [resolucao, info.get("largura", 0), info.get("altura", 0), info.get("bitrate_kbps", 0)]
+            linhas.append((chave, linha))
+
+    linhas = [linha for _, linha in sorted(linhas, key=lambda item: item[0])]
+    header = CABECALHO_CSV_DURACOES + (CABECALHO_CSV_DETALHES if detalhes else [])
+    salvar_em_csv(arquivo_saida, linhas, header=header)
+    print(f"⏱️ {len(linhas)} vídeos em {time.time() - inicio:.1f}s.")
+    if fora_do_padrao:
+        print(f"⚠️ {len(fora_do_padrao)} arquivos com nome fora do padrão de construir_nome_arquivo (ignorados):")
+        for nome in fora_do_padrao:
+            print(f"      - {nome}")
+    if com_erro:
+        print(f"⚠️ {len(com_erro)} arquivos sem duração legível (incompletos ou corrompidos?):")
+        for nome in com_erro:
+            print(f"      - {nome}")
+    return linhas
+
+# ======= ARMAZÉM POR CONTEÚDO (DEDUPLICAÇÃO) =======
+_ARMAZEM = {}  # índice carregado: {"por_url": {caminho: registro}, "por_etag": {"etag|bytes": registro}}
+_BAIXANDO_NO_ARMAZEM = {}  # caminho da URL -> threading.Event do worker que está baixando o vídeo
+_TRAVA_ARMAZEM = threading.Lock()
+ESTATISTICAS_ARMAZEM = {"baixados": 0, "reaproveitados": 0, "bytes_economizados": 0}
+
+def caminho_indice_armazem():
+    return os.path.join(PASTA_ARMAZEM, "indice.json")
+
+def caminho_trava_armazem(nome):
+    return os.path.join(PASTA_ARMAZEM, "travas", nome + ".lock")
+
+def carregar_indice_armazem(recarregar=False):
+    """
+    Retorna o índice do armazém (carregado uma vez e mantido em memória).
+    Com recarregar, lê de novo do disco o que outras fatias (processos) gravaram.
+    Deve ser chamado com _TRAVA_ARMAZEM adquirida.
+    """
+    if not _ARMAZEM or recarregar:
+        _ARMAZEM.clear()
+        _ARMAZEM.update({"por_url": {}, "por_etag": {}})
+        try:
+            with open(caminho_indice_armazem(), encoding="utf-8") as f:
+                _ARMAZEM.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+    return _ARMAZEM
+
+def identidade_video(url):
+    """
+    Identidade estável de um vídeo: o caminho da URL (sem a query, que costuma trazer tokens
+    assinados que mudam a cada acesso), o ETag e o tamanho informados pelo HEAD.
+    """
+    try:
+        cabecalho = requisitar("HEAD", url, allow_redirects=True)
+        cabecalho.raise_for_status()
+        etag = cabecalho.headers.get("etag")
+        tamanho = int(cabecalho.headers.get("content-length", 0) or 0)
+    except Exception:
+        etag, tamanho = None, 0
+    return urlparse(url).path, etag, tamanho
+
+def procurar_no_armazem(indice, chave_url, etag, tamanho):
+    """
+    Procura o vídeo no armazém pelo caminho da URL e, se não achar, pelo ETag (mesmo vídeo
+    publicado sob outro caminho, em outra aula ou curso). Um registro só vale se o ETag e o
+    tamanho ainda conferem com o servidor e o objeto existe com o tamanho registrado.
+    """
+    candidatos = [indice["por_url"].get(chave_url)]
+    if etag:
+        candidatos.append(indice["por_etag"].get(f"{etag}|{tamanho}"))
+    for registro in candidatos:
+        if not registro:
+            continue
+        if etag and registro.get("etag") and registro["etag"] != etag:
+            continue  # o conteúdo mudou no servidor
+        if tamanho and registro["bytes"] != tamanho:
+            continue
+        objeto = os.path.join(PASTA_ARMAZEM, registro["objeto"])
+        if os.path.exists(objeto) and os.path.getsize(objeto) == registro["bytes"]:
+            return registro
+    return None
+
+def vincular_arquivo(objeto, caminho):
+    """
+    Cria 'caminho' como hardlink para o objeto do armazém (ou cópia, se não for possível).
+    """
+    if os.path.exists(caminho):
+        os.remove(caminho)
+    try:
+        os.link(objeto, caminho)
+    except OSError:
+        shutil.copyfile(objeto, caminho)
+
+def obter_via_armazem(url, nome_arquivo, caminho):
+    """
+    Coloca o vídeo em 'caminho' passando pelo armazém: se ele já estiver lá, só cria o hardlink;
+    senão baixa para o armazém (uma única vez, mesmo com vários workers ou fatias pedindo o mesmo vídeo),
+    guarda o objeto pelo SHA-256 e então cria o hardlink.
+    Retorna o dict de baixar_arquivo (sha256, bytes, content_length, etag) ou None.
+    """
+    chave_url, etag, tamanho = identidade_video(url)
+    while True:
+        with _TRAVA_ARMAZEM:
+            registro = procurar_no_armazem(carregar_indice_armazem(), chave_url, etag, tamanho)
+            em_andamento = _BAIXANDO_NO_ARMAZEM.get(chave_url) if registro is None else None
+            if registro is None and em_andamento is None:
+                _BAIXANDO_NO_ARMAZEM[chave_url] = threading.Event()
+                break
+        if registro is not None:
+            return vincular_do_armazem(registro, nome_arquivo, caminho, etag, tamanho)
+        # Outro worker está baixando o mesmo vídeo: espera e confere de novo (se ele falhar, baixa aqui)
+        em_andamento.wait()
+
+    try:
+        identificador = hashlib.sha1(chave_url.encode("utf-8")).hexdigest()[:16]
+        # Outra fatia (processo) pode estar baixando o mesmo vídeo: a trava do arquivo a espera e,
+        # ao liberar, o índice relido no disco já traz o objeto que ela guardou
+        with trava_arquivo(caminho_trava_armazem(identificador)):
+            with _TRAVA_ARMAZEM:
+                registro = procurar_no_armazem(carregar_indice_armazem(recarregar=True), chave_url, etag, tamanho)
+            if registro is not None:
+                return vincular_do_armazem(registro, nome_arquivo, caminho, etag, tamanho)
+
+            # Pasta de trabalho fixa por vídeo: o .part é retomado na próxima execução se o download cair
+            pasta_trabalho = os.path.join(PASTA_ARMAZEM, "baixando", identificador)
+            os.makedirs(pasta_trabalho, exist_ok=True)
+            temporario = os.path.join(pasta_trabalho, nome_arquivo)
+            info = baixar_com_agendador(url, nome_arquivo, temporario)
+            if not info:
+                return None
+
+            objeto_relativo = os.path.join("objetos", info["sha256"][:2], info["sha256"] + os.path.splitext(nome_arquivo)[1])
+            objeto = os.path.join(PASTA_ARMAZEM, objeto_relativo)
+            os.makedirs(os.path.dirname(objeto), exist_ok=True)
+            if os.path.exists(objeto):
+                # Mesmo conteúdo (pelo hash) já guardado sob outra identidade: fica uma cópia só
+                os.remove(temporario)
+            else:
+                os.replace(temporario, objeto)
+            shutil.rmtree(pasta_trabalho, ignore_errors=True)
+
+            registro = {"sha256": info["sha256"], "bytes": info["bytes"], "etag": info.get("etag") or etag, "objeto": objeto_relativo}
+            # Relê e mescla o índice sob a trava: cada fatia grava só depois de ver o que as outras gravaram
+            with trava_arquivo(caminho_trava_armazem("indice")), _TRAVA_ARMAZEM:
+                indice = carregar_indice_armazem(recarregar=True)
+                indice["por_url"][chave_url] = registro
+                if registro["etag"]:
+                    indice["por_etag"][f"{registro['etag']}|{registro['bytes']}"] = registro
+                gravar_json_atomico(caminho_indice_armazem(), indice)
+                ESTATISTICAS_ARMAZEM["baixados"] += 1
+        vincular_arquivo(objeto, caminho)
+        return info
+    finally:
+        with _TRAVA_ARMAZEM:
+            _BAIXANDO_NO_ARMAZEM.pop(chave_url).set()
+
+def vincular_do_armazem(registro, nome_arquivo, caminho, etag, tamanho):
+    """
+    Cria o hardlink para um vídeo que já está no armazém e retorna o dict no formato de baixar_arquivo.
+    """
+    vincular_arquivo(os.path.join(PASTA_ARMAZEM, registro["objeto"]), caminho)
+    with _TRAVA_ARMAZEM:
+        ESTATISTICAS_ARMAZEM["reaproveitados"] += 1
+        ESTATISTICAS_ARMAZEM["bytes_economizados"] += registro["bytes"]
+    print(f"🔗 Já no armazém, vinculado sem baixar: {nome_arquivo}")
+    return {"sha256": registro["sha256"], "bytes": registro["bytes"],
+            "content_length": tamanho or registro["bytes"], "etag": etag or registro.get("etag")}
+
+def imprimir_estatisticas_armazem():
+    """
+    Mostra quantos vídeos o armazém evitou baixar de novo e quanto isso poupou de banda e disco.
+    """
+    if not USAR_ARMAZEM_CONTEUDO or not (ESTATISTICAS_ARMAZEM["baixados"] or ESTATISTICAS_ARMAZEM["reaproveitados"]):
+        return
+    print(f"🗄️ Armazém: {ESTATISTICAS_ARMAZEM['baixados']} vídeo(s) baixado(s), "
+          f"{ESTATISTICAS_ARMAZEM['reaproveitados']} reaproveitado(s) por hardlink "
+          f"({ESTATISTICAS_ARMAZEM['bytes_economizados'] / 1024 / 1024:.1f} MB de banda e disco economizados).")
+
+# ======= MANIFESTO DE INTEGRIDADE =======
+_MANIFESTOS = {}  # caminho do manifesto -> dict carregado
+_TRAVA_MANIFESTO = threading.Lock()
+
+def caminho_manifesto():
+    """
+    Caminho do manifesto da PASTA_DESTINO atual.
+    """
+    return os.path.join(PASTA_DESTINO, NOME_MANIFESTO)
+
+def calcular_sha256(caminho, tamanho_bloco=1024 * 1024):
+    """
+    Lê o arquivo em blocos e retorna o objeto hashlib (para poder continuar o hash de um .part).
+    """
+    hash_arquivo = hashlib.sha256()
+    with open(caminho, "rb") as arquivo:
+        for bloco in iter(lambda: arquivo.read(tamanho_bloco), b""):
+            hash_arquivo.update(bloco)
+    return hash_arquivo
+
+def carregar_manifesto(recarregar=False):
+    """
+    Retorna o manifesto da PASTA_DESTINO atual (carregado uma vez e mantido em memória).
+    Com recarregar, lê de novo do disco o que outras fatias (processos) registraram.
+    Deve ser chamado com _TRAVA_MANIFESTO adquirida.
+    """
+    caminho = caminho_manifesto()
+    if caminho not in _MANIFESTOS or recarregar:
+        if os.path.exists(caminho):
+            with open(caminho, encoding="utf-8") as f:
+                _MANIFESTOS[caminho] = json.load(f)
+        else:
+            _MANIFESTOS[caminho] = {}
+    return _MANIFESTOS[caminho]
+
+def gravar_manifesto():
+    """
+    Grava o manifesto de forma atômica (arquivo temporário + os.replace).
+    Deve ser chamado com _TRAVA_MANIFESTO e a trava do arquivo (caminho_manifesto() + ".lock") adquiridas.
+    """
+    caminho = caminho_manifesto()
+    temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(carregar_manifesto(), f, ensure_ascii=False, indent=1)
+    os.replace(temporario, caminho)
+
+def registrar_no_manifesto(nome_arquivo, url, resolucao, info):
+    """
+    Registra um arquivo baixado (info é o dict retornado por baixar_arquivo).
+    """
+    # Relê e mescla sob a trava do arquivo: as fatias do NUM_NAVEGADORES baixam para a mesma pasta
+    with trava_arquivo(caminho_manifesto() + ".lock"), _TRAVA_MANIFESTO:
+        carregar_manifesto(recarregar=True)[nome_arquivo] = {
+            "url": url,
+            "resolucao": resolucao,
+            "bytes": info["bytes"],
+            "sha256": info["sha256"],
+            "content_length": info.get("content_length"),
+            "etag": info.get("etag"),
+            "baixado_em": datetime.now().isoformat(timespec="seconds"),
+        }
+        gravar_manifesto()
+
+def arquivo_ja_baixado(nome_arquivo, caminho, url, resolucao):
+    """
+    Decide pelo manifesto se o download pode ser pulado: o arquivo precisa estar registrado
+    e ter o tamanho registrado. Um arquivo com tamanho divergente é apagado para ser baixado de novo.
+    Arquivos antigos (sem registro) são adotados se o tamanho bater com o content-length do servidor.
+    """
+    with _TRAVA_MANIFESTO:
+        registro = carregar_manifesto().get(nome_arquivo)
+    existe = os.path.exists(caminho)
+
+    if registro and existe:
+        if os.path.getsize(caminho) == registro["bytes"]:
+            return True
+        print(f"⚠️ {nome_arquivo} tem tamanho diferente do manifesto, baixando novamente.")
+        os.remove(caminho)
+        return False
+
+    if existe:
+        # Arquivo de uma versão anterior do script: adota se o tamanho conferir com o servidor
+        try:
+            cabecalho = requisitar("HEAD", url, allow_redirects=True)
+            tamanho_remoto = int(cabecalho.headers.get("content-length", 0) or 0) if cabecalho.ok else 0
+        except Exception:
+            cabecalho, tamanho_remoto = None, 0
+        if not tamanho_remoto:
+            # Sem um HEAD 2xx com tamanho (rede, link expirado) não dá para julgar: não adota, mas também
+            # não apaga; um download bem-sucedido substitui o arquivo só no os.replace final
+            print(f"⚠️ {nome_arquivo} existe mas não foi possível conferir com o servidor; mantido e baixado de novo.")
+            return False
+        if os.path.getsize(caminho) == tamanho_remoto:
+            print(f"📝 {nome_arquivo} conferido pelo tamanho e registrado no manifesto.")
+            registrar_no_manifesto(nome_arquivo, url, resolucao, {
+                "sha256": calcular_sha256(caminho).hexdigest(),
+                "bytes": tamanho_remoto,
+                "content_length": tamanho_remoto,
+                "etag": cabecalho.headers.get("etag"),
+            })
+            return True
+        print(f"⚠️ {nome_arquivo} existe mas não confere com o servidor, baixando novamente.")
+        os.remove(caminho)
+    return False
+
+def verificar_downloads(consultar_servidor=True, verificar_hash=VERIFICAR_HASH_LOCAL):
+    """
+    Verifica a PASTA_DESTINO pelo manifesto, sem baixar nada: confere existência e tamanho de cada
+    arquivo e, com consultar_servidor, faz um HEAD na URL de origem para comparar content-length e ETag.
+    Com verificar_hash, também recalcula o SHA-256 localmente.
+    Retorna um dict {situacao: [nomes]}.
+    """
+    with _TRAVA_MANIFESTO:
+        manifesto = dict(carregar_manifesto())
+    if not manifesto:
+        print(f"⚠️ Nenhum manifesto em {caminho_manifesto()}.")
+        return {}
+
+    def verificar(item):
+        nome, registro = item
+        caminho = os.path.join(PASTA_DESTINO, nome)
+        if not os.path.exists(caminho):
+            return nome, "ausente"
+        if os.path.getsize(caminho) != registro["bytes"]:
+            return nome, "tamanho divergente"
+        if verificar_hash and calcular_sha256(caminho).hexdigest() != registro["sha256"]:
+            return nome, "hash divergente"
+        if not consultar_servidor:
+            return nome, "ok"
+        try:
+            cabecalho = requisitar("HEAD", registro["url"], allow_redirects=True)
+            cabecalho.raise_for_status()
+        except Exception:
+            return nome, "ok localmente (servidor não respondeu / link expirado)"
+        tamanho_remoto = int(cabecalho.headers.get("content-length", 0) or 0)
+        etag = cabecalho.headers.get("etag")
+        if tamanho_remoto and tamanho_remoto != registro["bytes"]:
+            return nome, "servidor tem tamanho diferente"
+        if etag and registro.get("etag") and etag != registro["etag"]:
+            return nome, "servidor tem ETag diferente"
+        return nome, "ok"
+
+    situacoes = {}
+    with ThreadPoolExecutor(max_workers=max(1, NUM_SONDAGENS_DURACAO), thread_name_prefix="verificacao") as executor:
+        for nome, situacao in executor.map(verificar, sorted(manifesto.items())):
+            situacoes.setdefault(situacao, []).append(nome)
+
+    print(f"🔍 Verificação de {len(manifesto)} arquivos em {PASTA_DESTINO}:")
+    for situacao, nomes in sorted(situacoes.items()):
+        print(f"   {'✅' if situacao.startswith('ok') else '❌'} {situacao}: {len(nomes)}")
+        if not situacao.startswith("ok"):
+            for nome in nomes:
+                print(f"      - {nome}")
+    return situacoes
+
+def baixar_com_agendador(url, nome_arquivo, caminho):
+    """
+    Baixa 'url' em 'caminho' (segmentado ou não) dentro de uma vaga do agendador.
+    Retorna o dict de baixar_arquivo ou None.
+    """
+    # Espera vaga no agendador (banda, limite por host, janela de horário, ajuste adaptativo)
+    agendador = obter_agendador()
+    host = urlparse(url).netloc
+    agendador.adquirir(host)
+    sucesso = None
+    try:
+        print(f"⬇️ Baixando: {nome_arquivo}")
+        if SEGMENTOS_POR_ARQUIVO > 1:
+            sucesso = baixar_arquivo_segmentado(url, caminho, SEGMENTOS_POR_ARQUIVO)
+        else:
+            sucesso = baixar_arquivo(url, caminho)
+        return sucesso
+    finally:
+        agendador.liberar(host, erro=not sucesso)
+
+def trabalhador_download(fila_downloads):
+    """
+    Consome a fila de downloads até receber o sinal de parada (None).
+    Cada tarefa é uma tupla (titulo_aula, subtitulo_aula, idx, titulo_video, resolucao, url).
+    """
+    while True:
+        tarefa = fila_downloads.get()
+        try:
+            if tarefa is None:
+                return
+            titulo_aula, subtitulo_aula, idx, titulo, resolucao, url = tarefa
+            nome_arquivo = construir_nome_arquivo(titulo_aula, subtitulo_aula, idx, titulo, url, resolucao)
+            caminho = os.path.join(PASTA_DESTINO, nome_arquivo)
+
+            if arquivo_ja_baixado(nome_arquivo, caminho, url, resolucao):
+                print(f"✔️ Já existe: {nome_arquivo}")
+            else:
+                if USAR_ARMAZEM_CONTEUDO:
+                    sucesso = obter_via_armazem(url, nome_arquivo, caminho)
+                else:
+                    sucesso = baixar_com_agendador(url, nome_arquivo, caminho)
+                if sucesso:
+                    registrar_no_manifesto(nome_arquivo, url, resolucao, sucesso)
+        except Exception as e:
+            print(f"❌ Erro inesperado no worker de download: {e}")
+        finally:
+            fila_downloads.task_done()
+
+def iniciar_pool_downloads(num_workers=NUM_WORKERS_DOWNLOAD):
+    """
+    Cria a fila de downloads e inicia os workers que a consomem em paralelo.
+    Retorna (fila, lista_de_threads).
+    """
+    fila_downloads = queue.Queue()
+    workers = []
+    for i in range(max(1, num_workers)):
+        worker = threading.Thread(
+            target=trabalhador_download, args=(fila_downloads,), name=f"download-{i + 1}", daemon=True
+        )
+        worker.start()
+        workers.append(worker)
+    return fila_downloads, workers
+
+def finalizar_pool_downloads(fila_downloads, workers):
+    """
+    Envia o sinal de parada para cada worker e espera todos os downloads pendentes terminarem.
+    """
+    for _ in workers:
+        fila_downloads.put(None)
+    for worker in workers:
+        worker.join()
+
+@rastrear()
+def realizar_downloads(driver, num_workers=NUM_WORKERS_DOWNLOAD, filtro_aulas=None, fila_downloads=None, com_posicao=False):
+    """
+    Percorre todas as aulas e baixa os vídeos na maior resolução disponível (preferencialmente 720p).
+    O navegador apenas resolve os links e os coloca numa fila; os downloads são feitos em paralelo
+    por um pool de workers, enquanto a navegação continua.
+    Se 'fila_downloads' for informada, usa essa fila (de um pool já iniciado) e não espera os downloads.
+    Retorna uma lista de vídeos processados para permitir contagem fora da função
+    (com 'com_posicao', cada item vem como (posicao_aula, video)).
+    """
+    print("📥 Iniciando processo de download das videoaulas...")
+    
+    os.makedirs(PASTA_DESTINO, exist_ok=True)
+
+    resultados = []  # lista para acumular vídeos processados, com a posição da aula
+    contexto = {}
+    indice = abrir_indice() if MODO_INCREMENTAL else None
+    workers = []
+    if fila_downloads is None:
+        fila_downloads, workers = iniciar_pool_downloads(num_workers)
+    # Com cota/prazo, os links de todas as resoluções são juntados e só enfileirados depois do plano
+    planejador = criar_planejador()
+
+    def callback(idx, titulo, video_el, titulo_aula, subtitulo_aula, total_videos):
+        # salva info do vídeo processado
+        resultados.append((contexto["posicao"], (titulo_aula, subtitulo_aula, idx, titulo)))
+
+        print(f"▶️ {idx}/{total_videos} - {titulo}")
+        if planejador is not None:
+            # Só registra as variantes: o download é enfileirado depois do plano do curso inteiro
+            item = planejador.adicionar(titulo_aula, subtitulo_aula, idx, titulo,
+                                        abrir_video_e_obter_link(driver, video_el, todas=True))
+            resolucao, url = (item["variantes"][0]["resolucao"], item["variantes"][0]["url"]) if item else (None, None)
+        else:
+            resolucao, url = abrir_video_e_obter_link(driver, video_el)
+            if url:
+                # Apenas enfileira: o download acontece nos workers enquanto o navegador segue para o próximo vídeo
+                fila_downloads.put((titulo_aula, subtitulo_aula, idx, titulo, resolucao, url))
+        if not url:
+            print("❌ Nenhum link de vídeo encontrado.")
+
+        voltar_para_lista(driver, video_el)
+        return {"resolucao": resolucao, "url_download": url} if url else None
+
+    def reaproveitado(linha):
+        resultados.append((contexto["posicao"], (linha["titulo_aula"], linha["subtitulo_aula"], linha["idx"], linha["titulo"])))
+        if planejador is not None:
+            # O índice guarda só o link escolhido: entra no plano com uma única variante
+            planejador.adicionar(linha["titulo_aula"], linha["subtitulo_aula"], linha["idx"], linha["titulo"],
+                                 [(linha["resolucao"] or "", linha["url_download"])])
+            return
+        fila_downloads.put((linha["titulo_aula"], linha["subtitulo_aula"], linha["idx"], linha["titulo"], linha["resolucao"], linha["url_download"]))
+
+    try:
+        percorrer_aulas(driver, callback, indice, "url_download", reaproveitado, contexto, filtro_aulas)
+        if planejador is not None:
+            planejador.executar(fila_downloads, num_workers)
+    finally:
+        if workers:
+            print(f"⏳ Aguardando {fila_downloads.qsize()} download(s) na fila terminarem...")
+            finalizar_pool_downloads(fila_downloads, workers)
+        if indice is not None:
+            indice.close()
+
+    return resultados if com_posicao else [video for _, video in resultados]
+
+def realizar_downloads_do_indice(linhas, num_workers=NUM_WORKERS_DOWNLOAD):
+    """
+    Baixa os vídeos de um curso usando apenas os links salvos no índice (sem navegador).
+    Links expirados falham no download e são refeitos numa execução normal.
+    """
+    print("📥 Baixando a partir do índice local (sem navegador)...")
+    os.makedirs(PASTA_DESTINO, exist_ok=True)
+    fila_downloads, workers = iniciar_pool_downloads(num_workers)
+    planejador = criar_planejador()
+    try:
+        for linha in linhas:
+            if planejador is not None:
+                planejador.adicionar(linha["titulo_aula"], linha["subtitulo_aula"], linha["idx"], linha["titulo"],
+                                     [(linha["resolucao"] or "", linha["url_download"])])
+            else:
+                fila_downloads.put((linha["titulo_aula"], linha["subtitulo_aula"], linha["idx"], linha["titulo"], linha["resolucao"], linha["url_download"]))
+        if planejador is not None:
+            planejador.executar(fila_downloads, num_workers)
+    finally:
+        finalizar_pool_downloads(fila_downloads, workers)
+    return [(linha["titulo_aula"], linha["subtitulo_aula"], linha["idx"], linha["titulo"]) for linha in linhas]
+
+# ======= CAPTURA DA API DA PLATAFORMA (DEVTOOLS) =======
+CHAVES_TITULO = ("titulo", "nome", "title", "name")
+CHAVES_SUBTITULO = ("subtitulo", "conteudo", "descricao", "subtitle", "description")
+CHAVES_DURACAO = ("duracao", "duration", "tempo", "length")
+CABECALHOS_IGNORADOS = {"cookie", "host", "content-length", "connection", "accept-encoding"}
+
+def redirecionar_para_base_api(url):
+    """
+    Com URL_BASE_API definida, troca esquema e host da URL (para repetir as chamadas num servidor local).
+    """
+    if not URL_BASE_API:
+        return url
+    partes = urlparse(url)
+    return URL_BASE_API.rstrip("/") + partes.path + (f"?{partes.query}" if partes.query else "")
+
+def capturar_respostas_api(driver):
+    """
+    Lê o log de performance do DevTools acumulado desde a última leitura e recupera o corpo
+    de cada resposta JSON (Network.getResponseBody). Cada captura também é gravada em
+    PASTA_CAPTURA_API para servir de fixture.
+    Retorna lista de dicts {url, metodo, headers, status, corpo}.
+    """
+    pedidos = {}
+    respostas = []
+    for entrada in driver.get_log("performance"):
+        mensagem = json.loads(entrada["message"])["message"]
+        metodo, params = mensagem.get("method"), mensagem.get("params", {})
+        if metodo == "Network.requestWillBeSent":
+            pedidos[params["requestId"]] = params["request"]
+        elif metodo == "Network.responseReceived" and "json" in params["response"].get("mimeType", ""):
+            respostas.append((params["requestId"], params["response"]))
+
+    capturas = []
+    for request_id, resposta in respostas:
+        try:
+            corpo = driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+            conteudo = json.loads(corpo["body"])
+        except Exception:
+            continue  # corpo já descartado pelo navegador ou não é JSON válido
+        pedido = pedidos.get(request_id, {})
+        capturas.append({
+            "url": resposta["url"],
+            "metodo": pedido.get("method", "GET"),
+            "headers": {k: v for k, v in pedido.get("headers", {}).items() if k.lower() not in CABECALHOS_IGNORADOS},
+            "status": resposta.get("status"),
+            "corpo": conteudo,
+        })
+
+    if capturas:
+        os.makedirs(PASTA_CAPTURA_API, exist_ok=True)
+        inicio = len(os.listdir(PASTA_CAPTURA_API))
+        for numero, captura in enumerate(capturas, start=inicio + 1):
+            with open(os.path.join(PASTA_CAPTURA_API, f"resposta_{numero:04d}.json"), "w", encoding="utf-8") as f:
+                json.dump(captura, f, ensure_ascii=False)
+        print(f"📡 {len(capturas)} respostas JSON capturadas do painel.")
+    return capturas
+
+def primeiro_valor(dicionario, chaves):
+    """
+    Retorna o valor da primeira chave presente (ignorando maiúsculas) dentre 'chaves', ou None.
+    """
+    minusculas = {str(k).lower(): v for k, v in dicionario.items()}
+    for chave in chaves:
+        if minusculas.get(chave) not in (None, ""):
+            return minusculas[chave]
+    return None
+
+def extrair_links_resolucao(objeto, profundidade=0):
+    """
+    Procura links de vídeo num objeto JSON: chaves como '720p' com URL, ou URLs .mp4 cujo texto
+    contenha a resolução. Retorna lista de (resolucao, url) sem repetições.
+    """
+    links = []
+    if profundidade > 3:
+        return links
+    if isinstance(objeto, dict):
+        for chave, valor in objeto.items():
+            if isinstance(valor, str) and valor.startswith("http"):
+                resolucao = extrair_resolucao(str(chave)) or extrair_resolucao(valor)
+                if resolucao and (re.fullmatch(r"\d{3,4}p", str(chave)) or ".mp4" in valor.lower()):
+                    links.append((resolucao, valor))
+            elif isinstance(valor, (dict, list)) and str(chave).lower() not in ("videos", "aulas"):
+                links.extend(extrair_links_resolucao(valor, profundidade + 1))
+    elif isinstance(objeto, list):
+        for item in objeto:
+            links.extend(extrair_links_resolucao(item, profundidade + 1))
+    vistos = set()
+    return [link for link in links if not (link in vistos or vistos.add(link))]
+
+def extrair_videos_json(aula):
+    """
+    Extrai os vídeos de uma aula do JSON: itens com título e links por resolução.
+    Retorna lista de dicts {id, titulo, duracao, links}.
+    """
+    candidatos = aula.get("videos") if isinstance(aula.get("videos"), list) else None
+    if candidatos is None:
+        listas = [valor for valor in aula.values() if isinstance(valor, list) and valor and all(isinstance(i, dict) for i in valor)]
+        candidatos = max(listas, key=lambda lista: sum(bool(extrair_links_resolucao(i)) for i in lista), default=[])
+
+    videos = []
+    for item in candidatos:
+        if not isinstance(item, dict):
+            continue
+        links = extrair_links_resolucao(item)
+        titulo = primeiro_valor(item, CHAVES_TITULO)
+        if links and titulo:
+            videos.append({"id": item.get("id"), "titulo": str(titulo).strip(), "duracao": primeiro_valor(item, CHAVES_DURACAO), "links": links})
+    return videos
+
+def extrair_hierarquia_json(corpo):
+    """
+    Procura, em qualquer nível do JSON, a lista de aulas (dicts com título) que rende mais vídeos.
+    Retorna lista de dicts {id, titulo, subtitulo, videos} (videos pode vir vazio se a API
+    do curso não trouxer os vídeos de cada aula), ou [] se nada parecido com aulas for encontrado.
+    """
+    melhor, melhor_pontos = [], (0, 0)
+    pendentes = [corpo]
+    while pendentes:
+        atual = pendentes.pop()
+        if isinstance(atual, dict):
+            pendentes.extend(atual.values())
+        elif isinstance(atual, list):
+            pendentes.extend(atual)
+            aulas = [item for item in atual if isinstance(item, dict) and primeiro_valor(item, CHAVES_TITULO)]
+            if len(aulas) < max(1, len(atual) // 2):
+                continue
+            hierarquia = [
+                {
+                    "id": aula.get("id"),
+                    "titulo": str(primeiro_valor(aula, CHAVES_TITULO)).strip(),
+                    "subtitulo": str(primeiro_valor(aula, CHAVES_SUBTITULO) or "").strip(),
+                    "videos": extrair_videos_json(aula),
+                }
+                for aula in aulas
+            ]
+            # Se a própria lista é de vídeos (cada item já tem links), não é uma lista de aulas
+            if all(extrair_links_resolucao(aula) and not hierarquia_item["videos"] for aula, hierarquia_item in zip(aulas, hierarquia)):
+                continue
+            pontos = (sum(len(aula["videos"]) for aula in hierarquia), len(hierarquia))
+            if pontos > melhor_pontos:
+                melhor, melhor_pontos = hierarquia, pontos
+    return melhor
+
+def buscar_json_api(url, headers=None):
+    """
+    Busca um endpoint JSON da plataforma pelo cliente HTTP compartilhado (com os cookies do navegador).
+    """
+    resposta = requisitar("GET", redirecionar_para_base_api(url), headers=headers or {})
+    resposta.raise_for_status()
+    return resposta.json()
+
+def descobrir_modelo_url_aula(capturas, aulas):
+    """
+    Procura, entre as chamadas capturadas, uma URL que contenha o id de uma das aulas
+    e devolve o modelo dessa URL com '{id}' no lugar do id (ou None).
+    """
+    ids = {str(aula["id"]) for aula in aulas if aula.get("id") is not None}
+    for captura in capturas:
+        partes = urlparse(captura["url"])
+        segmentos = partes.path.split("/")
+        for numero, segmento in enumerate(segmentos):
+            if segmento in ids:
+                # Troca o segmento inteiro: '/cursos/2260/aulas/226' com id 226 vira '/cursos/2260/aulas/{id}'
+                segmentos[numero] = "{id}"
+                return partes._replace(path="/".join(segmentos)).geturl(), captura["headers"]
+    return None, None
+
+def provocar_chamadas_de_aula(driver):
+    """
+    Expande a primeira aula e abre o primeiro vídeo, só para o painel fazer as chamadas
+    de detalhe de aula/vídeo que depois serão repetidas por HTTP.
+    """
+    aulas = driver.find_elements(By.CSS_SELECTOR, "a.Collapse-header")
+    if not aulas:
+        return
+    clicar_elemento_com_rolagem(driver, aulas[0], espera_clicavel=True, sleep_apos=1)
+    videos = coletar_lista_videos(driver)
+    if videos:
+        clicar_elemento_com_rolagem(driver, videos[0][1], espera_clicavel=True, sleep_apos=2)
+
+def carregar_endpoints_api(curso_id):
+    """
+    Lê os endpoints descobertos numa execução anterior para o curso (ou None).
+    """
+    caminho = os.path.join(PASTA_CAPTURA_API, "endpoints.json")
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, encoding="utf-8") as f:
+        return json.load(f).get(curso_id)
+
+def salvar_endpoints_api(curso_id, endpoints):
+    """
+    Grava os endpoints descobertos para o curso, para as próximas execuções irem direto por HTTP.
+    """
+    os.makedirs(PASTA_CAPTURA_API, exist_ok=True)
+    caminho = os.path.join(PASTA_CAPTURA_API, "endpoints.json")
+    todos = {}
+    if os.path.exists(caminho):
+        with open(caminho, encoding="utf-8") as f:
+            todos = json.load(f)
+    todos[curso_id] = endpoints
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(todos, f, ensure_ascii=False, indent=2)
+
+def buscar_hierarquia_por_endpoints(endpoints):
+    """
+    Monta a hierarquia só com HTTP a partir dos endpoints conhecidos (curso e, se preciso, detalhe de aula).
+    """
+    aulas = extrair_hierarquia_json(buscar_json_api(endpoints["url_curso"], endpoints.get("headers")))
+    if aulas and not any(aula["videos"] for aula in aulas) and endpoints.get("modelo_aula"):
+        for aula in aulas:
+            corpo = buscar_json_api(endpoints["modelo_aula"].replace("{id}", str(aula["id"])), endpoints.get("headers_aula"))
+            aula["videos"] = procurar_videos_json(corpo)
+    return aulas
+
+def procurar_videos_json(corpo):
+    """
+    Procura, em qualquer nível do JSON de detalhe de uma aula (que pode vir embrulhado,
+    ex.: {"data": {...}}), o objeto cuja lista de vídeos é a maior.
+    """
+    melhor = []
+    pendentes = [{"videos": corpo} if isinstance(corpo, list) else corpo]
+    while pendentes:
+        atual = pendentes.pop()
+        if isinstance(atual, dict):
+            videos = extrair_videos_json(atual)
+            if len(videos) > len(melhor):
+                melhor = videos
+            pendentes.extend(valor for valor in atual.values() if isinstance(valor, (dict, list)))
+        elif isinstance(atual, list):
+            pendentes.extend(item for item in atual if isinstance(item, (dict, list)))
+    return melhor
+
+@rastrear()
+def coletar_hierarquia_via_api(driver):
+    """
+    Obtém aulas, vídeos e links de download pela API JSON do painel.
+    Usa os endpoints salvos de execuções anteriores; sem eles, lê as chamadas capturadas pelo
+    DevTools na página das aulas (provocando as de detalhe de aula, se necessário), descobre os
+    endpoints e repete as chamadas por HTTP com os cookies da sessão.
+    Retorna lista de linhas {titulo_aula, subtitulo_aula, idx, titulo, duracao, links}, ou None
+    se não for possível (nesse caso o chamador usa a navegação pelo DOM).
+    """
+    curso_id = obter_id_curso(URL_AULAS)
+    aulas = None
+    endpoints = carregar_endpoints_api(curso_id)
+    if endpoints:
+        try:
+            aulas = buscar_hierarquia_por_endpoints(endpoints)
+            print("📡 Hierarquia obtida pelos endpoints salvos da API.")
+        except Exception as e:
+            print(f"⚠️ Endpoints salvos da API falharam ({e}), capturando novamente...")
+            aulas = None
+
+    if not aulas:
+        try:
+            capturas = capturar_respostas_api(driver)
+        except Exception as e:
+            print(f"⚠️ Log de rede indisponível ({e}); o navegador precisa ser iniciado com MODO_API = True.")
+            return None
+
+        candidatas = [(extrair_hierarquia_json(captura["corpo"]), captura) for captura in capturas]
+        candidatas = [(aulas_captura, captura) for aulas_captura, captura in candidatas if aulas_captura]
+        if not candidatas:
+            print("⚠️ Nenhuma resposta da API com a lista de aulas foi encontrada.")
+            return None
+        _, captura_curso = max(candidatas, key=lambda item: (sum(len(a["videos"]) for a in item[0]), len(item[0])))
+        endpoints = {"url_curso": captura_curso["url"], "headers": captura_curso["headers"]}
+
+        aulas_capturadas = extrair_hierarquia_json(captura_curso["corpo"])
+        if not any(aula["videos"] for aula in aulas_capturadas):
+            provocar_chamadas_de_aula(driver)
+            modelo, headers_aula = descobrir_modelo_url_aula(capturar_respostas_api(driver), aulas_capturadas)
+            if not modelo:
+                print("⚠️ Não foi possível descobrir o endpoint de detalhe das aulas.")
+                garantir_pagina_aulas(driver, forcar=True)
+                return None
+            endpoints.update(modelo_aula=modelo, headers_aula=headers_aula)
+            garantir_pagina_aulas(driver, forcar=True)
+
+        try:
+            aulas = buscar_hierarquia_por_endpoints(endpoints)
+        except Exception as e:
+            print(f"⚠️ Falha ao repetir as chamadas da API por HTTP: {e}")
+            return None
+        salvar_endpoints_api(curso_id, endpoints)
+
+    linhas = [
+        {
+            "titulo_aula": aula["titulo"],
+            "subtitulo_aula": aula["subtitulo"],
+            "idx": idx,
+            "titulo": video["titulo"],
+            "duracao": video["duracao"],
+            "links": video["links"],
+        }
+        for aula in aulas
+        for idx, video in enumerate(aula["videos"], start=1)
+    ]
+    if not linhas:
+        return None
+    print(f"📡 {len(aulas)} aulas e {len(linhas)} vídeos obtidos pela API, sem navegar pelas páginas.")
+    return linhas
+
+def formatar_duracao_api(valor):
+    """
+    Converte a duração vinda da API (segundos ou texto 'hh:mm:ss') para o formato do CSV.
+    """
+    if valor is None:
+        return None
+    if isinstance(valor, str) and ":" in valor:
+        return valor
+    return format_seconds_to_hhmmss(valor)
+
+def coletar_duracoes_da_api(linhas, num_sondagens=NUM_SONDAGENS_DURACAO):
+    """
+    Gera as linhas do CSV de durações a partir da hierarquia da API. Quando a API não informa
+    a duração, ela é lida do cabeçalho MP4 do link de menor resolução (sondagem por Range).
+    """
+    with ThreadPoolExecutor(max_workers=max(1, num_sondagens), thread_name_prefix="sonda-mp4") as executor:
+        pendentes = []
+        for linha in linhas:
+            duracao = formatar_duracao_api(linha["duracao"])
+            if duracao is None:
+                # Todas as resoluções têm a mesma duração: a menor deixa o moov mais perto do início
+                _, url = min(linha["links"], key=lambda link: int(link[0][:-1]))
+                duracao = executor.submit(sondar_duracao, url)
+            pendentes.append((linha["titulo_aula"], linha["subtitulo_aula"], linha["idx"], linha["titulo"], duracao))
+        return [
+            (titulo_aula, subtitulo_aula, idx, titulo, duracao if isinstance(duracao, str) else duracao.result())
+            for titulo_aula, subtitulo_aula, idx, titulo, duracao in pendentes
+        ]
+
+def realizar_downloads_da_api(linhas, num_workers=NUM_WORKERS_DOWNLOAD):
+    """
+    Enfileira os downloads direto da hierarquia da API (maior resolução pela mesma prioridade do DOM,
+    ou a resolução escolhida pelo planejador quando há cota/prazo).
+    """
+    print("📥 Baixando a partir da hierarquia da API...")
+    os.makedirs(PASTA_DESTINO, exist_ok=True)
+    fila_downloads, workers = iniciar_pool_downloads(num_workers)
+    planejador = criar_planejador()
+    try:
+        for linha in linhas:
+            if planejador is not None:
+                planejador.adicionar(linha["titulo_aula"], linha["subtitulo_aula"], linha["idx"], linha["titulo"], linha["links"])
+                continue
+            resolucao, url = escolher_link_por_prioridade(linha["links"])
+            if url:
+                fila_downloads.put((linha["titulo_aula"], linha["subtitulo_aula"], linha["idx"], linha["titulo"], resolucao, url))
+        if planejador is not None:
+            planejador.executar(fila_downloads, num_workers)
+    finally:
+        finalizar_pool_downloads(fila_downloads, workers)
+    return [(linha["titulo_aula"], linha["subtitulo_aula"], linha["idx"], linha["titulo"]) for linha in linhas]
+
+# ======= RASTREAMENTO EM FATIAS (VÁRIOS NAVEGADORES) =======
+def exportar_sessao(driver):
+    """
+    Exporta a sessão autenticada do navegador (cookies e localStorage do site atual).
+    """
+    return {
+        "cookies": driver.get_cookies(),
+        "local_storage": driver.execute_script("return Object.assign({}, window.localStorage);") or {},
+    }
+
+def aplicar_sessao(driver, sessao):
+    """
+    Restaura uma sessão exportada por exportar_sessao num navegador novo.
+    Abre uma página leve do site (robots.txt) só para poder gravar cookies e localStorage no domínio certo.
+    """
+    driver.get(BASE_SITE + "/robots.txt")
+    for cookie in sessao.get("cookies", []):
+        cookie = dict(cookie)
+        if "expiry" in cookie:
+            cookie["expiry"] = int(cookie["expiry"])
+        try:
+            driver.add_cookie(cookie)
+        except Exception as e:
+            print(f"⚠️ Cookie {cookie.get('name')} não pôde ser restaurado: {e}")
+    if sessao.get("local_storage"):
+        driver.execute_script(
+            "var itens = arguments[0]; for (var chave in itens) { window.localStorage.setItem(chave, itens[chave]); }",
+            sessao["local_storage"],
+        )
+
+def aguardar_lista_aulas(driver, timeout=20):
+    """
+    Espera as abas das aulas aparecerem e retorna quantas são.
+    """
+    try:
+        WebDriverWait(driver, timeout).until(
+            EC.presence_of_all_elements_located((By.CSS_SELECTOR, "a.Collapse-header"))
+        )
+    except TimeoutException:
+        return 0
+    return len(driver.find_elements(By.CSS_SELECTOR, "a.Collapse-header"))
+
+class ColetaDaFatia:
+    """
+    Saída da coleta de durações de uma fatia: guarda (posicao_aula, linha) em memória, sem checkpoint
+    (o CSV é montado pelo processo principal).
+    """
+    retomada = None
+
+    def __init__(self):
+        self.linhas = []
+
+    def escrever(self, posicao_aula, linha):
+        self.linhas.append((posicao_aula, linha))
+
+# Configurações que mudam em tempo de execução (curso do modo lote, opções da linha de comando) e por
+# isso vão explícitas para as fatias: com spawn (padrão no Windows e no macOS) cada processo reimporta
+# o script e veria só os valores escritos aqui no topo
+CONFIGURACOES_FATIAS = ("URL_AULAS", "ARQUIVO_SAIDA", "PASTA_DESTINO", "RETOMAR_COLETA", "USAR_NAVEGADOR_RESIDENTE",
+                        "USAR_ARMAZEM_CONTEUDO", "PASTA_ARMAZEM", "COTA_DISCO_MB", "PRAZO_DOWNLOADS_MIN",
+                        "LIMITE_BANDA_MBPS", "MAX_DOWNLOADS_POR_HOST", "NUM_WORKERS_DOWNLOAD", "PERFIL_ENXUTO",
+                        "FORMATO_METRICAS")
+
+def executar_fatia(argumentos):
+    """
+    Processo de uma fatia: abre um navegador próprio com a sessão exportada e processa as aulas
+    de posição numero_fatia+1, numero_fatia+1+total_fatias, ... (distribuição alternada equilibra a carga).
+    As aulas da fatia passam numa única coleta/download (um filtro só), para as sondagens e downloads
+    seguirem em paralelo com a navegação; cada linha volta marcada com a posição da sua aula.
+    'configuracao' traz os valores de CONFIGURACOES_FATIAS do processo principal.
+    Retorna lista de (posicao_aula, linha).
+    """
+    numero_fatia, total_fatias, sessao, operacao, configuracao = argumentos
+    globals().update(configuracao)
+    driver = iniciar_driver(headless=NAVEGADORES_HEADLESS)
+    resultado = []
+    fila_downloads, workers = iniciar_pool_downloads(NUM_WORKERS_DOWNLOAD) if operacao == "downloads" else (None, [])
+    try:
+        aplicar_sessao(driver, sessao)
+        sincronizar_cookies_http(driver)
+        garantir_pagina_aulas(driver, forcar=True)
+        total_aulas = aguardar_lista_aulas(driver)
+        minhas_aulas = list(range(numero_fatia + 1, total_aulas + 1, total_fatias))
+        print(f"🧩 Fatia {numero_fatia + 1}/{total_fatias}: aulas {minhas_aulas}")
+
+        aulas_da_fatia = set(minhas_aulas)
+        filtro = lambda posicao: posicao in aulas_da_fatia
+        if operacao == "duracoes":
+            coleta = ColetaDaFatia()
+            coletar_aulas_e_videoaulas(driver, filtro_aulas=filtro, saida=coleta)
+            resultado = coleta.linhas
+        else:
+            resultado = realizar_downloads(driver, NUM_WORKERS_DOWNLOAD, filtro, fila_downloads, com_posicao=True)
+    finally:
+        if workers:
+            finalizar_pool_downloads(fila_downloads, workers)
+        driver.quit()
+    return resultado
+
+def executar_em_fatias(driver, operacao, num_navegadores=NUM_NAVEGADORES):
+    """
+    Divide as aulas entre 'num_navegadores' processos, cada um com seu próprio Chrome,
+    reaproveitando a sessão já autenticada de 'driver' (login feito uma única vez).
+    'operacao' é "duracoes" ou "downloads". Retorna as linhas na mesma ordem que
+    coletar_aulas_e_videoaulas / realizar_downloads produziriam.
+    """
+    sessao = exportar_sessao(driver)
+    print(f"🧩 Dividindo as aulas entre {num_navegadores} navegadores...")
+    configuracao = {nome: globals()[nome] for nome in CONFIGURACOES_FATIAS}
+    # Cada fatia planeja só os seus vídeos: a cota do curso é repartida entre elas e a vazão estimada
+    # também (dividem o mesmo link); o prazo vale igual para todas, já que baixam ao mesmo tempo
+    configuracao["COTA_DISCO_MB"] = COTA_DISCO_MB / num_navegadores
+    configuracao["VAZAO_ESTIMADA_MBPS"] = VAZAO_ESTIMADA_MBPS / num_navegadores
+    # O agendador é um por processo: limite de banda, downloads por host e workers também são repartidos
+    # para a soma das fatias respeitar o configurado (com no mínimo 1 download por fatia)
+    configuracao["LIMITE_BANDA_MBPS"] = LIMITE_BANDA_MBPS / num_navegadores
+    configuracao["MAX_DOWNLOADS_POR_HOST"] = max(1, MAX_DOWNLOADS_POR_HOST // num_navegadores)
+    configuracao["NUM_WORKERS_DOWNLOAD"] = max(1, NUM_WORKERS_DOWNLOAD // num_navegadores)
+    # Vários processos desenhando painéis no mesmo terminal se sobrescreveriam: as fatias gravam JSON lines
+    if FORMATO_METRICAS == "terminal":
+        configuracao["FORMATO_METRICAS"] = "jsonl"
+    argumentos = [(numero, num_navegadores, sessao, operacao, configuracao) for numero in range(num_navegadores)]
+    with ProcessPoolExecutor(max_workers=num_navegadores) as executor:
+        resultados_fatias = list(executor.map(executar_fatia, argumentos))
+
+    # Cada aula inteira fica numa única fatia, já em ordem de vídeo: basta ordenar pela posição (ordenação estável)
+    combinados = sorted((item for fatia in resultados_fatias for item in fatia), key=lambda item: item[0])
+    return [linha for _, linha in combinados]
+
+# ======= COMPARAÇÃO DE PERFIS DO NAVEGADOR =======
+def medir_carregamento(driver, url, seletor_pronto=None, espera_rede=2):
+    """
+    Abre 'url' e mede: tempo até o driver.get retornar, tempo até 'seletor_pronto' aparecer
+    (página utilizável) e, pelo log de rede do DevTools, bytes transferidos, requisições
+    concluídas e requisições bloqueadas. O driver precisa ter sido iniciado com registrar_rede=True.
+    """
+    driver.get_log("performance")  # descarta os eventos anteriores
+    inicio = time.time()
+    driver.get(url)
+    tempo_get = time.time() - inicio
+    if seletor_pronto:
+        WebDriverWait(driver, 30).until(EC.presence_of_element_located((By.CSS_SELECTOR, seletor_pronto)))
+    tempo_pronto = time.time() - inicio
+    dormir(espera_rede)  # deixa terminar o que a página ainda baixa depois de ficar utilizável
+
+    medicao = {"get_s": tempo_get, "pronto_s": tempo_pronto, "bytes": 0, "requisicoes": 0, "bloqueadas": 0}
+    for entrada in driver.get_log("performance"):
+        mensagem = json.loads(entrada["message"])["message"]
+        if mensagem.get("method") == "Network.loadingFinished":
+            medicao["bytes"] += mensagem["params"].get("encodedDataLength", 0)
+            medicao["requisicoes"] += 1
+        elif mensagem.get("method") == "Network.loadingFailed" and mensagem["params"].get("blockedReason"):
+            medicao["bloqueadas"] += 1
+    return medicao
+
+def comparar_perfis(headless=True):
+    """
+    Carrega a página de login e a das aulas com o perfil completo e com o perfil enxuto e mostra
+    tempo de carregamento e bytes transferidos lado a lado. A página das aulas só é medida se houver
+    sessão salva (ARQUIVO_SESSAO), aplicada igualmente nos dois navegadores.
+    """
+    sessao = None
+    if os.path.exists(ARQUIVO_SESSAO):
+        with open(ARQUIVO_SESSAO, encoding="utf-8") as f:
+            sessao = json.load(f)
+    else:
+        print("ℹ️ Sem sessão salva: só a página de login será medida.")
+    paginas = [("login", URL_LOGIN, "input[type='password']")]
+    if sessao:
+        paginas.append(("aulas", URL_AULAS, "a.Collapse-header"))
+
+    medicoes = []
+    for perfil, enxuto in (("completo", False), ("enxuto", True)):
+        driver = iniciar_driver(headless=headless, enxuto=enxuto, registrar_rede=True)
+        try:
+            if sessao:
+                aplicar_sessao(driver, sessao)
+            for pagina, url, seletor in paginas:
+                try:
+                    medicoes.append((pagina, perfil, medir_carregamento(driver, url, seletor)))
+                except TimeoutException:
+                    print(f"⚠️ {pagina} ({perfil}): a página não ficou pronta em 30s.")
+        finally:
+            driver.quit()
+
+    print(f"{'página':<8}{'perfil':<10}{'get (s)':>9}{'pronta (s)':>12}{'MB':>9}{'requisições':>13}{'bloqueadas':>12}")
+    for pagina, perfil, m in sorted(medicoes, key=lambda item: item[0]):
+        print(f"{pagina:<8}{perfil:<10}{m['get_s']:>9.2f}{m['pronto_s']:>12.2f}{m['bytes'] / 1024 / 1024:>9.2f}{m['requisicoes']:>13}{m['bloqueadas']:>12}")
+    return medicoes
+
+# ======= FLUXO PRINCIPAL =======
+CABECALHO_CSV_DURACOES = ["Aula", "Subtítulo", "Vídeo", "Videoaula", "Duração"]
+
+def processar_do_indice(operacao):
+    """
+    Com USAR_INDICE_SEM_NAVEGADOR, atende o curso de URL_AULAS só com o índice local, se ele estiver completo.
+    'operacao' é "duracoes" ou "downloads". Retorna o número de vídeos atendidos, ou None se o navegador for necessário.
+    """
+    if not USAR_INDICE_SEM_NAVEGADOR:
+        return None
+    curso_id = obter_id_curso(URL_AULAS)
+    linhas = carregar_curso_do_indice(curso_id, "duracao" if operacao == "duracoes" else "url_download")
+    if not linhas:
+        return None
+    print(f"♻️ Curso {curso_id} completo no índice local ({len(linhas)} vídeos), sem abrir o navegador.")
+    if operacao == "duracoes":
+        dados = [(l["titulo_aula"], l["subtitulo_aula"], l["idx"], l["titulo"], l["duracao"]) for l in linhas]
+        salvar_em_csv(ARQUIVO_SAIDA, dados, header=CABECALHO_CSV_DURACOES)
+    else:
+        realizar_downloads_do_indice(linhas)
+    return len(linhas)
+
+def processar_curso(driver, operacao):
+    """
+    Executa 'operacao' ("duracoes" ou "downloads") no curso de URL_AULAS com o navegador já autenticado
+    e na página das aulas. As durações vão para ARQUIVO_SAIDA e os vídeos para PASTA_DESTINO.
+    Retorna o número de vídeos processados.
+    """
+    # Modo API: hierarquia e links direto do JSON do painel (None = segue pela navegação no DOM)
+    hierarquia_api = coletar_hierarquia_via_api(driver) if MODO_API else None
+
+    if operacao == "duracoes":
+        # Coleta a estrutura hierárquica: aulas e videoaulas com durações
+        if hierarquia_api is None and NUM_NAVEGADORES <= 1:
+            # Navegação num único navegador: linhas gravadas uma a uma, com checkpoint para retomar
+            saida = SaidaCsvIncremental(ARQUIVO_SAIDA, CABECALHO_CSV_DURACOES, retomar=RETOMAR_COLETA)
+            concluido = False
+            try:
+                coletar_aulas_e_videoaulas(driver, saida=saida)
+                concluido = True
+            finally:
+                saida.fechar(concluido)
+            print(f"🎥 {saida.total_linhas} vídeos encontrados no total.")
+            return saida.total_linhas
+
+        if hierarquia_api is not None:
+            aulas_e_videoaulas = coletar_duracoes_da_api(hierarquia_api)
+        else:
+            aulas_e_videoaulas = executar_em_fatias(driver, "duracoes")
+
+        print(f"🎥 {len(aulas_e_videoaulas)} vídeos encontrados no total.")
+        salvar_em_csv(ARQUIVO_SAIDA, aulas_e_videoaulas, header=CABECALHO_CSV_DURACOES)
+        return len(aulas_e_videoaulas)
+
+    # Realiza o download das videoaulas de acordo com a estrutura hierárquica: aulas e videoaulas
+    if hierarquia_api is not None:
+        videos_baixados = realizar_downloads_da_api(hierarquia_api)
+    elif NUM_NAVEGADORES > 1:
+        videos_baixados = executar_em_fatias(driver, "downloads")
+    else:
+        videos_baixados = realizar_downloads(driver)
+
+    print(f"🎥 {len(videos_baixados)} vídeos processados no total.")
+    return len(videos_baixados)
+
+def finalizar_execucao():
+    """
+    Resumos de fim de execução: painel de progresso, HTTP, agendador e trace das fases.
+    """
+    encerrar_painel()
+    imprimir_estatisticas_http()
+    imprimir_estatisticas_agendador()
+    imprimir_estatisticas_armazem()
+    if RASTREAMENTO_ATIVO:
+        imprimir_resumo_fases()
+        exportar_trace()
+    print("🔚 Processo finalizado.")
+
+# ======= NAVEGADOR RESIDENTE (DAEMON) =======
+def ler_estado_residente(caminho=ARQUIVO_NAVEGADOR_RESIDENTE):
+    """
+    Estado gravado pelo daemon (endereço de depuração, pid, tempos de início), ou None.
+    """
+    try:
+        with open(caminho, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def depuracao_responde(endereco, timeout=2):
+    """
+    Verificação de saúde barata: o endpoint de depuração do Chrome responde /json/version.
+    Usa o cliente compartilhado com uma única tentativa (quem chama já repete a verificação).
+    """
+    try:
+        with requisitar("GET", f"http://{endereco}/json/version", tentativas=1, timeout=timeout) as resposta:
+            return resposta.ok
+    except requests.RequestException:
+        return False
+
+def processo_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except (OSError, TypeError):
+        return False
+    return True
+
+def lancar_chrome_residente(headless=False):
+    """
+    Abre o Chrome do daemon (perfil próprio, depuração na PORTA_DEPURACAO), garante o login e
+    grava o estado para os clientes. Retorna (driver, estado).
+    """
+    inicio = time.time()
+    driver = iniciar_driver(headless=headless, registrar_rede=False,
+                            porta_depuracao=PORTA_DEPURACAO, pasta_perfil=PASTA_PERFIL_RESIDENTE)
+    estado = {
+        "endereco": f"127.0.0.1:{PORTA_DEPURACAO}",
+        "pid": os.getpid(),
+        "iniciado_em": datetime.now().isoformat(timespec="seconds"),
+        "inicio_chrome_s": round(time.time() - inicio, 2),
+        "pronto": False,
+    }
+    gravar_json_atomico(ARQUIVO_NAVEGADOR_RESIDENTE, estado)
+    inicio_login = time.time()
+    try:
+        estado["autenticado"] = garantir_login(driver, USUARIO, SENHA)
+        if estado["autenticado"]:
+            garantir_pagina_aulas(driver)
+    except Exception:
+        driver.quit()  # não deixa um Chrome órfão segurando a porta de depuração
+        raise
+    estado["login_s"] = round(time.time() - inicio_login, 2)
+    estado["pronto"] = True
+    gravar_json_atomico(ARQUIVO_NAVEGADOR_RESIDENTE, estado)
+    print(f"🟢 Navegador residente pronto em {estado['endereco']} "
+          f"(Chrome {estado['inicio_chrome_s']:.1f}s + login {estado['login_s']:.1f}s).")
+    return driver, estado
+
+def executar_navegador_residente(headless=False):
+    """
+    Modo daemon: mantém um Chrome logado aberto até Ctrl+C/SIGTERM. A cada
+    INTERVALO_VERIFICACAO_RESIDENTE_S confere se o Chrome responde (relança se morreu) e a cada
+    INTERVALO_VERIFICACAO_SESSAO_S se a sessão continua logada (refaz o login se caiu).
+    Se o lançamento falhar (porta ainda ocupada, erro do chromedriver), tenta de novo com espera crescente.
+    """
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    driver = None
+    falhas_seguidas = 0
+    ultima_verificacao_sessao = time.time()
+    try:
+        while True:
+            if driver is None or not depuracao_responde(f"127.0.0.1:{PORTA_DEPURACAO}"):
+                if driver is not None:
+                    print("💀 O navegador residente parou de responder, relançando...")
+                    try:
+                        driver.quit()
+                    except Exception:
+                        pass
+                    driver = None
+                try:
+                    driver, estado = lancar_chrome_residente(headless)
+                except Exception as e:
+                    falhas_seguidas += 1
+                    espera = min(300, INTERVALO_VERIFICACAO_RESIDENTE_S * 2 ** (falhas_seguidas - 1))
+                    print(f"⚠️ Falha ao lançar o navegador residente ({e.__class__.__name__}: {e}); "
+                          f"nova tentativa em {espera}s.")
+                    time.sleep(espera)
+                    continue
+                falhas_seguidas = 0
+                ultima_verificacao_sessao = time.time()
+            elif time.time() - ultima_verificacao_sessao >= INTERVALO_VERIFICACAO_SESSAO_S:
+                # A aba do daemon é só dele: os clientes trabalham em abas próprias
+                ultima_verificacao_sessao = time.time()
+                if not sessao_ativa(driver):
+                    print("🔐 Sessão do navegador residente expirou, autenticando novamente...")
+                    estado["autenticado"] = garantir_login(driver, USUARIO, SENHA)
+                    gravar_json_atomico(ARQUIVO_NAVEGADOR_RESIDENTE, estado)
+            time.sleep(INTERVALO_VERIFICACAO_RESIDENTE_S)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("🛑 Encerrando o navegador residente...")
+        if driver is not None:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+        if os.path.exists(ARQUIVO_NAVEGADOR_RESIDENTE):
+            os.remove(ARQUIVO_NAVEGADOR_RESIDENTE)
+
+def relancar_navegador_residente(headless=False):
+    """
+    Se o processo do daemon ainda existe, espera ele se recuperar sozinho; senão, sobe um daemon
+    novo em segundo plano (saída em navegador_residente.log). Retorna o estado pronto ou None.
+    """
+    estado = ler_estado_residente()
+    daemon = None
+    if estado is None or not processo_vivo(estado.get("pid")):
+        if estado is not None:
+            # Estado de um daemon morto: apagado antes de subir o novo, que grava o dele logo no início
+            os.remove(ARQUIVO_NAVEGADOR_RESIDENTE)
+        print("🚀 Iniciando o navegador residente em segundo plano...")
+        comando = [sys.executable, os.path.abspath(__file__), "--daemon"] + (["--headless"] if headless else [])
+        comando += ["--perfil-enxuto"] if PERFIL_ENXUTO else []
+        with open("navegador_residente.log", "a", encoding="utf-8") as log:
+            daemon = subprocess.Popen(comando, stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                             start_new_session=True, env={**os.environ, "PYTHONIOENCODING": "utf-8"})
+
+    limite = time.time() + TIMEOUT_NAVEGADOR_RESIDENTE
+    while time.time() < limite:
+        estado = ler_estado_residente()
+        if estado and estado.get("pronto") and depuracao_responde(estado["endereco"]):
+            return estado
+        if daemon is not None and daemon.poll() is not None:
+            print("❌ O navegador residente não subiu; veja navegador_residente.log.")
+            return None
+        time.sleep(1)
+    return None
+
+def anexar_navegador_residente(headless=False):
+    """
+    Modo cliente: conecta-se (debuggerAddress) ao navegador residente, abre uma aba nova para esta
+    execução e mostra quanto do início a frio (Chrome + login) foi economizado. Retorna o driver ou None.
+    """
+    inicio = time.time()
+    estado = ler_estado_residente()
+    if estado is None or not estado.get("pronto") or not depuracao_responde(estado["endereco"]):
+        estado = relancar_navegador_residente(headless)
+        if estado is None:
+            return None
+
+    options = webdriver.ChromeOptions()
+    options.debugger_address = estado["endereco"]
+    if MODO_API:
+        options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    if PERFIL_ENXUTO:
+        options.page_load_strategy = ESTRATEGIA_CARREGAMENTO
+    try:
+        driver = webdriver.Chrome(options=options)
+        driver.switch_to.new_window("tab")
+    except Exception as e:
+        print(f"⚠️ Não foi possível anexar ao navegador residente: {e}")
+        return None
+    driver.residente = True
+    preparar_driver(driver, PERFIL_ENXUTO)
+
+    tempo_anexo = time.time() - inicio
+    inicio_frio = estado.get("inicio_chrome_s", 0) + estado.get("login_s", 0)
+    print(f"⚡ Anexado ao navegador residente ({estado['endereco']}) em {tempo_anexo:.1f}s; "
+          f"o início a frio levou {inicio_frio:.1f}s (economia de {inicio_frio - tempo_anexo:.1f}s).")
+    return driver
+
+# ======= MODO LOTE (VÁRIOS CURSOS, UMA SESSÃO) =======
+def ler_lista_cursos(urls, arquivo=None):
+    """
+    Junta os cursos passados na linha de comando e os do arquivo (uma URL por linha, opcionalmente
+    'URL;nome'; linhas vazias e iniciadas por # são ignoradas).
+    Retorna lista de (url_aulas, nome), com nome padrão 'curso_<id>'.
+    """
+    entradas = list(urls or [])
+    if arquivo:
+        with open(arquivo, encoding="utf-8") as f:
+            entradas.extend(linha.strip() for linha in f if linha.strip() and not linha.lstrip().startswith("#"))
+
+    cursos = []
+    for entrada in entradas:
+        url, _, nome = entrada.partition(";")
+        url = url.strip()
+        nome = re.sub(r'[\\/*?:"<>|]', "", nome).strip() or f"curso_{obter_id_curso(url)}"
+        cursos.append((url, nome))
+    return cursos
+
+def selecionar_curso(url_aulas, nome, pasta_saida):
+    """
+    Aponta as configurações globais do script (URL_AULAS, ARQUIVO_SAIDA, PASTA_DESTINO) para o curso.
+    """
+    global URL_AULAS, ARQUIVO_SAIDA, PASTA_DESTINO
+    URL_AULAS = url_aulas
+    ARQUIVO_SAIDA = os.path.join(pasta_saida, f"{nome}.csv")
+    PASTA_DESTINO = os.path.join(pasta_saida, nome)
+
+def abrir_curso_no_navegador(driver):
+    """
+    Vai para a página das aulas do curso atual e espera a lista; se a sessão tiver caído no meio
+    do lote (redirecionamento para o login), autentica de novo e tenta mais uma vez.
+    """
+    if MODO_API:
+        # Descarta o log de rede do curso anterior para não misturar as chamadas capturadas
+        driver.get_log("performance")
+    garantir_pagina_aulas(driver, forcar=True)
+    if aguardar_lista_aulas(driver):
+        return True
+    if not driver.current_url.startswith(BASE_SITE):
+        print("🔐 Sessão expirada no meio do lote, autenticando novamente...")
+        if garantir_login(driver, USUARIO, SENHA):
+            garantir_pagina_aulas(driver, forcar=True)
+            return bool(aguardar_lista_aulas(driver))
+    return False
+
+def executar_lote(cursos, operacoes, pasta_saida, caminho_relatorio, headless=False):
+    """
+    Processa vários cursos com um único navegador e um único login: para cada curso, aponta
+    as configurações para ele e executa as operações ("duracoes" e/ou "downloads").
+    Um curso com erro não interrompe o lote. O tempo de cada curso/operação é gravado em
+    'caminho_relatorio' (JSON) a cada curso concluído.
+    """
+    os.makedirs(pasta_saida, exist_ok=True)
+    relatorio = {"inicio": datetime.now().isoformat(timespec="seconds"), "cursos": []}
+    driver = None
+    tempo_lote = time.time()
+
+    try:
+        for numero, (url_aulas, nome) in enumerate(cursos, start=1):
+            print(f"📚 Curso {numero}/{len(cursos)}: {nome} ({url_aulas})")
+            selecionar_curso(url_aulas, nome, pasta_saida)
+            registro = {"curso": nome, "url": url_aulas, "operacoes": {}}
+            relatorio["cursos"].append(registro)
+
+            for operacao in operacoes:
+                inicio = time.time()
+                try:
+                    videos = processar_do_indice(operacao)
+                    origem = "indice"
+                    if videos is None:
+                        if driver is None:
+                            # O navegador só é aberto (e o login feito) uma vez, no primeiro curso que precisar dele
+                            driver = obter_driver(headless=headless)
+                            if not garantir_login(driver, USUARIO, SENHA):
+                                print("❌ Falha no login. Encerrando o lote.")
+                                registro["operacoes"][operacao] = {"status": "erro", "erro": "falha no login"}
+                                return relatorio
+                            relatorio["login_s"] = round(time.time() - inicio, 2)
+                            inicio = time.time()
+                        if not abrir_curso_no_navegador(driver):
+                            raise RuntimeError("lista de aulas não carregou")
+                        videos = processar_curso(driver, operacao)
+                        origem = "navegador"
+                    registro["operacoes"][operacao] = {"status": "ok", "origem": origem, "videos": videos,
+                                                       "segundos": round(time.time() - inicio, 2)}
+                except Exception as e:
+                    print(f"❌ Curso {nome}, {operacao}: {e}")
+                    registro["operacoes"][operacao] = {"status": "erro", "erro": str(e).strip(), "segundos": round(time.time() - inicio, 2)}
+                print(f"⏱️ {nome} - {operacao}: {registro['operacoes'][operacao]['segundos']:.1f}s")
+            gravar_relatorio_lote(relatorio, caminho_relatorio, tempo_lote)
+    finally:
+        if driver is not None:
+            liberar_driver(driver)
+        gravar_relatorio_lote(relatorio, caminho_relatorio, tempo_lote)
+
+    erros = sum(1 for c in relatorio["cursos"] for o in c["operacoes"].values() if o["status"] == "erro")
+    print(f"📦 Lote concluído: {len(relatorio['cursos'])} cursos em {time.time() - tempo_lote:.1f}s, {erros} operação(ões) com erro.")
+    print(f"📝 Tempos por curso em {caminho_relatorio}")
+    return relatorio
+
+def gravar_relatorio_lote(relatorio, caminho, tempo_lote):
+    """
+    Grava o relatório do lote (substituição atômica, para não deixar JSON pela metade).
+    """
+    relatorio["total_s"] = round(time.time() - tempo_lote, 2)
+    temporario = caminho + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, ensure_ascii=False, indent=2)
+    os.replace(temporario, caminho)
+
+def interpretar_argumentos(argv):
+    """
+    Argumentos do modo lote. Sem argumentos, o script continua no modo interativo.
+    """
+    parser = argparse.ArgumentParser(description="Extrai durações e/ou baixa as videoaulas de vários cursos numa única sessão.")
+    parser.add_argument("--cursos", nargs="+", metavar="URL", help="URLs das páginas de aulas dos cursos")
+    parser.add_argument("--arquivo-cursos", help="arquivo com uma URL por linha (opcional: 'URL;nome')")
+    parser.add_argument("--operacao", choices=["duracoes", "downloads", "ambos"])
+    parser.add_argument("--pasta-saida", default="lote", help="onde ficam o CSV e a pasta de vídeos de cada curso")
+    parser.add_argument("--relatorio", help="JSON com os tempos por curso (padrão: <pasta-saida>/resumo_lote.json)")
+    parser.add_argument("--headless", action="store_true", help="abre o navegador sem janela")
+    parser.add_argument("--cota-mb", type=float, help="espaço em disco para os downloads de cada curso (MB)")
+    parser.add_argument("--prazo-min", type=float, help="tempo para terminar os downloads de cada curso (minutos)")
+    parser.add_argument("--armazem", metavar="PASTA",
+                        help="baixa cada vídeo uma única vez para PASTA e cria os arquivos dos cursos como hardlinks")
+    parser.add_argument("--resume", action="store_true", help="retoma a coleta de durações de onde a execução anterior parou")
+    parser.add_argument("--perfil-enxuto", action="store_true",
+                        help="carregamento 'eager' e bloqueio de imagens, fontes e widgets de terceiros (PERFIL_ENXUTO)")
+    parser.add_argument("--comparar-perfis", action="store_true",
+                        help="só mede o carregamento das páginas com o perfil completo e com o enxuto e sai")
+    parser.add_argument("--daemon", action="store_true",
+                        help="mantém um navegador logado aberto para as próximas execuções (até Ctrl+C)")
+    parser.add_argument("--anexar", action="store_true",
+                        help="usa o navegador residente (--daemon) em vez de abrir um novo")
+    parser.add_argument("--varrer-downloads", nargs="?", const="", metavar="PASTA",
+                        help="gera o CSV de durações lendo os MP4 já baixados (padrão: PASTA_DESTINO), sem navegador")
+    parser.add_argument("--csv", help="CSV gerado por --varrer-downloads (padrão: ARQUIVO_SAIDA)")
+    parser.add_argument("--detalhes", action="store_true",
+                        help="com --varrer-downloads, inclui resolução, largura, altura e bitrate no CSV")
+    args = parser.parse_args(argv)
+    if args.comparar_perfis or args.daemon or args.varrer_downloads is not None:
+        return args
+    if not args.operacao:
+        parser.error("informe --operacao")
+    if not args.cursos and not args.arquivo_cursos:
+        parser.error("informe --cursos e/ou --arquivo-cursos")
+    return args
+
+def main_lote(argv):
+    global RETOMAR_COLETA, USAR_NAVEGADOR_RESIDENTE, USAR_ARMAZEM_CONTEUDO, PASTA_ARMAZEM, COTA_DISCO_MB, PRAZO_DOWNLOADS_MIN
+    global PERFIL_ENXUTO
+    args = interpretar_argumentos(argv)
+    PERFIL_ENXUTO = PERFIL_ENXUTO or args.perfil_enxuto
+    if args.comparar_perfis:
+        comparar_perfis(args.headless)
+        return
+    if args.daemon:
+        executar_navegador_residente(args.headless)
+        return
+    if args.varrer_downloads is not None:
+        varrer_downloads(args.varrer_downloads or None, args.csv, args.detalhes)
+        return
+    RETOMAR_COLETA = RETOMAR_COLETA or args.resume
+    USAR_NAVEGADOR_RESIDENTE = USAR_NAVEGADOR_RESIDENTE or args.anexar
+    if args.armazem:
+        USAR_ARMAZEM_CONTEUDO, PASTA_ARMAZEM = True, args.armazem
+    COTA_DISCO_MB = args.cota_mb or COTA_DISCO_MB
+    PRAZO_DOWNLOADS_MIN = args.prazo_min or PRAZO_DOWNLOADS_MIN
+    cursos = ler_lista_cursos(args.cursos, args.arquivo_cursos)
+    operacoes = ["duracoes", "downloads"] if args.operacao == "ambos" else [args.operacao]
+    try:
+        executar_lote(cursos, operacoes, args.pasta_saida,
+                      args.relatorio or os.path.join(args.pasta_saida, "resumo_lote.json"), args.headless)
+    finally:
+        finalizar_execucao()
+
+def main():
+    global RETOMAR_COLETA
+    if len(sys.argv) > 1:
+        main_lote(sys.argv[1:])
+        return
+
+    print("🧠 Escolha o que deseja fazer:")
+    print("1 - Extrair duração das videoaulas")
+    print("2 - Baixar todas as videoaulas (resolução mais alta disponível)")
+    print("3 - Verificar os vídeos já baixados (manifesto + HEAD, sem baixar de novo)")
+    print("4 - Extrair duração dos vídeos já baixados (lendo os arquivos, sem navegador)")
+
+    escolha = input("Digite 1, 2, 3 ou 4: ").strip()
+    if escolha not in ["1", "2", "3", "4"]:
+        print("❌ Opção inválida. Encerrando.")
+        return
+
+    if escolha == "3":
+        # -------------------- OPÇÃO 3: VERIFICAÇÃO ------------------------
+        # Não precisa de navegador: tudo vem do manifesto e de requisições HEAD
+        verificar_downloads()
+        print("🔚 Processo finalizado.")
+        return
+
+    if escolha == "4":
+        # -------------------- OPÇÃO 4: DURAÇÃO DOS ARQUIVOS ------------------------
+        varrer_downloads()
+        print("🔚 Processo finalizado.")
+        return
+
+    # -------------------- OPÇÃO 1: DURAÇÃO / OPÇÃO 2: DOWNLOAD ------------------------
+    operacao = "duracoes" if escolha == "1" else "downloads"
+    # Só a coleta num único navegador pelo DOM grava o CSV aos poucos e sabe retomar
+    coleta_incremental = not MODO_API and NUM_NAVEGADORES <= 1
+    if operacao == "duracoes" and coleta_incremental and not RETOMAR_COLETA and ler_checkpoint(ARQUIVO_SAIDA):
+        RETOMAR_COLETA = input("⏯️ Há uma coleta interrompida deste curso. Retomar de onde parou? (s/n): ").strip().lower() == "s"
+    if processar_do_indice(operacao) is not None:
+        # Índice completo para o curso: respondido sem abrir o navegador
+        encerrar_painel()
+        print("🔚 Processo finalizado.")
+        return
+
+    driver = obter_driver(headless=False)
+
+    try:
+        sucesso_login = garantir_login(driver, USUARIO, SENHA)
+        if not sucesso_login:
+            print("❌ Falha no login. Encerrando.")
+            return
+
+        garantir_pagina_aulas(driver)
+        aguardar_lista_aulas(driver)
+        processar_curso(driver, operacao)
+
+    finally:
+        liberar_driver(driver)
+        finalizar_execucao()
 
 
 if __name__ == "__main__":